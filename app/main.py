@@ -6,10 +6,12 @@ from app.database import Base, engine
 from app.routers.auth import router as auth_router
 from app.routers.personas import router as personas_router
 from app.routers.conversation import router as conversation_router
+from app.routers.health import router as health_router
 from app.middleware.logging import RequestLoggingMiddleware, SecurityHeadersMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings  # or wherever your Settings class is
 from app.runtime import init_runner
+from src.retrieval.registry import preload as preload_retrieval
 
 log = logging.getLogger("chat.startup")
 
@@ -37,11 +39,15 @@ app.add_middleware(SecurityHeadersMiddleware)
 @app.on_event("startup")
 def startup_init_runner():
     init_runner()
+    # RETRIEVAL_PRELOAD=1: load the thesis embedding model now, not on the first question.
+    if preload_retrieval():
+        log.info("retrieval model preloaded")
 
 # Include routers
 app.include_router(auth_router)
 app.include_router(personas_router)
 app.include_router(conversation_router)
+app.include_router(health_router)
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="127.0.0.1", port=8000, reload=True)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.conversation import ChatRequest, ConversationDBCreate, ConversationResponse
@@ -115,7 +116,10 @@ async def chat_respond(
     rlog.info("chat_respond: invoking stream_response()")
     logger.info("chat.respond.invoke_graph", extra={"user_id": current_user.id, "session_id": session_id})
 
-    ai_response = runner.stream_response(
+    # The graph (LLM calls, health tools) is synchronous: run it on a worker
+    # thread so one slow turn doesn't block the event loop for everyone else.
+    ai_response = await run_in_threadpool(
+        runner.stream_response,
         user_input=user_msg,
         system_message=system_prompt,
         session_id=session_id,
@@ -124,7 +128,7 @@ async def chat_respond(
     logger.info("chat.respond.ai_response", extra={"user_id": current_user.id, "has_response": bool(ai_response)})
     
     # 4) Pull full thread state from LangGraph and normalize to [{role, content}, ...]
-    snapshot = runner.graph.get_state({"configurable": {"thread_id": session_id}})
+    snapshot = await run_in_threadpool(runner.graph.get_state, {"configurable": {"thread_id": session_id}})
     state_msgs = snapshot.values.get("messages", []) if snapshot and snapshot.values else []
     rlog.info("chat_respond: state_msgs count=%d", len(state_msgs))
     logger.info("chat.respond.state_count", extra={"user_id": current_user.id, "count": len(state_msgs)})
@@ -0,0 +1,69 @@
+"""
+Health data API endpoints (chart series of a persona's fitness data).
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.schemas.health import SeriesResponse
+from app.schemas.interviewers import User
+from app.services.health_service import HealthService
+from app.utils.dependencies import get_current_user
+from app.logging_config import logger
+from src.health.executor import HealthQueryTimeout
+from src.health.series import MAX_POINTS
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+@router.get(
+    "/{persona_id}/series",
+    response_model=SeriesResponse,
+    responses={200: {"content": {ARROW_STREAM: {}}}},
+)
+def get_series(
+    persona_id: int,
+    metric: str = Query(..., min_length=1, max_length=64),
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    points: int = Query(500, ge=2, le=MAX_POINTS),
+    method: Literal["lttb", "minmax"] = Query("lttb"),
+    format: Literal["json", "arrow"] = Query("json"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    ``metric`` of the persona over ``[start, end)``, downsampled to at most
+    ``points`` points; columnar JSON, or an Arrow IPC stream with ``format=arrow``.
+    """
+    try:
+        path = HealthService.data_path(db, persona_id)
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Persona not found")
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Persona has no health data")
+
+    try:
+        if format == "arrow":
+            body = HealthService.series_arrow(path, metric, start, end, points, method)
+        else:
+            series = HealthService.series(path, metric, start, end, points, method)
+    except HealthQueryTimeout:
+        logger.info("health.series.timeout", extra={"user_id": current_user.id, "persona_id": persona_id, "metric": metric})
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail="Health query timed out; try a narrower range")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    logger.info("health.series.succeeded", extra={
+        "user_id": current_user.id, "persona_id": persona_id, "metric": metric, "format": format,
+    })
+
+    if format == "arrow":
+        return Response(content=body, media_type=ARROW_STREAM)
+    return series
@@ -0,0 +1,19 @@
+"""
+Health data Pydantic schemas.
+"""
+
+from __future__ import annotations
+
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+
+
+class SeriesResponse(BaseModel):
+    """One metric over a range, columnar: ``t[i]`` (epoch ms, UTC bucket start) goes with ``v[i]``."""
+    metric: str
+    unit: Optional[str] = None
+    grain: Literal["hour", "day"]
+    method: Literal["lttb", "minmax"]
+    source_points: int
+    t: List[int]
+    v: List[float]
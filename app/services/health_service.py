@@ -0,0 +1,50 @@
+"""
+Health data service: chart series of a persona's health dataset.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.services.persona_service import PersonaService
+from src.health.cache import cached
+from src.health.executor import run_sync, tool_timeout
+from src.health.metrics import get_metric
+from src.health.series import metric_series, series_ipc
+
+
+class HealthService:
+    """Business logic for the health endpoints."""
+
+    @staticmethod
+    def data_path(db: Session, persona_id: int) -> Optional[str]:
+        """The persona's health dataset path; raises LookupError when the persona doesn't exist."""
+        persona = PersonaService.get_persona(db, persona_id)
+        if persona is None:
+            raise LookupError("Persona not found")
+        path = (persona.data_path or "").strip()
+        return path if path and Path(path).is_dir() else None
+
+    @staticmethod
+    def series(path: str, metric: str, start: datetime, end: datetime, points: int, method: str) -> Dict[str, Any]:
+        """Downsampled series (see src.health.series), cached per dataset version, under the health deadline."""
+        return HealthService._cached_series(metric_series, path, metric, start, end, points, method)
+
+    @staticmethod
+    def series_arrow(path: str, metric: str, start: datetime, end: datetime, points: int, method: str) -> bytes:
+        """The same series as an Arrow IPC stream (columns t, v; the rest as schema metadata)."""
+        return HealthService._cached_series(series_ipc, path, metric, start, end, points, method)
+
+    @staticmethod
+    def _cached_series(fn, path: str, metric: str, start: datetime, end: datetime, points: int, method: str) -> Any:
+        m = get_metric(metric)
+        # start_date/end_date: the names the cache canonicalizes (src.health.cache.DATE_ARGS).
+        args = {"metric": metric, "start_date": start, "end_date": end, "points": points, "method": method}
+        return cached(
+            path, fn.__name__, args,
+            lambda: run_sync(fn, path, m, start, end, points, method, timeout=tool_timeout("metric_series")),
+        )
@@ -0,0 +1,134 @@
+# bench_arrow_results.py
+"""
+Latency and memory of fetching series-returning health queries as Python
+rows versus as Arrow tables viewed from NumPy (``src.health.arrow``).
+
+Usage (from the repo root):
+    python benchmarks/bench_arrow_results.py [--path DATASET] [--years 3] [--runs 5]
+
+Without ``--path`` a synthetic dataset with one step count and one heart rate
+record per minute over ``--years`` years is written to a temporary directory.
+Queries: every step record (minute level) and the hourly step series that
+``src.health.series`` reads for long ranges.
+
+"rows" is ``fetchall()`` followed by the conversion to NumPy the tools need;
+"arrow" is :func:`~src.health.arrow.fetch_table` plus zero-copy
+:func:`~src.health.arrow.numpy_column` views. Memory columns are the peak of
+Python allocations (tracemalloc) and the Arrow buffers held by the result.
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.health.arrow import fetch_table, numpy_column
+from src.health.engine import get_engine
+from src.health.metrics import get_metric
+from src.health.rollup import hourly_source
+from src.health.series import _series_sql
+
+START = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+
+def write_minute_dataset(root: Path, years: int) -> Path:
+    """One step count and one heart rate record per minute, partitioned by year/month."""
+    con = duckdb.connect()
+    con.execute("SET TimeZone = 'UTC'")
+    con.execute(f"""
+        COPY (
+          SELECT t.type AS "@type", 'bench' AS "@sourceName", '1' AS "@sourceVersion", t.unit AS "@unit",
+                 strftime(ts, '%Y-%m-%d %H:%M:%S +0000') AS "@creationDate", ts AS "@startDate",
+                 strftime(ts, '%Y-%m-%d %H:%M:%S +0000') AS "@endDate",
+                 CAST(CASE WHEN t.unit = 'count' THEN (i * 7919) % 120 ELSE 55 + (i * 31) % 60 END AS VARCHAR) AS "@value",
+                 year(ts)::INTEGER AS year, month(ts)::SMALLINT AS month
+          FROM (
+            SELECT i, TIMESTAMPTZ '{START.isoformat()}' + i * INTERVAL 1 MINUTE AS ts
+            FROM range({years * 365 * 24 * 60}) r(i)
+          ),
+          (VALUES ('HKQuantityTypeIdentifierStepCount', 'count'),
+                  ('HKQuantityTypeIdentifierHeartRate', 'count/min')) t(type, unit)
+        ) TO '{root}' (FORMAT parquet, PARTITION_BY (year, month))
+    """)
+    con.close()
+    return root
+
+
+def rows_path(con, sql, params):
+    rows = con.execute(sql, params).fetchall()
+    t = np.array([r[0] for r in rows])
+    v = np.array([r[1] for r in rows], dtype=np.float64)
+    return rows, t, v
+
+
+def arrow_path(con, sql, params):
+    table = fetch_table(con, sql, params)
+    return table, numpy_column(table, table.column_names[0]), numpy_column(table, table.column_names[1])
+
+
+def measure(con, fetch, sql, params, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fetch(con, sql, params)
+        times.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    result = fetch(con, sql, params)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    held = result[0].nbytes if isinstance(result[0], pa.Table) else 0
+    rows = len(result[1])
+    del result
+    return rows, statistics.median(times), peak / 2**20, held / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path")
+    ap.add_argument("--years", type=int, default=3)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    tmp = None
+    if args.path is None:
+        tmp = tempfile.TemporaryDirectory()
+        print(f"writing {args.years} years of minute records ...")
+        args.path = str(write_minute_dataset(Path(tmp.name) / "health", args.years))
+
+    engine = get_engine(args.path)
+    engine.refresh()
+    end = datetime(2100, 1, 1, tzinfo=timezone.utc)
+    steps = get_metric("steps")
+    src, params = hourly_source(engine, START, end, steps.types)
+    queries = {
+        "minute records": (
+            'SELECT "@startDate", TRY_CAST("@value" AS DOUBLE) FROM health WHERE "@type" = ? ORDER BY 1',
+            [steps.types[0]],
+        ),
+        "hourly series": (_series_sql(src, steps, "hour"), [steps.daily, *params, *steps.types]),
+    }
+
+    con = engine.cursor()
+    print(f"dataset: {engine.path} ({len(engine.files)} files)\n")
+    print(f"{'query':<15} {'rows':>9} | {'rows ms':>8} {'py MB':>7} | {'arrow ms':>8} {'py MB':>7} {'arrow MB':>8}")
+    print("-" * 74)
+    for label, (sql, params) in queries.items():
+        n, r_ms, r_py, _ = measure(con, rows_path, sql, params, args.runs)
+        _, a_ms, a_py, a_arrow = measure(con, arrow_path, sql, params, args.runs)
+        print(f"{label:<15} {n:>9} | {r_ms:>8.1f} {r_py:>7.1f} | {a_ms:>8.1f} {a_py:>7.1f} {a_arrow:>8.1f}")
+    con.close()
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench_partition_pruning.py
+"""
+Files read and latency of the health queries with and without year/month
+partition pruning.
+
+Usage (from the repo root):
+    python benchmarks/bench_partition_pruning.py [--path .health_parquet] [--runs 20]
+
+"before" is the original query shape (``"@startDate"`` filter only); "after"
+adds the year/month predicates that the tools now send. Both aggregate raw
+records; the last column shows the whole-day rollup path for reference.
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.health.engine import get_engine
+from src.health.rollup import daily_select, daily_source
+
+RANGES = {
+    "1 week": (datetime(2024, 3, 4), datetime(2024, 3, 11)),
+    "1 month": (datetime(2024, 3, 1), datetime(2024, 4, 1)),
+    "1 year": (datetime(2024, 1, 1), datetime(2025, 1, 1)),
+    "all": (datetime(2000, 1, 1), datetime(2100, 1, 1)),
+}
+
+
+def files_read(con, sql, params) -> int:
+    plan = con.execute("EXPLAIN ANALYZE " + sql, params).fetchall()[0][1]
+    return sum(int(n) for n in re.findall(r"Total Files Read: *(\d+)", plan))
+
+
+def latency_ms(con, sql, params, runs) -> float:
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        con.execute(sql, params).fetchall()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--path", default=".health_parquet")
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    engine = get_engine(args.path)
+    con = engine.cursor()
+    print(f"dataset: {engine.path} ({len(engine.files)} files, hive={engine.hive_partitioned})\n")
+    print(f"{'range':<8} | {'before files':>12} {'ms':>8} | {'after files':>11} {'ms':>8} | {'rollup files':>12} {'ms':>8}")
+    print("-" * 82)
+    for label, (start, end) in RANGES.items():
+        before = (daily_select("health", 'WHERE "@startDate" >= ? AND "@startDate" < ?'), [start, end])
+        # Shift by a second so daily_source keeps to the raw records.
+        after = daily_source(engine, start + timedelta(seconds=1), end)
+        rollup = daily_source(engine, start, end)
+        row = []
+        for sql, params in (before, after, rollup):
+            row += [files_read(con, sql, params), latency_ms(con, sql, params, args.runs)]
+        print(f"{label:<8} | {row[0]:>12} {row[1]:>8.2f} | {row[2]:>11} {row[3]:>8.2f} | {row[4]:>12} {row[5]:>8.2f}")
+    con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# compact_data.py
+#
+# Usage (from the repo root):
+#   python data/compact_data.py --path health_parquet                  # compact partitions with extra files
+#   python data/compact_data.py --path health_parquet --force          # rewrite every partition
+#   python data/compact_data.py --path health_parquet --target-rows 500000
+#   python data/compact_data.py --path health_parquet --dry-run        # only report files and latency
+#
+# Rewrites each year=/month= partition into right-sized files sorted by
+# (@type, @startDate), refreshes the rollups, cube and catalog (and rebuilds
+# the persistent DuckDB file when the dataset has one), and reports file
+# counts and the latency of raw-record queries before and after. Run it while
+# nothing is ingesting into the dataset.
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.health.compact import TARGET_FILE_ROWS, compact_dataset
+from src.health.database import DB_PREFIX, DB_SUFFIX, build_database
+from src.health.dataset import scan_files
+from src.health.engine import MEMORY, HealthEngine
+from src.health.metrics import STEPS
+from src.health.rollup import daily_source, partitions
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Compact the Parquet partitions of a health dataset.")
+    ap.add_argument("--path", default="health_parquet", help="dataset root")
+    ap.add_argument("--target-rows", type=int, default=TARGET_FILE_ROWS, help="rows per compacted file")
+    ap.add_argument("--force", action="store_true", help="rewrite every partition, not only those with extra files")
+    ap.add_argument("--dry-run", action="store_true", help="measure only, don't rewrite anything")
+    ap.add_argument("--runs", type=int, default=5, help="runs per latency measurement (median)")
+    return ap.parse_args(argv)
+
+def _last_month(root: Path):
+    """[start, end) of the newest year=/month= partition, or None."""
+    keys = []
+    for part in partitions(scan_files(root)):
+        fields = dict(p.split("=", 1) for p in Path(part).parts if "=" in p)
+        if "year" in fields and "month" in fields:
+            keys.append((int(fields["year"]), int(fields["month"])))
+    if not keys:
+        return None
+    year, month = max(keys)
+    start = datetime(year, month, 1, tzinfo=timezone.utc)
+    return start, datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc)
+
+def query_latency(root: Path, runs: int) -> dict:
+    """
+    Median ms of a scan over every step record and of the newest month
+    aggregated from raw records. Each run opens a fresh engine, so file
+    listing and footer reads are paid like on the first query after a change.
+    """
+    month = _last_month(root)
+    out = {}
+    for label in ("all step records", "newest month (raw)"):
+        if label.startswith("newest") and month is None:
+            continue
+        times = []
+        for _ in range(runs):
+            engine = HealthEngine(root, mode=MEMORY)
+            engine.refresh()
+            if label.startswith("all"):
+                sql, params = 'SELECT COUNT(*), SUM(TRY_CAST("@value" AS DOUBLE)) FROM health WHERE "@type" = ?', [STEPS]
+            else:
+                # Shifted by a second so daily_source aggregates raw records instead of the rollup.
+                sql, params = daily_source(engine, month[0] + timedelta(seconds=1), month[1])
+            con = engine.cursor()
+            try:
+                t0 = time.perf_counter()
+                con.execute(sql, params).fetchall()
+                times.append((time.perf_counter() - t0) * 1000)
+            finally:
+                con.close()
+                engine.close()
+        out[label] = statistics.median(times)
+    return out
+
+def main(argv=None):
+    args = parse_args(argv)
+    root = Path(args.path)
+    files = scan_files(root)
+    if not files:
+        sys.exit(f"no Parquet files under {root}")
+
+    print(f"Measuring {root} ({len(files)} files, {len(partitions(files))} partitions) ...")
+    before = query_latency(root, args.runs)
+    if args.dry_run:
+        for label, ms in before.items():
+            print(f"  {label:<20} {ms:8.1f} ms")
+        return None
+
+    stats = compact_dataset(root, target_rows=args.target_rows, force=args.force)
+    if stats.partitions_compacted and any(root.glob(f"{DB_PREFIX}*{DB_SUFFIX}")):
+        print("Rebuilding the persistent DuckDB file ...")
+        build_database(root)
+    after = query_latency(root, args.runs)
+
+    print("Done ✅")
+    print(stats.summary())
+    print(f"  {'':<20} {'before':>9} {'after':>9}")
+    print(f"  {'files':<20} {stats.files_before:>9,} {stats.files_after:>9,}")
+    for label in before:
+        print(f"  {label + ' (ms)':<20} {before[label]:>9.1f} {after[label]:>9.1f}")
+    return stats
+
+if __name__ == "__main__":
+    main()
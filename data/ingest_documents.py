@@ -0,0 +1,59 @@
+# ingest_documents.py
+#
+# Usage (from the repo root):
+#   python data/ingest_documents.py docs/thesis.pdf --collection goncalo_thesis   # the thesis tool's collection
+#   python data/ingest_documents.py docs/ --persona "Gonçalo Silva"              # -> collection goncalo_silva_kb
+#   python data/ingest_documents.py docs/ --persona goncalo --prune              # also drop files no longer in docs/
+#   python data/ingest_documents.py docs/ --collection goncalo_thesis --batch-size 1024
+#
+# Chunks PDFs, Markdown and text files, embeds the chunks that are new or
+# changed (content hash) in large batches and upserts them into the Chroma
+# collection, then rebuilds the collection's BM25 index. Re-running after a
+# small edit only embeds the edited chunks. Run it while nothing else writes
+# to the collection.
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.retrieval.ingest import CHUNK_OVERLAP, CHUNK_SIZE, EMBED_BATCH, ingest_documents, persona_collection, print_progress
+from src.retrieval.registry import DEFAULT_PERSIST_DIR, EMBED_MODEL_NAME
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Ingest PDF/Markdown/text documents into a persona's Chroma collection.")
+    ap.add_argument("paths", nargs="+", help="files or directories (searched recursively)")
+    target = ap.add_mutually_exclusive_group(required=True)
+    target.add_argument("--collection", help="Chroma collection name")
+    target.add_argument("--persona", help="persona name; the collection is <slug>_kb")
+    ap.add_argument("--persist-dir", default=DEFAULT_PERSIST_DIR, help="Chroma persist directory")
+    ap.add_argument("--model", default=EMBED_MODEL_NAME, help="embedding model")
+    ap.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="characters per chunk")
+    ap.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP, help="characters shared by consecutive chunks")
+    ap.add_argument("--batch-size", type=int, default=EMBED_BATCH, help="chunks per embedding batch")
+    ap.add_argument("--prune", action="store_true", help="delete chunks of sources not among the given paths")
+    ap.add_argument("--quiet", action="store_true", help="no progress output")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    collection = args.collection or persona_collection(args.persona)
+
+    print(f"Ingesting {', '.join(args.paths)} into {args.persist_dir}#{collection} ({args.model}) ...")
+    stats = ingest_documents(
+        args.paths,
+        collection,
+        persist_directory=args.persist_dir,
+        model_name=args.model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        prune=args.prune,
+        progress=None if args.quiet else print_progress,
+    )
+
+    print("Done ✅")
+    print(stats.summary())
+    return stats
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,68 @@
 # build_partitioned_parquet.py
-import pandas as pd
+#
+# Usage (from the repo root):
+#   python data/partion_data.py                       # raw layout, CSV columns as-is
+#   python data/partion_data.py --layout typed        # typed, sorted, small row groups
+#   python data/partion_data.py --max-memory-mb 128   # cap buffered rows for large exports
+#   python data/partion_data.py --xml apple_health_export/export.xml   # no CSV conversion needed
+#   python data/partion_data.py --xml export.xml --incremental          # re-export: add only new records
+#
+# The export is streamed (CSV in blocks, XML element by element), so memory
+# stays bounded by --max-memory-mb regardless of the export size.
+import argparse
+import sys
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from src.health.ingest import DEFAULT_MAX_MEMORY_MB, ingest_csv, ingest_xml, print_progress
+from src.health.layout import LAYOUTS, RAW
+
 CSV_PATH = "export.csv"            # <- change if needed
 OUT_DIR = Path("health_parquet")   # output dataset root
 
-def main():
-    print("Loading CSV...")
-    # Keep all columns exactly as-is
-    df = pd.read_csv(CSV_PATH, low_memory=False)
-
-    # Parse timestamps (keep rows that have a valid @startDate)
-    if "@startDate" not in df.columns:
-        raise ValueError("Column '@startDate' not found in CSV.")
-    df["@startDate"] = pd.to_datetime(df["@startDate"], utc=True, errors="coerce")
-    df = df.dropna(subset=["@startDate"])
-
-    # Derive time partitions
-    df["year"] = df["@startDate"].dt.year.astype("int32")
-    df["month"] = df["@startDate"].dt.month.astype("int16")
-
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"Writing partitioned Parquet (Snappy) to {OUT_DIR} ...")
-
-    # Partition only by time (year/month). No mapping, no schema changes.
-    df.to_parquet(
-        OUT_DIR,
-        engine="pyarrow",
-        compression="snappy",
-        partition_cols=["year", "month"],
-        index=False,
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Partition an Apple Health export into year=/month= Parquet.")
+    source = ap.add_mutually_exclusive_group()
+    source.add_argument("--csv", default=CSV_PATH, help="flattened Health export CSV")
+    source.add_argument("--xml", default=None, help="Apple Health export.xml, parsed directly")
+    ap.add_argument("--out", default=str(OUT_DIR), help="output dataset root")
+    ap.add_argument("--layout", choices=LAYOUTS, default=RAW,
+                    help="raw: columns as-is; typed: DOUBLE @value, dictionary columns, sorted by (@type, @startDate)")
+    ap.add_argument("--row-group-size", type=int, default=None,
+                    help="rows per row group for the typed layout (default: sized per flush)")
+    ap.add_argument("--max-memory-mb", type=int, default=DEFAULT_MAX_MEMORY_MB,
+                    help="memory ceiling for buffered rows and CSV blocks")
+    ap.add_argument("--incremental", action="store_true",
+                    help="skip records already in --out (same type, dates, source and value); "
+                         "only months with new records get new files")
+    ap.add_argument("--quiet", action="store_true", help="no progress output")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    out_dir = Path(args.out)
+
+    source, ingest = (args.xml, ingest_xml) if args.xml else (args.csv, ingest_csv)
+
+    print(f"Streaming {source} into {args.layout} Parquet (Snappy) at {out_dir} "
+          f"(memory ceiling {args.max_memory_mb} MB) ...")
+    stats = ingest(
+        source,
+        out_dir,
+        layout=args.layout,
+        max_memory_mb=args.max_memory_mb,
+        row_group_size=args.row_group_size,
+        progress=None if args.quiet else print_progress,
+        incremental=args.incremental,
     )
 
     print("Done ✅")
+    print(stats.summary())
     # Optional: quick summary
-    print("Partitions created (sample):")
-    print(df.groupby(["year", "month"]).size().head(12))
+    print("Partitions written (sample):")
+    for (year, month), rows in sorted(stats.partitions.items())[:12]:
+        print(f"  year={year}/month={month}: {rows:,} rows")
+    return stats
 
 if __name__ == "__main__":
     main()
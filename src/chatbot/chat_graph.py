@@ -8,7 +8,7 @@ from typing_extensions import NotRequired
 import os
 import logging, time, sys
 from langgraph.prebuilt import create_react_agent
-from src.tools import get_user_repo_summary, get_date, calories_burned, average_calories_per_day, max_daily_calories, longest_run, average_steps_per_day, max_steps_day, query_knowledge_base_thesis
+from src.tools import get_user_repo_summary, get_date, HEALTH_TOOLS, query_knowledge_base_thesis
 from langsmith import Client
 
 log = logging.getLogger("chat")
@@ -41,7 +41,7 @@ class ChatGraphRunner:
 
 
         # Main agent with existing tools
-        self.agent = create_react_agent(llm.llm, tools=[get_user_repo_summary, get_date, calories_burned, average_calories_per_day, max_daily_calories, longest_run, average_steps_per_day, max_steps_day])
+        self.agent = create_react_agent(llm.llm, tools=[get_user_repo_summary, get_date, *HEALTH_TOOLS])
         # RAG agent for thesis/report/dissertation
         self.rag_agent =create_react_agent(llm.llm,  tools=[query_knowledge_base_thesis])
         # Router agent to decide which agent to use
@@ -0,0 +1,180 @@
+"""
+Trend, streak and distribution analytics over a metric's daily values.
+
+:func:`daily_values` reads one registry metric's per-day values over a range
+with one query (the same day values :func:`~src.health.query.period_stats`
+aggregates, from the daily rollup), as NumPy views of an Arrow result. The
+functions below work on those arrays in vectorized form and return only the
+final numbers, so the agent gets e.g. a streak length instead of a list of
+days to reason over:
+
+:func:`longest_streak`  — longest run of consecutive calendar days meeting a threshold.
+:func:`rolling_means`   — best, worst and latest ``window``-day average.
+:func:`percentiles`     — distribution of the day values.
+:func:`linear_trend`    — least-squares slope per day and week, and how well it fits.
+
+Days are UTC day numbers (days since 1970-01-01); a calendar day without a
+value (no records for the metric, see ``fill_days``) breaks streaks and is
+left out of averages.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.health.arrow import fetch_table, numpy_column
+from src.health.cube import daily_values_sql, metric_params
+from src.health.engine import get_engine
+from src.health.metrics import Metric
+from src.health.rollup import daily_source
+
+# A trend moving less than this fraction of the mean over the range is "flat".
+FLAT_CHANGE = 0.05
+
+_EPOCH = date(1970, 1, 1)
+
+
+def day_iso(day: int) -> str:
+    return (_EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def daily_values(path: str, metric: Metric, start_ts: datetime, end_ts: datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """Day numbers (int64, ascending) and values (float64) of ``metric`` in ``[start_ts, end_ts)``."""
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    engine = get_engine(path)
+    engine.refresh()
+    catalog = engine.catalog
+    if catalog is not None:
+        clamped = catalog.clamp(start_ts, end_ts)
+        if clamped is None or not (metric.fill_days or catalog.has_types(metric.types, *clamped)):
+            return empty
+        start_ts, end_ts = clamped
+
+    # fill_days metrics need every day with a record, so only filter by type without them.
+    types = None if metric.fill_days else list(metric.types)
+    source, params = daily_source(engine, start_ts, end_ts, types)
+    daily = f"SELECT 0 AS period, day, type, unit, sum, count, min, max FROM ({source})"
+    sql = f"WITH {daily_values_sql([metric], daily)} SELECT epoch(day)::BIGINT // 86400 AS day, v FROM filled ORDER BY day"
+    con = engine.cursor()
+    try:
+        table = fetch_table(con, sql, [*params, *metric_params([metric])])
+    finally:
+        con.close()
+    if not table.num_rows:
+        return empty
+    return numpy_column(table, "day"), numpy_column(table, "v")
+
+
+def _runs(days: np.ndarray, hit: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end (inclusive) indices of the runs of consecutive calendar days where ``hit``."""
+    idx = np.flatnonzero(hit)
+    if not len(idx):
+        return idx, idx
+    breaks = np.flatnonzero(np.diff(days[idx]) != 1)
+    return idx[np.r_[0, breaks + 1]], idx[np.r_[breaks, len(idx) - 1]]
+
+
+def longest_streak(days: np.ndarray, values: np.ndarray, threshold: float, below: bool = False) -> Dict[str, Any]:
+    """
+    Longest run of consecutive days with a value ``>= threshold`` (``<=`` with
+    ``below``); ties go to the earliest run. ``current`` is the run ending on
+    the last day with data (0 days when that day misses the threshold).
+    """
+    hit = values <= threshold if below else values >= threshold
+    starts, ends = _runs(days, hit)
+    out: Dict[str, Any] = {"days_meeting": int(hit.sum()), "days": int(len(days))}
+    if not len(starts):
+        none = {"days": 0, "start": None, "end": None}
+        return {**out, "longest": none, "current": dict(none)}
+    lengths = days[ends] - days[starts] + 1
+    best = int(np.argmax(lengths))
+
+    def run(i: int) -> Dict[str, Any]:
+        return {"days": int(lengths[i]), "start": day_iso(days[starts[i]]), "end": day_iso(days[ends[i]])}
+
+    current = run(len(ends) - 1) if ends[-1] == len(days) - 1 else {"days": 0, "start": None, "end": None}
+    return {**out, "longest": run(best), "current": current}
+
+
+def rolling_means(days: np.ndarray, values: np.ndarray, window: int) -> Dict[str, Any]:
+    """
+    Average over every ``window``-calendar-day window (ending on each day of
+    the range), counting only days with a value; windows with fewer than half
+    their days recorded are skipped. Returns the best, worst and latest one.
+    """
+    none = {"best": None, "worst": None, "latest": None, "windows": 0}
+    if not len(days):
+        return none
+    first = days[0]
+    span = int(days[-1] - first) + 1
+    total, count = np.zeros(span + 1), np.zeros(span + 1)
+    total[days - first + 1] = values
+    count[days - first + 1] = 1
+    total, count = np.cumsum(total), np.cumsum(count)
+    end = np.arange(window, span + 1) if span >= window else np.array([span])
+    lo = np.maximum(end - window, 0)
+    n = count[end] - count[lo]
+    ok = n >= max(window / 2, 1)
+    if not ok.any():
+        return none
+    end, n, s = end[ok], n[ok], (total[end] - total[lo])[ok]
+    means = s / n
+
+    def at(i: int) -> Dict[str, Any]:
+        last = first + end[i] - 1
+        # A span shorter than the window starts at the first day with data.
+        start = max(last - window + 1, first)
+        return {"start": day_iso(start), "end": day_iso(last), "avg": round(float(means[i]), 2), "days": int(n[i])}
+
+    # argmax/argmin keep the earliest window on ties.
+    return {"best": at(int(np.argmax(means))), "worst": at(int(np.argmin(means))), "latest": at(len(means) - 1),
+            "windows": int(len(means))}
+
+
+def percentiles(values: np.ndarray, qs: Sequence[float]) -> Dict[str, Any]:
+    """Mean, standard deviation and the ``qs`` percentiles (0-100) of the day values."""
+    if not len(values):
+        return {"days": 0, "mean": None, "std": None, "percentiles": {f"p{q:g}": None for q in qs}}
+    points = np.percentile(values, qs)
+    return {
+        "days": int(len(values)),
+        "mean": round(float(values.mean()), 2),
+        "std": round(float(values.std()), 2),
+        "percentiles": {f"p{q:g}": round(float(p), 2) for q, p in zip(qs, points)},
+    }
+
+
+def linear_trend(days: np.ndarray, values: np.ndarray) -> Dict[str, Any]:
+    """
+    Least-squares line through the day values: slope per day and per week,
+    fitted values on the first and last day, r² and a direction (``flat``
+    when the fitted change is under ``FLAT_CHANGE`` of the mean).
+    """
+    if len(days) < 2 or days[-1] == days[0]:
+        return {"days": int(len(days)), "direction": None, "slope_per_day": None, "slope_per_week": None,
+                "start_value": None, "end_value": None, "change_pct": None, "r2": None}
+    x = (days - days[0]).astype(np.float64)
+    slope, intercept = np.polyfit(x, values, 1)
+    fitted = slope * x + intercept
+    ss_tot = float(((values - values.mean()) ** 2).sum())
+    r2 = 1.0 - float(((values - fitted) ** 2).sum()) / ss_tot if ss_tot else 1.0
+    start, end = float(fitted[0]), float(fitted[-1])
+    mean = float(values.mean())
+    change: Optional[float] = (end - start) / abs(mean) if mean else None
+    if (change is not None and abs(change) < FLAT_CHANGE) or end == start:
+        direction = "flat"
+    else:
+        direction = "up" if end > start else "down"
+    return {
+        "days": int(len(days)),
+        "direction": direction,
+        "slope_per_day": round(float(slope), 4),
+        "slope_per_week": round(float(slope) * 7, 2),
+        "start_value": round(start, 2),
+        "end_value": round(end, 2),
+        "change_pct": None if change is None else round(100 * change, 1),
+        "r2": round(r2, 3),
+    }
@@ -0,0 +1,33 @@
+"""
+Columnar query results.
+
+:func:`fetch_table` runs a query and returns the result as an Arrow table
+with each column in one contiguous chunk; :func:`numpy_column` exposes a
+column as a NumPy array over the same buffer (no copy for null-free numeric
+and timestamp columns). Series-returning queries go through these instead of
+``fetchall()``/``fetchnumpy()``, so a large result never becomes per-row
+Python objects and can be downsampled or serialized (Arrow IPC) as is.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pyarrow as pa
+
+
+def fetch_table(con, sql: str, params: Sequence = ()) -> pa.Table:
+    """Result of ``sql`` as an Arrow table, one chunk per column."""
+    result = con.execute(sql, params)
+    # to_arrow_table() replaces fetch_arrow_table() from DuckDB 1.5 on.
+    fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+    return fetch().combine_chunks()
+
+
+def numpy_column(table: pa.Table, name: str) -> np.ndarray:
+    """Column ``name`` as a read-only NumPy array, zero-copy when it has no nulls."""
+    column = table.column(name)
+    # combine_chunks() copies even a single chunk; only empty results have none.
+    array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    return array.to_numpy(zero_copy_only=False)
@@ -0,0 +1,101 @@
+"""
+Result cache of the health tools.
+
+Keys are (dataset path, dataset fingerprint, tool, normalized arguments). The
+fingerprint is the engine's listing of file sizes and mtimes, re-listed on
+every lookup (the engine's own re-check interval doesn't apply), so
+re-ingesting a dataset changes every key for it and a stale answer can't be
+served: old entries simply age out of the LRU. Dates in the arguments are normalized to
+UTC ISO strings, so '2024-01-01', '2024-01-01T00:00:00' and a datetime share
+an entry; other arguments (period labels included) are kept verbatim.
+
+``HEALTH_CACHE_SIZE`` bounds the in-memory entries (0 disables the cache);
+``HEALTH_CACHE_PATH`` additionally persists them to a SQLite file.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from src.health.dataset import _utc
+from src.health.engine import get_engine
+from src.utils.lru_cache import LRUCache
+
+CACHE_SIZE = int(os.getenv("HEALTH_CACHE_SIZE", "2048"))
+CACHE_PATH = os.getenv("HEALTH_CACHE_PATH") or None
+# Arguments compared as instants: '2024-01-01' and '2024-01-01T00:00:00' share an entry.
+DATE_ARGS = ("start_date", "end_date")
+
+_CACHE: Optional[LRUCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def health_cache() -> Optional[LRUCache]:
+    """The process-wide cache, or None when disabled."""
+    global _CACHE
+    if CACHE_SIZE <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LRUCache(CACHE_SIZE, path=CACHE_PATH, name="health")
+        return _CACHE
+
+
+def reset_cache() -> None:
+    """Drop the process-wide cache (tests, maintenance scripts)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is not None:
+            _CACHE.close()
+        _CACHE = None
+
+
+def cache_stats() -> Dict[str, Any]:
+    cache = health_cache()
+    return cache.stats() if cache is not None else {"name": "health", "disabled": True}
+
+
+def normalize(value: Any, key: Optional[str] = None) -> Any:
+    """
+    JSON-able form of tool arguments with the dates (``DATE_ARGS``, also
+    inside lists of periods) as UTC ISO strings; every other value is kept as
+    given, so labels that look like dates stay distinct.
+    """
+    if key in DATE_ARGS:
+        if isinstance(value, datetime):
+            return _utc(value).isoformat()
+        if isinstance(value, str):
+            try:
+                return _utc(datetime.fromisoformat(value)).isoformat()
+            except ValueError:
+                return value
+    if isinstance(value, dict):
+        return {str(k): normalize(v, str(k)) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def cache_key(path: str, tool: str, args: Dict[str, Any]) -> str:
+    engine = get_engine(path)
+    # Listed on every lookup, not throttled: a fingerprint up to CHECK_INTERVAL_S
+    # old would serve (and re-store) results from before another process's write.
+    engine.refresh(check=True)
+    return json.dumps([str(engine.path), engine.fingerprint, tool, normalize(args)], sort_keys=True, default=str)
+
+
+def cached(path: str, tool: str, args: Dict[str, Any], compute: Callable[[], Any]) -> Any:
+    """
+    Result of ``compute()`` for ``tool(path, **args)``, from the cache when possible.
+
+    Callers get their own copy, so mutating a result never alters the cache.
+    """
+    cache = health_cache()
+    if cache is None:
+        return compute()
+    return copy.deepcopy(cache.get_or_compute(cache_key(path, tool, args), compute))
@@ -0,0 +1,180 @@
+"""
+Catalog of a health dataset: what it holds, without scanning it.
+
+Stored as ``<data_path>/_catalog.json`` and derived from the daily rollup, so
+building it reads only the (small) rollup files::
+
+    {"version": 1, "fingerprint": "...", "rows": 123456,
+     "start": "2022-11-01", "end": "2025-06-30",          # first/last UTC day
+     "types": {"HKQuantityTypeIdentifierStepCount":
+                 {"units": ["count"], "rows": 5000, "start": "...", "end": "..."}},
+     "partitions": {"year=2024/month=1":
+                 {"rows": 900, "start": "2024-01-01", "end": "2024-01-31", "types": [...]}}}
+
+The ``fingerprint`` is the one of the raw files it describes; a catalog with
+another fingerprint is stale and gets rebuilt.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import duckdb
+
+from src.health.dataset import FileStats, _utc, fingerprint, parquet_list, scan_files
+from src.health.rollup import refresh_rollup, rollup_files, rollup_root
+
+log = logging.getLogger("chat.health")
+
+CATALOG = "_catalog.json"
+CATALOG_VERSION = 1
+
+
+@dataclass
+class Catalog:
+    fingerprint: str
+    rows: int = 0
+    start: Optional[str] = None
+    end: Optional[str] = None
+    types: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    partitions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    def clamp(self, start_ts: datetime, end_ts: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """
+        ``[start_ts, end_ts)`` narrowed to the days with data, or None when no
+        partition has data in it. Clamped bounds fall on UTC midnights, so the
+        answer is unchanged (and the rollup can serve it).
+        """
+        if self.start is None:
+            return None
+        first, last = _midnight(self.start, start_ts), _midnight(self.end, start_ts) + timedelta(days=1)
+        if _utc(start_ts) < _utc(first):
+            start_ts = first
+        if _utc(end_ts) > _utc(last):
+            end_ts = last
+        if _utc(start_ts) >= _utc(end_ts):
+            return None
+        lo, hi = _days(start_ts, end_ts)
+        if not any(p["start"] <= hi and p["end"] >= lo for p in self.partitions.values()):
+            return None
+        return start_ts, end_ts
+
+    def has_types(self, types: Sequence[str], start_ts: datetime, end_ts: datetime) -> bool:
+        """True when any of ``types`` has records on a day of ``[start_ts, end_ts)``."""
+        lo, hi = _days(start_ts, end_ts)
+        return any(t in self.types and self.types[t]["start"] <= hi and self.types[t]["end"] >= lo for t in types)
+
+
+def _days(start_ts: datetime, end_ts: datetime) -> Tuple[str, str]:
+    """First and last UTC day (ISO) touched by ``[start_ts, end_ts)``."""
+    return _utc(start_ts).date().isoformat(), (_utc(end_ts) - timedelta(microseconds=1)).date().isoformat()
+
+
+def _midnight(day: str, like: datetime) -> datetime:
+    """UTC midnight of ``day``, naive or aware like ``like``."""
+    ts = datetime.combine(date.fromisoformat(day), time())
+    return ts if like.tzinfo is None else ts.replace(tzinfo=timezone.utc)
+
+
+def build_catalog(root: str | Path, stats: FileStats | None = None) -> Catalog:
+    """Catalog of ``root`` computed from its daily rollup (refreshed first)."""
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    catalog = Catalog(fingerprint=fingerprint(stats))
+    if not stats:
+        return catalog
+    refresh_rollup(root, stats)
+    files = rollup_files(root)
+    if not files:
+        return catalog
+
+    out = rollup_root(root)
+    con = duckdb.connect(database=":memory:")
+    con.execute("SET TimeZone = 'UTC'")
+    try:
+        source = f"read_parquet({parquet_list(files)}, filename=true, hive_partitioning=false)"
+        for t, units, rows, first, last in con.execute(f"""
+            SELECT type, list(DISTINCT unit ORDER BY unit) FILTER (WHERE unit IS NOT NULL),
+                   SUM(count), MIN(day)::DATE, MAX(day)::DATE
+            FROM {source} WHERE type IS NOT NULL GROUP BY type ORDER BY type
+        """).fetchall():
+            catalog.types[t] = {"units": units or [], "rows": int(rows), "start": first.isoformat(), "end": last.isoformat()}
+        for filename, rows, first, last, types in con.execute(f"""
+            SELECT filename, SUM(count), MIN(day)::DATE, MAX(day)::DATE, list(DISTINCT type ORDER BY type)
+            FROM {source} GROUP BY filename
+        """).fetchall():
+            part = Path(os.path.relpath(filename, out)).parent.as_posix()
+            catalog.partitions[part] = {
+                "rows": int(rows), "start": first.isoformat(), "end": last.isoformat(),
+                "types": [t for t in types if t is not None],
+            }
+    finally:
+        con.close()
+    catalog.partitions = dict(sorted(catalog.partitions.items()))
+    catalog.rows = sum(p["rows"] for p in catalog.partitions.values())
+    catalog.start = min((p["start"] for p in catalog.partitions.values()), default=None)
+    catalog.end = max((p["end"] for p in catalog.partitions.values()), default=None)
+    return catalog
+
+
+def read_catalog(root: str | Path) -> Optional[Catalog]:
+    try:
+        data = json.loads((Path(root) / CATALOG).read_text())
+    except (OSError, ValueError):
+        return None
+    if data.pop("version", None) != CATALOG_VERSION:
+        return None
+    try:
+        return Catalog(**data)
+    except TypeError:
+        return None
+
+
+def write_catalog(root: str | Path, catalog: Catalog) -> None:
+    root = Path(root)
+    tmp = root / (CATALOG + ".tmp")
+    tmp.write_text(json.dumps({"version": CATALOG_VERSION, **asdict(catalog)}, indent=2, sort_keys=True))
+    os.replace(tmp, root / CATALOG)
+
+
+def refresh_catalog(root: str | Path, stats: FileStats | None = None) -> Catalog:
+    """
+    The up-to-date catalog of ``root``: read from disk when its fingerprint
+    matches the files, otherwise rebuilt and (when writable) saved.
+    """
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    current = read_catalog(root)
+    if current is not None and current.fingerprint == fingerprint(stats):
+        return current
+    catalog = build_catalog(root, stats)
+    try:
+        write_catalog(root, catalog)
+    except OSError:
+        log.warning("health catalog of %s could not be saved", root, exc_info=True)
+    return catalog
+
+
+def metric_coverage(catalog: Catalog, metrics) -> List[Dict[str, Any]]:
+    """Registry metrics with data in ``catalog``: name, unit, rows and first/last day."""
+    out = []
+    for m in metrics:
+        present = [catalog.types[t] for t in m.types if t in catalog.types]
+        if not present:
+            continue
+        out.append({
+            "metric": m.name,
+            "unit": m.unit or (present[0]["units"][0] if present[0]["units"] else None),
+            "rows": sum(p["rows"] for p in present),
+            "start": min(p["start"] for p in present),
+            "end": max(p["end"] for p in present),
+        })
+    return out
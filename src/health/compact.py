@@ -0,0 +1,255 @@
+"""
+Compaction of a health dataset's ``year=/month=`` partitions.
+
+Every ingest run adds one file per partition it touches (and pandas'
+partitioned writer adds one per write), so a dataset that is re-exported
+often ends up with many small files per month; every query then lists and
+reads the footer of each. :func:`compact_dataset` rewrites each such
+partition into as few files as ``target_rows`` allows, rows sorted by
+(``@type``, ``@startDate``) in row groups sized like the ingest writer's,
+with fresh column statistics, so type + date filters skip most of a file.
+
+Records are only rearranged, never changed: the rollups, cube and catalog
+are refreshed for the new files (the dataset fingerprint changes) and give
+the same answers.
+
+A partition is swapped through a journal under ``_compact/<run>/`` (skipped
+by every reader, like the other ``_`` directories): the new files are
+written under ``.tmp`` names, the journal listing old and new files is
+published, the old files are moved into the run's ``trash/`` and only then
+are the new ones published, so a crash never leaves a record counted twice.
+:func:`recover_compactions` (run by compaction and ingestion before they
+start) finishes a journalled swap, or rolls it back when its new files are
+gone, and removes the files of a run that died before its journal. Run it
+while nothing is ingesting into the dataset.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from src.health.catalog import refresh_catalog
+from src.health.cube import refresh_cube
+from src.health.dataset import FileStats, scan_files
+from src.health.layout import (
+    DATE_FORMAT,
+    DICTIONARY_COLUMNS,
+    TYPED,
+    auto_row_group_size,
+    column_type,
+    parse_dates,
+    read_layout,
+    sort_typed,
+)
+from src.health.rollup import partitions, refresh_rollup
+
+log = logging.getLogger("chat.health")
+
+# Rows per compacted file; a month of minute-level records for a handful of
+# types stays in one file.
+TARGET_FILE_ROWS = int(os.getenv("HEALTH_COMPACT_FILE_ROWS", "1000000"))
+JOURNAL_DIR = "_compact"
+JOURNAL = "swap.json"
+
+
+@dataclass
+class CompactStats:
+    """What a compaction rewrote."""
+
+    partitions: int = 0
+    partitions_compacted: int = 0
+    files_before: int = 0
+    files_after: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    rows: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    def summary(self) -> str:
+        return (
+            f"{self.partitions_compacted}/{self.partitions} partitions compacted, "
+            f"files {self.files_before:,} -> {self.files_after:,}, "
+            f"{self.bytes_before / 1e6:.1f} MB -> {self.bytes_after / 1e6:.1f} MB, "
+            f"{self.rows:,} rows rewritten, {self.seconds:.1f}s"
+        )
+
+
+def _read_partition(root: Path, files: List[str], layout: str) -> pa.Table:
+    """
+    All rows of a partition's files, each file cast to the layout's column
+    types (``column_type``) first: files written by pandas or older ingests
+    differ in date units and time zones, and each has its own dictionaries.
+    """
+    tables = []
+    for rel in sorted(files):
+        table = pq.read_table(root / rel).replace_schema_metadata(None)
+        for i, name in enumerate(table.column_names):
+            col = table.column(name)
+            if pa.types.is_dictionary(col.type):
+                col = pc.cast(col, col.type.value_type)
+            target = column_type(layout, name)
+            if pa.types.is_timestamp(target):
+                col = parse_dates(col)
+            elif pa.types.is_timestamp(col.type):  # a raw date column pandas wrote as a timestamp
+                seconds = pc.cast(parse_dates(col), pa.timestamp("s", tz="UTC"), safe=False)  # %S has no fraction
+                col = pc.strftime(seconds, format=DATE_FORMAT)
+            elif col.type != target:
+                col = pc.cast(col, target)
+            table = table.set_column(i, name, col)
+        tables.append(table)
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def _sorted(table: pa.Table, layout: str) -> pa.Table:
+    if layout == TYPED:
+        return sort_typed(table)
+    return table.sort_by([(c, "ascending") for c in ("@type", "@startDate") if c in table.column_names])
+
+
+def _needs_compaction(root: Path, files: FileStats, target_rows: int) -> bool:
+    rows = sum(pq.ParquetFile(root / rel).metadata.num_rows for rel in files)
+    return len(files) > max(1, math.ceil(rows / target_rows))
+
+
+def _publish_json(path: Path, data: Dict) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def _finish_swap(root: Path, run_dir: Path, swap: Dict) -> None:
+    """Move the old files into the run's trash, publish the new ones, drop the run (each step idempotent)."""
+    for rel in swap["old"]:
+        if (root / rel).exists():
+            (run_dir / "trash" / rel).parent.mkdir(parents=True, exist_ok=True)
+            os.replace(root / rel, run_dir / "trash" / rel)
+    for rel in swap["new"]:
+        tmp = (root / rel).with_suffix(".parquet.tmp")
+        if tmp.exists():
+            os.replace(tmp, root / rel)
+    shutil.rmtree(run_dir)
+
+
+def _roll_back_swap(root: Path, run_dir: Path, swap: Dict) -> None:
+    """Put the old files back and remove whatever was published of the new ones."""
+    for rel in swap["new"]:
+        (root / rel).unlink(missing_ok=True)
+        (root / rel).with_suffix(".parquet.tmp").unlink(missing_ok=True)
+    for rel in swap["old"]:
+        if (run_dir / "trash" / rel).exists():
+            os.replace(run_dir / "trash" / rel, root / rel)
+    shutil.rmtree(run_dir)
+
+
+def recover_compactions(root: str | Path) -> int:
+    """
+    Complete the swaps an interrupted compaction of ``root`` left behind:
+    a journalled swap is finished when all its new files are there (as
+    ``.tmp`` or published) and rolled back otherwise; the ``.tmp`` files of a
+    run that died before its journal are deleted. Returns the swaps handled.
+    """
+    root = Path(root)
+    journals = root / JOURNAL_DIR
+    handled = 0
+    if journals.is_dir():
+        for run_dir in sorted(p for p in journals.iterdir() if p.is_dir()):
+            try:
+                swap = json.loads((run_dir / JOURNAL).read_text())
+            except (OSError, ValueError):
+                shutil.rmtree(run_dir)  # died before its journal: the old files are untouched
+                continue
+            complete = all((root / rel).exists() or (root / rel).with_suffix(".parquet.tmp").exists() for rel in swap["new"])
+            (_finish_swap if complete else _roll_back_swap)(root, run_dir, swap)
+            log.warning("health compaction of %s: %s interrupted swap of %s", root, "finished" if complete else "rolled back", swap["part"])
+            handled += 1
+    for tmp in root.glob("year=*/month=*/part-compact-*.parquet.tmp"):
+        tmp.unlink()
+    return handled
+
+
+def compact_partition(root: str | Path, part: str, files: FileStats, layout: str, target_rows: int = TARGET_FILE_ROWS) -> List[str]:
+    """
+    Rewrite the ``files`` of partition ``part`` (e.g. 'year=2024/month=1')
+    into sorted files of at most ``target_rows`` rows. Returns the new files
+    (relative to ``root``).
+    """
+    root = Path(root)
+    table = _sorted(_read_partition(root, list(files), layout), layout)
+    run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    chunks = max(1, math.ceil(table.num_rows / target_rows))
+    use_dictionary = [c for c in DICTIONARY_COLUMNS if c in table.column_names] if layout == TYPED else True
+    written = []
+    for i in range(chunks):
+        chunk = table.slice(i * target_rows, target_rows)
+        final = root / part / f"part-compact-{run_id}-{i}.parquet"
+        pq.write_table(
+            chunk,
+            final.with_suffix(".parquet.tmp"),
+            compression="snappy",
+            row_group_size=auto_row_group_size(chunk.num_rows),
+            use_dictionary=use_dictionary,
+            write_statistics=True,
+        )
+        written.append(os.path.relpath(final, root))
+    run_dir = root / JOURNAL_DIR / run_id
+    run_dir.mkdir(parents=True)
+    swap = {"part": part, "old": sorted(files), "new": written}
+    _publish_json(run_dir / JOURNAL, swap)
+    _finish_swap(root, run_dir, swap)
+    return written
+
+
+def compact_dataset(
+    root: str | Path, target_rows: int = TARGET_FILE_ROWS, force: bool = False, refresh: bool = True
+) -> CompactStats:
+    """
+    Compact every partition of ``root`` holding more files than its rows
+    need (every partition with ``force``), then refresh the rollups, cube and
+    catalog for the new files unless ``refresh`` is False.
+    """
+    root = Path(root)
+    if target_rows < 1:
+        raise ValueError("target_rows must be positive")
+    recover_compactions(root)
+    layout = read_layout(root)
+    stats = CompactStats()
+    grouped: Dict[str, FileStats] = partitions(scan_files(root))
+    stats.partitions = len(grouped)
+    for part, files in sorted(grouped.items()):
+        size = sum(st[0] for st in files.values())
+        stats.files_before += len(files)
+        stats.bytes_before += size
+        if not force and not _needs_compaction(root, files, target_rows):
+            stats.files_after += len(files)
+            stats.bytes_after += size
+            continue
+        written = compact_partition(root, part, files, layout, target_rows)
+        stats.partitions_compacted += 1
+        stats.files_after += len(written)
+        stats.bytes_after += sum((root / rel).stat().st_size for rel in written)
+        stats.rows += sum(pq.ParquetFile(root / rel).metadata.num_rows for rel in written)
+    if refresh and stats.partitions_compacted:
+        refresh_rollup(root)
+        refresh_cube(root)
+        refresh_catalog(root)
+    stats.finished = time.monotonic()
+    log.info("health compaction of %s: %s", root, stats.summary())
+    return stats
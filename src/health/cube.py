@@ -0,0 +1,176 @@
+"""
+Week and month aggregates of every registry metric.
+
+``<data_path>/_rollup/cube/cube.parquet`` holds one row per (grain, start,
+metric), grain ``week`` (ISO weeks, from Monday) or ``month``, with what
+:func:`~src.health.query.period_stats` needs to combine whole periods
+exactly: the metric's day count, the total of its daily values and its
+highest and lowest day. A range spanning years then reads a few dozen cube
+rows plus the daily rows of its ragged edges.
+
+The cube is computed from the daily rollup (never from raw records), so
+refreshing it after an ingest costs a scan of the rollup only. Its manifest
+records the fingerprint of the raw files and the registry signature it was
+built from; either changing triggers a rebuild, and readers ignore a cube
+whose signature doesn't match the running registry.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import duckdb
+
+from src.health.dataset import FileStats, fingerprint, parquet_list, scan_files, sql_str
+from src.health.metrics import METRICS, Metric
+from src.health.rollup import ROLLUP_DIR, refresh_rollup, rollup_files
+
+log = logging.getLogger("chat.health")
+
+CUBE_DIR = "cube"
+CUBE_FILE = "cube.parquet"
+CUBE_VERSION = 1
+GRAINS = ("week", "month")
+
+_DAILY_VALUE = "CASE agg WHEN 'sum' THEN s WHEN 'avg' THEN s / c WHEN 'max' THEN mx ELSE mn END"
+
+
+def max_day_sql(day: str, v: str) -> str:
+    """Day of the highest ``v``; ties go to the earliest day, so every plan of a range agrees."""
+    return f"arg_max({day}, ({v}, -epoch({day})))"
+
+
+def min_day_sql(day: str, v: str) -> str:
+    return f"arg_min({day}, ({v}, epoch({day})))"
+
+
+def registry_signature(metrics: Sequence[Metric] | None = None) -> str:
+    """Hash of the metric definitions; a cube built for another registry is stale."""
+    metrics = METRICS.values() if metrics is None else metrics
+    return hashlib.sha1(repr(sorted(metrics, key=lambda m: m.name)).encode()).hexdigest()
+
+
+def cube_root(root: str | Path) -> Path:
+    return Path(root) / ROLLUP_DIR / CUBE_DIR
+
+
+def cube_file(root: str | Path) -> Optional[Path]:
+    path = cube_root(root) / CUBE_FILE
+    return path if path.exists() else None
+
+
+def metric_params(metrics: Sequence[Metric]) -> List:
+    """Parameters of the ``m`` mapping in :func:`daily_values_sql`."""
+    return [p for m in metrics for t in m.types for p in (m.name, t, m.unit, m.daily, m.fill_days)]
+
+
+def daily_values_sql(metrics: Sequence[Metric], daily: str) -> str:
+    """
+    CTEs turning per-day/per-type rows into per-day metric values.
+
+    ``daily`` selects (period, day, type, unit, sum, count, min, max); the
+    last CTE, ``filled``, has (period, day, metric, v). fill_days metrics get
+    every day with any record (0 when the metric has none), the others only
+    their own days. Takes :func:`metric_params` after ``daily``'s parameters.
+    """
+    mapping = ", ".join("(?, ?, ?, ?, ?)" for m in metrics for _ in m.types)
+    return f"""
+    d AS (
+      {daily}
+    ),
+    m(metric, type, unit, agg, fill) AS (VALUES {mapping}),
+    per_day AS (
+      SELECT d.period, d.day, m.metric, any_value(m.agg) AS agg,
+             SUM(d.sum) AS s, SUM(d.count) AS c, MAX(d.max) AS mx, MIN(d.min) AS mn
+      FROM d JOIN m ON d.type = m.type AND (m.unit IS NULL OR d.unit = m.unit)
+      GROUP BY d.period, d.day, m.metric
+    ),
+    vals AS (
+      SELECT period, day, metric, {_DAILY_VALUE} AS v FROM per_day
+    ),
+    filled AS (
+      -- fill_days metrics: every day with any record, 0 when the metric is missing
+      SELECT x.period, x.day, f.metric, COALESCE(vals.v, 0) AS v
+      FROM (SELECT DISTINCT period, day FROM d) x
+      CROSS JOIN (SELECT DISTINCT metric FROM m WHERE fill) f
+      LEFT JOIN vals ON vals.period = x.period AND vals.day = x.day AND vals.metric = f.metric
+      UNION ALL
+      SELECT period, day, metric, v FROM vals
+      WHERE v IS NOT NULL AND metric IN (SELECT metric FROM m WHERE NOT fill)
+    )"""
+
+
+def build_cube(root: str | Path, target: Path) -> None:
+    """Write the cube of ``root``'s daily rollup to ``target``."""
+    metrics = list(METRICS.values())
+    source = f"SELECT 0 AS period, day, type, unit, sum, count, min, max FROM read_parquet({parquet_list(rollup_files(root))}, hive_partitioning=false)"
+    grains = "\n      UNION ALL\n      ".join(
+        f"SELECT '{g}' AS grain, date_trunc('{g}', day) AS start, metric, day, v FROM filled" for g in GRAINS
+    )
+    sql = f"""
+    WITH {daily_values_sql(metrics, source)},
+    g AS (
+      {grains}
+    )
+    SELECT grain, start, metric, COUNT(*) AS days, SUM(v) AS total,
+           {max_day_sql('day', 'v')} AS max_day, MAX(v) AS max, {min_day_sql('day', 'v')} AS min_day, MIN(v) AS min
+    FROM g
+    GROUP BY grain, start, metric
+    ORDER BY grain, metric, start
+    """
+    con = duckdb.connect(database=":memory:")
+    con.execute("SET TimeZone = 'UTC'")
+    try:
+        # COPY takes no parameters: materialize first.
+        con.execute(f"CREATE TEMP TABLE cube AS {sql}", metric_params(metrics))
+        con.execute(f"COPY cube TO {sql_str(str(target))} (FORMAT parquet)")
+    finally:
+        con.close()
+
+
+def _load_manifest(out: Path) -> dict:
+    try:
+        data = json.loads((out / "_manifest.json").read_text())
+    except (OSError, ValueError):
+        return {}
+    return data if data.get("version") == CUBE_VERSION else {}
+
+
+def refresh_cube(root: str | Path, stats: FileStats | None = None) -> bool:
+    """
+    Rebuild the cube of ``root`` when its files or the metric registry changed.
+
+    Returns True when the cube was rewritten (or removed, for an empty dataset).
+    """
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    out = cube_root(root)
+    wanted = {"version": CUBE_VERSION, "fingerprint": fingerprint(stats), "metrics": registry_signature()}
+    if _load_manifest(out) == wanted and (cube_file(root) is not None or not stats):
+        return False
+
+    refresh_rollup(root, stats)
+    out.mkdir(parents=True, exist_ok=True)
+    target = out / CUBE_FILE
+    if rollup_files(root):
+        tmp = target.with_suffix(".parquet.tmp")
+        build_cube(root, tmp)
+        os.replace(tmp, target)
+    else:
+        target.unlink(missing_ok=True)
+    tmp = out / "_manifest.json.tmp"
+    tmp.write_text(json.dumps(wanted, indent=2, sort_keys=True))
+    os.replace(tmp, out / "_manifest.json")
+    log.info("health cube refreshed: %s", root)
+    return True
+
+
+def cube_signature(root: str | Path) -> Optional[str]:
+    """Registry signature of the cube on disk, or None when there is none."""
+    return _load_manifest(cube_root(root)).get("metrics") if cube_file(root) is not None else None
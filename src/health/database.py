@@ -0,0 +1,152 @@
+"""
+Persistent DuckDB database of a health dataset (``HEALTH_ENGINE_MODE=persistent``).
+
+``<data_path>/_health-<fingerprint>.duckdb`` holds native copies of what the
+in-memory engine exposes as views, so planning statistics, compression and
+sort order survive restarts and are shared by every worker process (all open
+it read-only):
+
+``health``        — the records, ``@value`` as DOUBLE (``@valueText`` keeps
+                    non-numeric values), sorted by (``@type``, ``@startDate``),
+                    with ``year``/``month`` columns for partition filters.
+``health_daily``  — the daily rollup, sorted by (``type``, ``day``) and indexed.
+``health_hourly`` — the hourly rollup, sorted by (``type``, ``hour``).
+``health_cube``   — the week/month metric cube (``src.health.cube``).
+``_meta``         — version, the fingerprint of the Parquet files it was
+                    built from and the registry signature of the cube.
+
+The file name carries the fingerprint of the Parquet files, so a changed
+dataset gets a new file instead of an overwrite: DuckDB caches open databases
+per path, and processes still reading the old file keep a consistent view
+until they refresh. Builds go to a temporary file renamed into place, so
+readers never see a half-built database; superseded files are deleted.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import duckdb
+
+from src.health.dataset import FileStats, fingerprint, is_hive_partitioned, parquet_list, scan_files
+from src.health.cube import cube_file, cube_signature, refresh_cube
+from src.health.layout import TYPED, read_layout
+from src.health.rollup import refresh_rollup, rollup_files
+
+log = logging.getLogger("chat.health")
+
+DB_PREFIX = "_health-"
+DB_SUFFIX = ".duckdb"
+DB_VERSION = 2
+
+
+def database_path(root: str | Path, fp: str) -> Path:
+    return Path(root) / f"{DB_PREFIX}{fp[:16]}{DB_SUFFIX}"
+
+
+def stored_fingerprint(db: str | Path) -> Optional[str]:
+    """Fingerprint recorded in ``db``, or None when missing, unreadable or outdated."""
+    if not Path(db).exists():
+        return None
+    try:
+        con = duckdb.connect(str(db), read_only=True)
+    except duckdb.Error:
+        return None
+    try:
+        meta = read_meta(con)
+    finally:
+        con.close()
+    if meta.get("version") != str(DB_VERSION):
+        return None
+    return meta.get("fingerprint")
+
+
+def read_meta(con: duckdb.DuckDBPyConnection) -> Dict[str, str]:
+    try:
+        return dict(con.execute("SELECT key, value FROM _meta").fetchall())
+    except duckdb.Error:
+        return {}
+
+
+def build_database(root: str | Path, stats: FileStats | None = None) -> Path:
+    """Build the database of ``root`` for its current files and return its path."""
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    if not stats:
+        raise FileNotFoundError(f"no Parquet files under {root}")
+    refresh_rollup(root, stats)
+    refresh_cube(root, stats)
+    fp = fingerprint(stats)
+    target = database_path(root, fp)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    for leftover in (tmp, Path(f"{tmp}.wal")):
+        leftover.unlink(missing_ok=True)
+
+    hive = is_hive_partitioned(stats)
+    source = f"read_parquet({parquet_list(root / rel for rel in sorted(stats))}, hive_partitioning={'true' if hive else 'false'}, union_by_name=true)"
+    value = "" if read_layout(root) == TYPED else (
+        ' REPLACE (TRY_CAST("@value" AS DOUBLE) AS "@value"),'
+        ' CASE WHEN TRY_CAST("@value" AS DOUBLE) IS NULL THEN CAST("@value" AS VARCHAR) END AS "@valueText"'
+    )
+    partitions = "" if hive else ', year("@startDate") AS year, month("@startDate") AS month'
+
+    con = duckdb.connect(str(tmp))
+    try:
+        con.execute("SET TimeZone = 'UTC'")
+        con.execute(f'CREATE TABLE health AS SELECT *{value}{partitions} FROM {source} ORDER BY "@type", "@startDate"')
+        con.execute(f"""
+            CREATE TABLE health_daily AS
+            SELECT day, type, unit, sum, count, min, max, year(day) AS year, month(day) AS month
+            FROM read_parquet({parquet_list(rollup_files(root))}, hive_partitioning=false)
+            ORDER BY type, day
+        """)
+        con.execute("CREATE INDEX health_daily_type_day ON health_daily (type, day)")
+        con.execute(f"""
+            CREATE TABLE health_hourly AS
+            SELECT hour, type, unit, sum, count, min, max, year(hour) AS year, month(hour) AS month
+            FROM read_parquet({parquet_list(rollup_files(root, "hourly"))}, hive_partitioning=false)
+            ORDER BY type, hour
+        """)
+        meta = [("version", str(DB_VERSION)), ("fingerprint", fp), ("built_at", datetime.now(timezone.utc).isoformat())]
+        cube = cube_file(root)
+        if cube is not None:
+            con.execute(f"CREATE TABLE health_cube AS SELECT * FROM read_parquet({parquet_list([cube])})")
+            meta.append(("metrics", cube_signature(root)))
+        con.execute("CREATE TABLE _meta (key VARCHAR PRIMARY KEY, value VARCHAR)")
+        con.executemany("INSERT INTO _meta VALUES (?, ?)", meta)
+        con.execute("CHECKPOINT")
+    except BaseException:
+        con.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    con.close()
+    os.replace(tmp, target)
+    for old in root.glob(f"{DB_PREFIX}*{DB_SUFFIX}"):
+        if old != target:
+            old.unlink(missing_ok=True)
+    log.info("health database built: %s (%d files)", target, len(stats))
+    return target
+
+
+def ensure_database(root: str | Path, stats: FileStats | None = None) -> Path:
+    """Path of an up-to-date database for ``root``, building it only when stale."""
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    fp = fingerprint(stats)
+    db = database_path(root, fp)
+    if stored_fingerprint(db) == fp:
+        return db
+    return build_database(root, stats)
+
+
+def connect(db: str | Path) -> duckdb.DuckDBPyConnection:
+    """Read-only connection to a health database, with the engine's session settings."""
+    con = duckdb.connect(str(db), read_only=True)
+    con.execute("SET GLOBAL TimeZone = 'UTC'")
+    return con
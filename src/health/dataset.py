@@ -0,0 +1,106 @@
+"""
+File-level view of a health dataset: listing and fingerprinting.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+# relative path -> (size, mtime_ns)
+FileStats = Dict[str, Tuple[int, int]]
+
+
+def scan_files(root: Path) -> FileStats:
+    """
+    Stat every parquet file under ``root``.
+
+    Directories starting with '_' or '.' hold metadata (rollups, catalogs,
+    caches) and are skipped, following the Hive/Spark convention.
+    """
+    stats: FileStats = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith(("_", ".")))
+        for name in filenames:
+            if not name.endswith(".parquet") or name.startswith(("_", ".")):
+                continue
+            full = os.path.join(dirpath, name)
+            st = os.stat(full)
+            stats[os.path.relpath(full, root)] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+
+def fingerprint(stats: FileStats) -> str:
+    """Stable hash of a file listing; changes whenever any file changes."""
+    h = hashlib.sha1()
+    for rel in sorted(stats):
+        size, mtime = stats[rel]
+        h.update(f"{rel}\0{size}\0{mtime}\n".encode())
+    return h.hexdigest()
+
+
+def sql_str(s: str) -> str:
+    """Quote ``s`` as a SQL string literal."""
+    return "'" + s.replace("'", "''") + "'"
+
+
+def parquet_list(files) -> str:
+    """SQL list literal of parquet paths for ``read_parquet``."""
+    return "[" + ", ".join(sql_str(str(f)) for f in files) + "]"
+
+
+def is_hive_partitioned(stats: FileStats) -> bool:
+    """True when every file sits under a year=/month= directory pair."""
+    if not stats:
+        return False
+    for rel in stats:
+        parts = Path(rel).parts[:-1]
+        if not any(p.startswith("year=") for p in parts) or not any(p.startswith("month=") for p in parts):
+            return False
+    return True
+
+
+def partition_filter(start_ts: datetime, end_ts: datetime) -> Tuple[str, List[int]]:
+    """
+    year/month predicate covering ``[start_ts, end_ts)``.
+
+    DuckDB prunes hive partitions on plain column comparisons (not on derived
+    expressions such as ``year * 100 + month``), so the bounds are spelled out.
+    Naive timestamps are UTC, like the partition values.
+    """
+    lo = _utc(start_ts)
+    hi = _utc(end_ts) - timedelta(microseconds=1)
+    if hi < lo:
+        hi = lo
+    sql = "year BETWEEN ? AND ? AND (year > ? OR month >= ?) AND (year < ? OR month <= ?)"
+    return sql, [lo.year, hi.year, lo.year, lo.month, hi.year, hi.month]
+
+
+def partitions_filter(ranges: Sequence[Tuple[datetime, datetime]]) -> Tuple[str, List[int]]:
+    """
+    year/month predicate covering several ranges: ``year IN (..) AND month IN (..)``.
+
+    OR-ing :func:`partition_filter` per range defeats DuckDB's partition
+    pruning; plain IN lists keep it (possibly opening a few extra partitions,
+    which the callers' exact bounds then filter).
+    """
+    years, months = set(), set()
+    for start_ts, end_ts in ranges:
+        lo, hi = _utc(start_ts), max(_utc(start_ts), _utc(end_ts) - timedelta(microseconds=1))
+        y, m = lo.year, lo.month
+        while (y, m) <= (hi.year, hi.month):
+            years.add(y)
+            months.add(m)
+            y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    ys, ms = sorted(years), sorted(months)
+    sql = f"year IN ({', '.join('?' for _ in ys)}) AND month IN ({', '.join('?' for _ in ms)})"
+    return sql, ys + ms
+
+
+def _utc(ts: datetime) -> datetime:
+    if ts.tzinfo is None:
+        return ts
+    return ts.astimezone(timezone.utc).replace(tzinfo=None)
@@ -0,0 +1,238 @@
+"""
+Process-wide DuckDB engines for the persona health datasets.
+
+Each dataset path (a persona's ``data_path``) gets one long-lived in-memory
+DuckDB database holding a ``health`` view over its Parquet files. Tools never
+share a connection: they ask the engine for a cursor, which is a separate
+connection to the same database and safe to use from its own thread.
+
+The engine re-lists the dataset at most every ``HEALTH_ENGINE_CHECK_INTERVAL``
+seconds and rebuilds the views when a file is added, removed or rewritten,
+refreshing the hourly and daily rollups (``health_hourly``, ``health_daily``)
+for the partitions that changed, the week/month metric cube (``health_cube``)
+and the dataset catalog (``engine.catalog``).
+
+With ``HEALTH_ENGINE_MODE=persistent`` the engine instead opens the dataset's
+``_health-<fingerprint>.duckdb`` file read-only (building it when missing, see
+``src.health.database``), where the same relations are native tables; it falls back to in-memory views when the file can't be built.
+
+``HEALTH_DUCKDB_THREADS`` and ``HEALTH_DUCKDB_MEMORY_LIMIT`` (e.g. ``1GB``)
+cap what each engine's queries may use.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import duckdb
+
+from src.health import database
+from src.health.catalog import Catalog, refresh_catalog
+from src.health.cube import cube_file, cube_signature, refresh_cube
+from src.health.dataset import FileStats, fingerprint, is_hive_partitioned, parquet_list, scan_files, sql_str
+from src.health.executor import track_cursor
+from src.health.layout import RAW, TYPED, read_layout
+from src.health.rollup import refresh_rollup, rollup_files
+
+log = logging.getLogger("chat.health")
+
+CHECK_INTERVAL_S = float(os.getenv("HEALTH_ENGINE_CHECK_INTERVAL", "2.0"))
+MEMORY = "memory"
+PERSISTENT = "persistent"
+MODE = os.getenv("HEALTH_ENGINE_MODE", MEMORY)
+# Caps per engine, so one heavy query can't take every core or the API's memory
+# (unset = DuckDB defaults: all cores, 80% of RAM). Several datasets = several engines.
+THREADS = int(os.getenv("HEALTH_DUCKDB_THREADS", "0"))
+MEMORY_LIMIT = os.getenv("HEALTH_DUCKDB_MEMORY_LIMIT") or None
+
+
+def configure(con: duckdb.DuckDBPyConnection) -> None:
+    """Apply the engine's session settings to the database behind ``con``."""
+    # Day boundaries of the stored rollup are UTC, like the year/month partitions.
+    con.execute("SET GLOBAL TimeZone = 'UTC'")
+    if THREADS > 0:
+        con.execute(f"SET GLOBAL threads = {THREADS}")
+    if MEMORY_LIMIT:
+        con.execute(f"SET GLOBAL memory_limit = {sql_str(MEMORY_LIMIT)}")
+
+
+class HealthEngine:
+    """Long-lived DuckDB database for one health dataset."""
+
+    def __init__(self, path: str | Path, mode: str | None = None):
+        self.path = Path(path)
+        self.mode = mode or MODE
+        self._lock = threading.RLock()
+        self._memory = duckdb.connect(database=":memory:")
+        # Footers of unchanged files are read once per process, not per query.
+        self._memory.execute("SET GLOBAL parquet_metadata_cache = true")
+        configure(self._memory)
+        self._con = self._memory
+        self.database: Path | None = None
+        self.files: FileStats = {}
+        self.has_rollup = False
+        self.has_hourly = False
+        self.cube_metrics: Optional[str] = None  # registry signature of health_cube
+        self.hive_partitioned = False
+        self.layout = RAW
+        self.catalog: Optional[Catalog] = None
+        self.fingerprint: str | None = None
+        self._checked_at = 0.0
+        # True while refresh() builds views, rollups, cube and catalog (read without the lock).
+        self.building = False
+
+    # ---- freshness ----
+    def refresh(self, force: bool = False, check: bool = False) -> bool:
+        """
+        Re-list the dataset and rebuild the views if anything changed.
+
+        The listing is skipped within ``CHECK_INTERVAL_S`` of the previous one
+        unless ``check`` (list now, rebuild only on changes) or ``force``
+        (rebuild regardless) is set. Returns True when the views were (re)built.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not (force or check) and self.fingerprint is not None and now - self._checked_at < CHECK_INTERVAL_S:
+                return False
+            self._checked_at = now
+            stats = scan_files(self.path)
+            fp = fingerprint(stats)
+            if fp == self.fingerprint and not force:
+                return False
+            self.building = True
+            try:
+                self._build_views(stats)
+            finally:
+                self.building = False
+            self.files = stats
+            self.fingerprint = fp
+            return True
+
+    def _build_views(self, stats: FileStats) -> None:
+        if self.mode == PERSISTENT and stats and self._open_database(stats):
+            return
+        self._con = self._memory
+        self.database = None
+        # year/month columns let queries prune whole partitions (see partition_filter).
+        self.hive_partitioned = is_hive_partitioned(stats)
+        self.layout = read_layout(self.path)
+        hive = "true" if self.hive_partitioned else "false"
+        self._con.execute(f"""
+            CREATE OR REPLACE VIEW health AS
+            SELECT * FROM read_parquet({self._source(stats)}, filename=true, hive_partitioning={hive});
+        """)
+        self.has_rollup = self.has_hourly = False
+        self.cube_metrics = None
+        self.catalog = None
+        if not stats:
+            return
+        try:
+            refresh_rollup(self.path, stats)
+        except (OSError, duckdb.Error):
+            # Read-only or broken dataset directory: answer from raw records.
+            log.warning("health rollup unavailable for %s", self.path, exc_info=True)
+            return
+        daily = rollup_files(self.path)
+        if daily:
+            self._con.execute(f"""
+                CREATE OR REPLACE VIEW health_daily AS
+                SELECT * FROM read_parquet({parquet_list(daily)}, hive_partitioning={hive});
+            """)
+            self.has_rollup = True
+        hourly = rollup_files(self.path, "hourly")
+        if hourly:
+            self._con.execute(f"""
+                CREATE OR REPLACE VIEW health_hourly AS
+                SELECT * FROM read_parquet({parquet_list(hourly)}, hive_partitioning={hive});
+            """)
+            self.has_hourly = True
+        try:
+            refresh_cube(self.path, stats)
+            cube = cube_file(self.path)
+            if cube is not None:
+                self._con.execute(f"CREATE OR REPLACE VIEW health_cube AS SELECT * FROM read_parquet({parquet_list([cube])})")
+                self.cube_metrics = cube_signature(self.path)
+        except (OSError, duckdb.Error):
+            log.warning("health cube unavailable for %s", self.path, exc_info=True)
+        try:
+            self.catalog = refresh_catalog(self.path, stats)
+        except (OSError, duckdb.Error):
+            log.warning("health catalog unavailable for %s", self.path, exc_info=True)
+
+    def _open_database(self, stats: FileStats) -> bool:
+        try:
+            db = database.ensure_database(self.path, stats)
+            con = database.connect(db)
+            configure(con)
+        except (OSError, duckdb.Error):
+            log.warning("health database unavailable for %s; using in-memory views", self.path, exc_info=True)
+            return False
+        # The previous file's connection is left to the garbage collector:
+        # cursors handed out before the swap may still be reading from it.
+        self._con, self.database = con, db
+        self.layout, self.hive_partitioned, self.has_rollup, self.has_hourly = TYPED, True, True, True
+        self.cube_metrics = database.read_meta(con).get("metrics")
+        try:
+            self.catalog = refresh_catalog(self.path, stats)
+        except (OSError, duckdb.Error):
+            self.catalog = None
+            log.warning("health catalog unavailable for %s", self.path, exc_info=True)
+        return True
+
+    def _source(self, stats: FileStats) -> str:
+        # An explicit list saves DuckDB a glob per query; an empty dataset
+        # keeps the glob so the error message names the missing path.
+        if not stats:
+            return sql_str(f"{self.path}/**/*.parquet")
+        return parquet_list(self.path / rel for rel in sorted(stats))
+
+    # ---- connections ----
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        Return a fresh cursor on the shared database. Caller closes it.
+
+        Inside a pooled tool call (``src.health.executor``) the cursor is
+        registered with the call, so a timeout can interrupt it.
+        """
+        self.refresh()
+        with self._lock:
+            return track_cursor(self._con.cursor())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._con is not self._memory:
+                self._con.close()
+            self._memory.close()
+
+
+_ENGINES: Dict[str, HealthEngine] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_engine(path: str | Path) -> HealthEngine:
+    """Return the process-wide engine for ``path``, creating it on first use."""
+    key = str(Path(path).resolve())
+    with _ENGINES_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = HealthEngine(key)
+            _ENGINES[key] = engine
+    return engine
+
+
+def engines() -> List[HealthEngine]:
+    with _ENGINES_LOCK:
+        return list(_ENGINES.values())
+
+
+def reset_engines() -> None:
+    """Close and forget every engine (tests, maintenance scripts)."""
+    with _ENGINES_LOCK:
+        for engine in _ENGINES.values():
+            engine.close()
+        _ENGINES.clear()
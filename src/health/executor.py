@@ -0,0 +1,169 @@
+"""
+Thread-pool execution of the health tools, with timeouts and cancellation.
+
+DuckDB releases the GIL while it scans, so health queries run on a bounded
+pool (``HEALTH_TOOL_WORKERS`` threads) and an event loop awaiting them stays
+free for other users; at most that many queries compete for DuckDB at once,
+the rest wait in the pool's queue.
+
+Every call runs in its own :class:`QueryScope`. The engine registers each
+cursor it hands out in the current scope (see :func:`track_cursor`), so a
+call that outlives its timeout is cancelled by interrupting those cursors:
+the running query raises ``duckdb.InterruptException`` in the worker thread
+and later queries of the same call fail before they start.
+
+``HEALTH_TOOL_TIMEOUT`` is the default timeout in seconds (0 = none) and
+``HEALTH_TOOL_TIMEOUT_<TOOL>`` (e.g. ``HEALTH_TOOL_TIMEOUT_LONGEST_RUN``)
+overrides it for one tool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+import duckdb
+
+log = logging.getLogger("chat.health")
+
+WORKERS = int(os.getenv("HEALTH_TOOL_WORKERS", "4"))
+TIMEOUT_S = float(os.getenv("HEALTH_TOOL_TIMEOUT", "30"))
+
+
+def tool_timeout(name: str, default: Optional[float] = None) -> float:
+    """Time budget of the tool ``name``: its env override, else ``default``, else ``TIMEOUT_S``."""
+    value = os.getenv(f"HEALTH_TOOL_TIMEOUT_{name.upper()}")
+    if value:
+        return float(value)
+    return TIMEOUT_S if default is None else default
+
+
+class HealthQueryTimeout(TimeoutError):
+    """A health tool call ran past its timeout and was cancelled."""
+
+
+class QueryScope:
+    """The DuckDB cursors of one tool call, so they can be interrupted together."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursors: List[duckdb.DuckDBPyConnection] = []
+        self.cancelled = False
+
+    def track(self, con: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            if self.cancelled:
+                con.close()
+                raise HealthQueryTimeout("health query cancelled")
+            self._cursors.append(con)
+        return con
+
+    def cancel(self) -> None:
+        """Interrupt the running queries and refuse new cursors."""
+        with self._lock:
+            self.cancelled = True
+            cursors = list(self._cursors)
+        for con in cursors:
+            try:
+                con.interrupt()
+            except duckdb.Error:
+                pass  # already closed
+
+
+_SCOPE: contextvars.ContextVar[Optional[QueryScope]] = contextvars.ContextVar("health_query_scope", default=None)
+
+
+def current_scope() -> Optional[QueryScope]:
+    return _SCOPE.get()
+
+
+def track_cursor(con: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+    """Register ``con`` in the current call's scope, if any."""
+    scope = _SCOPE.get()
+    return scope.track(con) if scope is not None else con
+
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def pool() -> ThreadPoolExecutor:
+    """The process-wide pool of health query threads."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="health-query")
+        return _POOL
+
+
+def reset_pool() -> None:
+    """Shut the pool down, waiting for running calls (tests, shutdown)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=True, cancel_futures=True)
+        _POOL = None
+
+
+def submit(fn: Callable[..., Any], *args, **kwargs) -> Tuple[Future, QueryScope]:
+    """Run ``fn`` on the pool in a new scope; returns its future and scope."""
+    scope = QueryScope()
+    ctx = contextvars.copy_context()
+
+    def run():
+        _SCOPE.set(scope)
+        return fn(*args, **kwargs)
+
+    return pool().submit(ctx.run, run), scope
+
+
+def run_sync(fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    ``fn(*args, **kwargs)`` run on the pool, waiting at most ``timeout``
+    seconds (default ``TIMEOUT_S``; time queued counts).
+
+    Raises :class:`HealthQueryTimeout` and cancels the call's queries when the
+    deadline passes. Calls made from inside a pooled call run inline, so
+    nested tools can't deadlock a full pool.
+    """
+    timeout = TIMEOUT_S if timeout is None else timeout
+    if current_scope() is not None:
+        return fn(*args, **kwargs)
+    future, scope = submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout or None)
+    except TimeoutError:
+        if future.done():
+            raise  # raised by fn itself
+        future.cancel()
+        scope.cancel()
+        log.warning("health call %s cancelled after %.1fs", getattr(fn, "__name__", fn), timeout)
+        raise HealthQueryTimeout(f"health query took longer than {timeout:g}s") from None
+
+
+async def run_async(fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+    """
+    Await ``fn(*args, **kwargs)`` run on the pool.
+
+    Raises :class:`HealthQueryTimeout` after ``timeout`` seconds (default
+    ``TIMEOUT_S``; time queued counts) and cancels the call's queries; they
+    are cancelled as well when the awaiting task is.
+    """
+    timeout = TIMEOUT_S if timeout is None else timeout
+    future, scope = submit(fn, *args, **kwargs)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or None)
+    except TimeoutError:
+        if future.done() and not future.cancelled():
+            raise  # raised by fn itself
+        scope.cancel()
+        log.warning("health call %s cancelled after %.1fs", getattr(fn, "__name__", fn), timeout)
+        raise HealthQueryTimeout(f"health query took longer than {timeout:g}s") from None
+    except asyncio.CancelledError:
+        scope.cancel()
+        raise
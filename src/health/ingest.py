@@ -0,0 +1,442 @@
+"""
+Streaming ingestion of Apple Health records into a ``year=/month=`` dataset.
+
+Sources (the flattened ``export.csv`` or the native ``export.xml``) yield Arrow
+record batches of string columns (``@type``, ``@value``, ``@startDate`` ...);
+:class:`PartitionWriter` parses ``@startDate``, converts
+to the requested layout, buffers rows per partition and appends them as row
+groups to one Parquet file per partition and run. Buffered rows never exceed
+the memory budget: the largest partition buffers are flushed first.
+
+With ``incremental=True`` records already in the dataset (same type, start and
+end date, source and value) are dropped before writing, so re-ingesting a full
+export only adds files to the months that actually gained records.
+"""
+
+from __future__ import annotations
+
+import csv
+import logging
+import os
+import shutil
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from src.health.arrow import fetch_table
+from src.health.catalog import refresh_catalog
+from src.health.compact import recover_compactions
+from src.health.cube import refresh_cube
+from src.health.dataset import parquet_list, scan_files, sql_str
+from src.health.layout import (
+    DICTIONARY_COLUMNS,
+    RAW,
+    TYPED,
+    auto_row_group_size,
+    check_layout,
+    parse_dates,
+    sort_typed,
+    typed_table,
+    write_layout,
+)
+from src.health.rollup import partitions, refresh_rollup
+
+log = logging.getLogger("chat.health")
+
+DEFAULT_MAX_MEMORY_MB = 256
+PROGRESS_EVERY_S = 5.0
+
+Partition = Tuple[int, int]
+
+# Columns of the XML-to-CSV flattening the datasets were first built from:
+# the Record attributes plus its first MetadataEntry.
+RECORD_ATTRIBUTES = ("type", "sourceName", "sourceVersion", "unit", "creationDate", "startDate", "endDate", "value", "device")
+RECORD_COLUMNS = tuple(f"@{a}" for a in RECORD_ATTRIBUTES) + ("MetadataEntry.@key", "MetadataEntry.@value")
+# What makes two records the same for incremental ingestion.
+DEDUP_COLUMNS = ("@type", "@startDate", "@endDate", "@sourceName", "@value", "@valueText")
+
+
+@dataclass
+class IngestStats:
+    """Counters reported while and after ingesting."""
+
+    rows_in: int = 0
+    rows_written: int = 0
+    rows_dropped: int = 0
+    rows_duplicate: int = 0
+    bytes_read: int = 0
+    bytes_total: int = 0
+    files_written: int = 0
+    flushes: int = 0
+    peak_buffered_bytes: int = 0
+    partitions: Dict[Partition, int] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows_in / self.seconds if self.seconds else 0.0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes_read / 1e6 / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        pct = f" ({100 * self.bytes_read / self.bytes_total:.0f}%)" if self.bytes_total else ""
+        return (
+            f"{self.rows_in:,} rows read{pct}, {self.rows_written:,} written, {self.rows_dropped:,} dropped, "
+            f"{self.rows_duplicate:,} duplicate | "
+            f"{self.rows_per_s:,.0f} rows/s, {self.mb_per_s:.1f} MB/s | "
+            f"{len(self.partitions)} partitions, {self.files_written} files, "
+            f"peak buffer {self.peak_buffered_bytes / 1e6:.1f} MB, {self.seconds:.1f}s"
+        )
+
+
+def print_progress(stats: IngestStats) -> None:
+    print(f"  ... {stats.summary()}", flush=True)
+
+
+class PartitionWriter:
+    """
+    Buffer health records per year/month and append them to Parquet files.
+
+    Each partition gets one file per run (``part-<run>.parquet``) that grows
+    by one or more row groups per flush. Files are written under a ``.tmp``
+    name and renamed on :meth:`close`, so readers never see partial files.
+    ``incremental`` writers skip records the dataset (or this run) already
+    holds; partitions without new records get no file at all.
+    """
+
+    def __init__(
+        self,
+        root: str | Path,
+        layout: str = RAW,
+        max_memory_bytes: int = DEFAULT_MAX_MEMORY_MB * 2**20,
+        row_group_size: Optional[int] = None,
+        stats: Optional[IngestStats] = None,
+        incremental: bool = False,
+    ):
+        self.root = Path(root)
+        self.layout = layout
+        # Half the budget for buffered rows; the rest covers the batch being
+        # converted and the sort/encode copy made while flushing.
+        self.buffer_limit = max_memory_bytes // 2
+        self.row_group_size = row_group_size
+        self.stats = stats or IngestStats()
+        self.run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self._buffers: Dict[Partition, list] = {}
+        self._buffered: Dict[Partition, int] = {}
+        self._writers: Dict[Partition, Tuple[pq.ParquetWriter, Path]] = {}
+        self._seen = SeenRecords(self.root, max_memory_bytes) if incremental else None
+
+    @property
+    def buffered_bytes(self) -> int:
+        return sum(self._buffered.values())
+
+    def prepare(self, batch: pa.RecordBatch | pa.Table) -> pa.Table:
+        """Parse ``@startDate`` (dropping rows without one) and add year/month."""
+        table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+        if "@startDate" not in table.column_names:
+            raise ValueError("Column '@startDate' not found in input.")
+        start = parse_dates(table.column("@startDate"))
+        table = table.set_column(table.column_names.index("@startDate"), "@startDate", start)
+        valid = table.filter(pc.is_valid(start))
+        self.stats.rows_dropped += table.num_rows - valid.num_rows
+        start = valid.column("@startDate")
+        valid = valid.append_column("year", pc.cast(pc.year(start), pa.int32()))
+        valid = valid.append_column("month", pc.cast(pc.month(start), pa.int16()))
+        if self.layout == TYPED:
+            valid = typed_table(valid)
+        return valid
+
+    def write(self, batch: pa.RecordBatch | pa.Table) -> None:
+        """Add a batch of string-typed records."""
+        self.stats.rows_in += batch.num_rows
+        table = self.prepare(batch)
+        if table.num_rows == 0:
+            return
+        keys = pa.table({"year": table.column("year"), "month": table.column("month")})
+        for key in keys.group_by(["year", "month"]).aggregate([]).to_pylist():
+            part = (key["year"], key["month"])
+            mask = pc.and_(pc.equal(table.column("year"), part[0]), pc.equal(table.column("month"), part[1]))
+            self._add(part, table.filter(mask).drop_columns(["year", "month"]))
+        self.stats.peak_buffered_bytes = max(self.stats.peak_buffered_bytes, self.buffered_bytes)
+        while self.buffered_bytes > self.buffer_limit:
+            self.flush(max(self._buffered, key=self._buffered.get))
+
+    def _add(self, part: Partition, table: pa.Table) -> None:
+        self._buffers.setdefault(part, []).append(table)
+        self._buffered[part] = self._buffered.get(part, 0) + table.nbytes
+
+    def flush(self, part: Partition) -> None:
+        tables = self._buffers.pop(part, [])
+        self._buffered.pop(part, None)
+        if not tables:
+            return
+        table = pa.concat_tables(tables, promote_options="default")
+        if self._seen is not None:
+            fresh = self._seen.new_records(part, table)
+            self.stats.rows_duplicate += table.num_rows - fresh.num_rows
+            table = fresh
+            if table.num_rows == 0:
+                return
+        if self.layout == TYPED:
+            table = sort_typed(table)
+        writer = self._writer(part, table.schema)
+        writer.write_table(table, row_group_size=self.row_group_size or auto_row_group_size(table.num_rows))
+        self.stats.rows_written += table.num_rows
+        self.stats.partitions[part] = self.stats.partitions.get(part, 0) + table.num_rows
+        self.stats.flushes += 1
+
+    def _writer(self, part: Partition, schema: pa.Schema) -> pq.ParquetWriter:
+        if part not in self._writers:
+            final = self.root / f"year={part[0]}" / f"month={part[1]}" / f"part-{self.run_id}.parquet"
+            final.parent.mkdir(parents=True, exist_ok=True)
+            use_dictionary = [c for c in DICTIONARY_COLUMNS if c in schema.names] if self.layout == TYPED else True
+            writer = pq.ParquetWriter(
+                final.with_suffix(".parquet.tmp"), schema, compression="snappy", use_dictionary=use_dictionary
+            )
+            self._writers[part] = (writer, final)
+        return self._writers[part][0]
+
+    def close(self) -> None:
+        """Flush every buffer and publish the finished files."""
+        for part in list(self._buffers):
+            self.flush(part)
+        for writer, final in self._writers.values():
+            writer.close()
+            os.replace(final.with_suffix(".parquet.tmp"), final)
+            self.stats.files_written += 1
+        self._writers.clear()
+        if self._seen is not None:
+            self._seen.close()
+
+
+class SeenRecords:
+    """
+    Record keys already present, per partition, for incremental ingestion.
+
+    A partition's keys are loaded from its existing files the first time it
+    receives rows, then extended with every row written by this run. Keys are
+    128-bit digests of :data:`DEDUP_COLUMNS` held in DuckDB (16 bytes per
+    record, spilled under ``_ingest_tmp`` past the memory budget).
+    """
+
+    def __init__(self, root: Path, max_memory_bytes: int):
+        self.root = root
+        self._existing = partitions(scan_files(root))
+        self._loaded: set = set()
+        self._tmp = root / "_ingest_tmp"
+        self._con = duckdb.connect(database=":memory:")
+        self._con.execute("SET TimeZone = 'UTC'")
+        memory_limit = f"{max(64 * 2**20, max_memory_bytes // 2)}B"
+        self._con.execute(f"SET memory_limit = {sql_str(memory_limit)}")
+        self._con.execute(f"SET temp_directory = {sql_str(self._tmp.as_posix())}")
+
+    @staticmethod
+    def key_sql(columns) -> str:
+        # Numeric values compare as numbers, so "4000", 4000.0 and "4000.0" match.
+        parts = []
+        for c in DEDUP_COLUMNS:
+            if c not in columns:
+                continue
+            col = f'"{c}"'
+            if c == "@value":
+                col = f"COALESCE(CAST(TRY_CAST({col} AS DOUBLE) AS VARCHAR), CAST({col} AS VARCHAR))"
+            parts.append(f"COALESCE(CAST({col} AS VARCHAR), chr(0))")
+        return f"md5_number(concat_ws(chr(31), {', '.join(parts)}))"
+
+    def _table(self, part: Partition) -> str:
+        name = f"seen_{part[0]}_{part[1]}"
+        if part in self._loaded:
+            return name
+        self._con.execute(f"CREATE TABLE {name} (k UHUGEINT)")
+        rels = self._existing.get(f"year={part[0]}/month={part[1]}")
+        if rels:
+            source = f"read_parquet({parquet_list(self.root / r for r in sorted(rels))}, union_by_name=true)"
+            columns = [r[0] for r in self._con.execute(f"DESCRIBE SELECT * FROM {source}").fetchall()]
+            self._con.execute(f"INSERT INTO {name} SELECT DISTINCT {self.key_sql(columns)} FROM {source}")
+        self._loaded.add(part)
+        return name
+
+    def new_records(self, part: Partition, table: pa.Table) -> pa.Table:
+        """Rows of ``table`` not seen before (duplicates within ``table`` kept once)."""
+        seen = self._table(part)
+        self._con.register("chunk", table)
+        try:
+            self._con.execute(f"""
+                CREATE OR REPLACE TEMP TABLE fresh AS
+                SELECT * EXCLUDE (_rn) FROM (
+                  SELECT *, {self.key_sql(table.column_names)} AS _k,
+                         row_number() OVER (PARTITION BY _k) AS _rn
+                  FROM chunk
+                ) c
+                WHERE _rn = 1 AND NOT EXISTS (SELECT 1 FROM {seen} s WHERE s.k = c._k)
+            """)
+        finally:
+            self._con.unregister("chunk")
+        self._con.execute(f"INSERT INTO {seen} SELECT _k FROM fresh")
+        fresh = fetch_table(self._con, "SELECT * EXCLUDE (_k) FROM fresh")
+        return fresh.cast(table.schema)
+
+    def close(self) -> None:
+        self._con.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+
+def _csv_header(path: str | Path) -> list:
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
+
+
+def iter_csv_batches(
+    path: str | Path, block_size: int = 16 * 2**20, stats: Optional[IngestStats] = None
+) -> Iterator[pa.RecordBatch]:
+    """Stream a flattened Health export CSV as batches of string columns."""
+    header = _csv_header(path)
+    if stats is not None:
+        stats.bytes_total = os.path.getsize(path)
+    source = pa.OSFile(str(path))
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(column_types={c: pa.string() for c in header}, strings_can_be_null=True),
+    )
+    try:
+        for batch in reader:
+            if stats is not None:
+                stats.bytes_read = source.tell()
+            yield batch
+    finally:
+        source.close()
+
+
+def iter_xml_batches(
+    path: str | Path, batch_rows: int = 65536, stats: Optional[IngestStats] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Stream the ``Record`` elements of an Apple Health ``export.xml``.
+
+    Uses ``iterparse`` and clears every finished top-level element, so memory
+    holds one batch of rows rather than the document. Workouts, activity
+    summaries and other elements are skipped.
+    """
+    schema = pa.schema([(c, pa.string()) for c in RECORD_COLUMNS])
+    columns: Dict[str, list] = {c: [] for c in RECORD_COLUMNS}
+    if stats is not None:
+        stats.bytes_total = os.path.getsize(path)
+
+    def batch() -> pa.RecordBatch:
+        out = pa.RecordBatch.from_pydict(columns, schema=schema)
+        for values in columns.values():
+            values.clear()
+        return out
+
+    with open(path, "rb") as f:
+        depth, root = 0, None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            if event == "start":
+                root = elem if root is None else root
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 1:
+                continue
+            if elem.tag == "Record":
+                for attr, col in zip(RECORD_ATTRIBUTES, RECORD_COLUMNS):
+                    columns[col].append(elem.get(attr))
+                meta = elem.find("MetadataEntry")
+                columns["MetadataEntry.@key"].append(None if meta is None else meta.get("key"))
+                columns["MetadataEntry.@value"].append(None if meta is None else meta.get("value"))
+            root.clear()
+            if len(columns["@type"]) >= batch_rows:
+                if stats is not None:
+                    stats.bytes_read = f.tell()
+                yield batch()
+        if stats is not None:
+            stats.bytes_read = f.tell()
+    if columns["@type"]:
+        yield batch()
+
+
+def block_size_for(max_memory_bytes: int) -> int:
+    """CSV block size for a memory budget: small enough to parse several blocks in flight."""
+    return max(2**20, min(64 * 2**20, max_memory_bytes // 16))
+
+
+def xml_batch_rows(max_memory_bytes: int) -> int:
+    """XML rows per batch for a memory budget; a row held as Python strings takes about 1 KB."""
+    return max(1024, max_memory_bytes // 4096)
+
+
+def ingest_batches(
+    batches: Iterable[pa.RecordBatch],
+    out_dir: str | Path,
+    layout: str = RAW,
+    max_memory_mb: int = DEFAULT_MAX_MEMORY_MB,
+    row_group_size: Optional[int] = None,
+    stats: Optional[IngestStats] = None,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+    progress_every_s: float = PROGRESS_EVERY_S,
+    incremental: bool = False,
+) -> IngestStats:
+    """
+    Write record batches into the dataset at ``out_dir`` and refresh its rollups, cube and catalog.
+
+    ``incremental`` skips records already in the dataset; only partitions that
+    gain records get a new file, so the rollup refresh (and anything keyed on
+    partition fingerprints) only touches those months.
+
+    Returns:
+        IngestStats: rows in/out, throughput, files and partitions written.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    recover_compactions(out_dir)  # an interrupted compaction would double-count or hide records
+    check_layout(out_dir, layout, bool(scan_files(out_dir)))
+    stats = stats or IngestStats()
+    writer = PartitionWriter(out_dir, layout, max_memory_mb * 2**20, row_group_size, stats, incremental)
+    last = time.monotonic()
+    for batch in batches:
+        writer.write(batch)
+        if progress and time.monotonic() - last >= progress_every_s:
+            progress(stats)
+            last = time.monotonic()
+    writer.close()
+    if layout == TYPED:
+        write_layout(out_dir, TYPED, row_group_size=row_group_size or "auto")
+    refresh_rollup(out_dir)
+    refresh_cube(out_dir)
+    refresh_catalog(out_dir)
+    stats.finished = time.monotonic()
+    log.info("health ingest into %s: %s", out_dir, stats.summary())
+    return stats
+
+
+def ingest_csv(csv_path: str | Path, out_dir: str | Path, **kwargs) -> IngestStats:
+    """Stream a Health export CSV into a partitioned dataset (see :func:`ingest_batches`)."""
+    stats = kwargs.pop("stats", None) or IngestStats()
+    max_memory_mb = kwargs.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)
+    batches = iter_csv_batches(csv_path, block_size_for(max_memory_mb * 2**20), stats)
+    return ingest_batches(batches, out_dir, stats=stats, **kwargs)
+
+
+def ingest_xml(xml_path: str | Path, out_dir: str | Path, **kwargs) -> IngestStats:
+    """Stream an Apple Health ``export.xml`` into a partitioned dataset (see :func:`ingest_batches`)."""
+    stats = kwargs.pop("stats", None) or IngestStats()
+    max_memory_mb = kwargs.get("max_memory_mb", DEFAULT_MAX_MEMORY_MB)
+    batches = iter_xml_batches(xml_path, xml_batch_rows(max_memory_mb * 2**20), stats)
+    return ingest_batches(batches, out_dir, stats=stats, **kwargs)
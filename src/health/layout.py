@@ -0,0 +1,168 @@
+"""
+On-disk layouts of a health dataset.
+
+``raw``   — the CSV columns kept as-is (strings), only ``@startDate`` parsed.
+            This is what the original partitioning script produced.
+``typed`` — ``@value`` as DOUBLE (non-numeric values kept in ``@valueText``),
+            dates as UTC timestamps, ``@type``/``@unit``/``@sourceName``
+            dictionary-encoded, rows sorted by (``@type``, ``@startDate``) and
+            written in small row groups so min/max statistics let DuckDB skip
+            most of a file for a type + date filter.
+
+The layout is recorded in ``<data_path>/_dataset.json``; datasets without the
+marker are ``raw``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+RAW = "raw"
+TYPED = "typed"
+LAYOUTS = (RAW, TYPED)
+MARKER = "_dataset.json"
+
+# Row groups per file the auto size aims for, and its bounds (in rows). With
+# rows sorted by type, each group then covers a handful of types, so a
+# single-type query reads one or two groups per file.
+ROW_GROUPS_PER_FILE = 16
+MIN_ROW_GROUP_SIZE = 2048
+MAX_ROW_GROUP_SIZE = 122880
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+DATE_COLUMNS = ("@startDate", "@endDate", "@creationDate")
+DICTIONARY_COLUMNS = ("@type", "@unit", "@sourceName")
+SORT_KEYS = [("@type", "ascending"), ("@startDate", "ascending")]
+_NUMBER = r"^\s*[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?\s*$"
+
+
+def read_layout(root: str | Path) -> str:
+    """Layout of the dataset at ``root`` (``raw`` when there is no marker)."""
+    try:
+        data = json.loads((Path(root) / MARKER).read_text())
+    except (OSError, ValueError):
+        return RAW
+    return data.get("layout", RAW)
+
+
+def write_layout(root: str | Path, layout: str, **extra) -> None:
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp = root / (MARKER + ".tmp")
+    tmp.write_text(json.dumps({"layout": layout, **extra}, indent=2, sort_keys=True))
+    os.replace(tmp, root / MARKER)
+
+
+def parse_dates(col: pa.ChunkedArray | pa.Array) -> pa.Array:
+    """Health export dates ('2024-01-10 08:00:00 +0100') to UTC timestamps; bad values become null."""
+    if pa.types.is_timestamp(col.type):
+        # Naive timestamps are UTC; nanoseconds (pandas) are truncated to the layout's microseconds.
+        return pc.cast(col, pa.timestamp("us", tz="UTC"), safe=False)
+    return pc.strptime(pc.cast(col, pa.string()), format=DATE_FORMAT, unit="us", error_is_null=True)
+
+
+def column_type(layout: str, name: str) -> pa.DataType:
+    """Type of column ``name`` in the files of a ``layout`` dataset (dictionary columns decoded)."""
+    if name == "@startDate" or (layout == TYPED and name in DATE_COLUMNS):
+        return pa.timestamp("us", tz="UTC")
+    if layout == TYPED and name == "@value":
+        return pa.float64()
+    if name == "year":
+        return pa.int32()
+    if name == "month":
+        return pa.int16()
+    return pa.string()
+
+
+def typed_table(table: pa.Table) -> pa.Table:
+    """Convert a raw (string) health table to typed columns (unsorted, not yet dictionary-encoded)."""
+    null_str = pa.scalar(None, pa.string())
+    columns, names = [], []
+    for name in table.column_names:
+        col = table.column(name)
+        if name == "@value":
+            text = pc.cast(col, pa.string())
+            numeric = pc.match_substring_regex(text, _NUMBER)
+            names += ["@value", "@valueText"]
+            columns += [pc.cast(pc.if_else(numeric, text, null_str), pa.float64()), pc.if_else(numeric, null_str, text)]
+            continue
+        if name in DATE_COLUMNS:
+            col = parse_dates(col)
+        elif name == "year":
+            col = pc.cast(col, pa.int32())
+        elif name == "month":
+            col = pc.cast(col, pa.int16())
+        else:
+            col = pc.cast(col, pa.string())
+        names.append(name)
+        columns.append(col)
+    return pa.table(columns, names=names)
+
+
+def sort_typed(table: pa.Table) -> pa.Table:
+    """Sort by (@type, @startDate) and dictionary-encode the low-cardinality columns."""
+    table = table.sort_by(SORT_KEYS)
+    for name in DICTIONARY_COLUMNS:
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, pc.dictionary_encode(table.column(name)))
+    return table
+
+
+def auto_row_group_size(num_rows: int) -> int:
+    return max(MIN_ROW_GROUP_SIZE, min(MAX_ROW_GROUP_SIZE, num_rows // ROW_GROUPS_PER_FILE))
+
+
+def write_typed_file(table: pa.Table, path: str | Path, row_group_size: int | None = None) -> None:
+    """Write one sorted typed-layout file atomically (``row_group_size`` None = auto)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    pq.write_table(
+        sort_typed(table),
+        tmp,
+        compression="snappy",
+        row_group_size=row_group_size or auto_row_group_size(table.num_rows),
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in table.column_names],
+        write_statistics=True,
+    )
+    os.replace(tmp, path)
+
+
+def write_typed_partitions(
+    table: pa.Table,
+    root: str | Path,
+    row_group_size: int | None = None,
+    filename: str = "part-0.parquet",
+) -> List[str]:
+    """
+    Write a typed table as ``year=/month=`` partitions, one sorted file each.
+
+    ``table`` must already carry ``year`` and ``month`` columns. Returns the
+    partition directories written.
+    """
+    root = Path(root)
+    written = []
+    keys = pa.table({"year": table.column("year"), "month": table.column("month")})
+    for key in keys.group_by(["year", "month"]).aggregate([]).to_pylist():
+        mask = pc.and_(pc.equal(table.column("year"), key["year"]), pc.equal(table.column("month"), key["month"]))
+        part = table.filter(mask).drop_columns(["year", "month"])
+        part_dir = f"year={key['year']}/month={key['month']}"
+        write_typed_file(part, root / part_dir / filename, row_group_size)
+        written.append(part_dir)
+    return sorted(written)
+
+
+def check_layout(root: str | Path, layout: str, has_files: bool) -> None:
+    """Refuse to mix layouts in one output directory."""
+    current = read_layout(root)
+    if has_files and current != layout:
+        raise ValueError(
+            f"{root} already holds a '{current}' dataset; write the '{layout}' layout to an empty directory."
+        )
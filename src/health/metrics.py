@@ -0,0 +1,89 @@
+"""
+Registry of the health metrics the tools can answer.
+
+A metric is a set of HealthKit record types read from the daily rollup (so
+values are already unit-normalized, see ``UNIT_CONVERSIONS``) plus how they
+combine:
+
+``daily``      — how one day's records become the day's value: ``sum``
+                 (steps, energy, distance), ``avg``, ``max`` or ``min``
+                 (heart rate, body measurements).
+``fill_days``  — count every day that has any health record, with 0 when the
+                 metric has none. This is how the original step/calorie tools
+                 averaged; other metrics only count days they were recorded.
+
+Adding a metric is one :func:`register` call; ``src.tools`` generates a
+``<name>_stats`` tool for every metric registered with ``tool=True``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+DAILY_AGGREGATIONS = ("sum", "avg", "max", "min")
+
+STEPS = "HKQuantityTypeIdentifierStepCount"
+ACTIVE_ENERGY = "HKQuantityTypeIdentifierActiveEnergyBurned"
+BASAL_ENERGY = "HKQuantityTypeIdentifierBasalEnergyBurned"
+DISTANCE_WALKING_RUNNING = "HKQuantityTypeIdentifierDistanceWalkingRunning"
+FLIGHTS_CLIMBED = "HKQuantityTypeIdentifierFlightsClimbed"
+EXERCISE_TIME = "HKQuantityTypeIdentifierAppleExerciseTime"
+HEART_RATE = "HKQuantityTypeIdentifierHeartRate"
+RESTING_HEART_RATE = "HKQuantityTypeIdentifierRestingHeartRate"
+WALKING_HEART_RATE = "HKQuantityTypeIdentifierWalkingHeartRateAverage"
+HEART_RATE_VARIABILITY = "HKQuantityTypeIdentifierHeartRateVariabilitySDNN"
+OXYGEN_SATURATION = "HKQuantityTypeIdentifierOxygenSaturation"
+TIME_IN_DAYLIGHT = "HKQuantityTypeIdentifierTimeInDaylight"
+
+
+@dataclass(frozen=True)
+class Metric:
+    name: str
+    label: str
+    types: Tuple[str, ...]
+    unit: Optional[str] = None  # only rows in this (normalized) unit; None = any
+    daily: str = "sum"
+    fill_days: bool = False
+    integer: bool = False
+    tool: bool = True
+
+    def __post_init__(self):
+        if self.daily not in DAILY_AGGREGATIONS:
+            raise ValueError(f"daily must be one of {DAILY_AGGREGATIONS}, got {self.daily!r}")
+        if not self.types:
+            raise ValueError(f"metric {self.name!r} needs at least one record type")
+
+
+METRICS: Dict[str, Metric] = {}
+
+
+def register(metric: Metric) -> Metric:
+    if metric.name in METRICS:
+        raise ValueError(f"metric {metric.name!r} is already registered")
+    METRICS[metric.name] = metric
+    return metric
+
+
+def get_metric(name: str) -> Metric:
+    try:
+        return METRICS[name]
+    except KeyError:
+        raise ValueError(f"unknown metric {name!r}; known: {', '.join(sorted(METRICS))}") from None
+
+
+# Covered by the dedicated step/calorie/run tools and health_summary.
+register(Metric("calories", "calories burned (active + basal)", (ACTIVE_ENERGY, BASAL_ENERGY), fill_days=True, tool=False))
+register(Metric("active_calories", "active calories", (ACTIVE_ENERGY,), fill_days=True, tool=False))
+register(Metric("basal_calories", "basal calories", (BASAL_ENERGY,), fill_days=True, tool=False))
+register(Metric("steps", "steps", (STEPS,), fill_days=True, integer=True, tool=False))
+register(Metric("distance", "walking/running distance", (DISTANCE_WALKING_RUNNING,), unit="km", tool=False))
+
+register(Metric("flights_climbed", "flights of stairs climbed", (FLIGHTS_CLIMBED,), unit="count", integer=True))
+register(Metric("exercise_minutes", "exercise minutes", (EXERCISE_TIME,), unit="min"))
+register(Metric("heart_rate", "heart rate", (HEART_RATE,), unit="count/min", daily="avg"))
+register(Metric("resting_heart_rate", "resting heart rate", (RESTING_HEART_RATE,), unit="count/min", daily="avg"))
+register(Metric("walking_heart_rate", "walking heart rate average", (WALKING_HEART_RATE,), unit="count/min", daily="avg"))
+register(Metric("heart_rate_variability", "heart rate variability (SDNN)", (HEART_RATE_VARIABILITY,), unit="ms", daily="avg"))
+register(Metric("oxygen_saturation", "blood oxygen saturation", (OXYGEN_SATURATION,), unit="%", daily="avg"))
+register(Metric("time_in_daylight", "time in daylight", (TIME_IN_DAYLIGHT,), unit="min"))
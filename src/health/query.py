@@ -0,0 +1,179 @@
+"""
+One query engine for every registered metric.
+
+:func:`period_stats` compiles any set of metrics over any set of periods into
+a single grouped query and returns, per period and metric, the day count,
+total, daily average and the highest and lowest days.
+
+Each range is planned at the coarsest grain that answers it exactly
+(:func:`plan_range`): whole calendar months and ISO weeks come from the
+metric cube (``src.health.cube``), the remaining whole days from the daily
+rollup, whole hours from the hourly rollup and anything finer from raw
+records (with partition pruning, see :func:`~src.health.rollup.daily_source`).
+
+The dataset catalog is consulted first: ranges are clamped to the days with
+data, metrics without records in range are left out, and when nothing is left
+the answer comes back without touching DuckDB.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.health.cube import daily_values_sql, max_day_sql, metric_params, min_day_sql, registry_signature
+from src.health.dataset import _utc
+from src.health.engine import get_engine
+from src.health.metrics import Metric
+from src.health.rollup import daily_source, is_day_aligned
+
+Range = Tuple[datetime, datetime]
+
+
+@dataclass
+class MetricStats:
+    days: int = 0
+    total: float = 0.0
+    daily_avg: float = 0.0
+    max_day: Optional[datetime] = None
+    max: float = 0.0
+    min_day: Optional[datetime] = None
+    min: float = 0.0
+
+
+@dataclass
+class Plan:
+    """How one range is read: daily-row ranges plus (grain, start, end) cube pieces."""
+    days: List[Range] = field(default_factory=list)
+    cube: List[Tuple[str, datetime, datetime]] = field(default_factory=list)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def plan_range(start_ts: datetime, end_ts: datetime, use_cube: bool = True) -> Plan:
+    """
+    Split ``[start_ts, end_ts)`` into whole months, then whole ISO weeks, read
+    from the cube, and the days around them, read as daily rows. Ranges that
+    don't fall on UTC midnights (or without a cube) are all daily rows.
+    """
+    if not (use_cube and is_day_aligned(start_ts) and is_day_aligned(end_ts)):
+        return Plan(days=[(start_ts, end_ts)])
+    tz = timezone.utc if start_ts.tzinfo is not None else None
+
+    def ts(d: date) -> datetime:
+        return datetime.combine(d, time(), tzinfo=tz)
+
+    lo, hi = _utc(start_ts).date(), _utc(end_ts).date()
+    plan = Plan()
+    m0 = lo if lo.day == 1 else _next_month(lo)
+    m1 = hi.replace(day=1)
+    segments = [(lo, hi)]
+    if m0 < m1:
+        plan.cube.append(("month", ts(m0), ts(m1)))
+        segments = [(lo, m0), (m1, hi)]
+    for a, b in segments:
+        w0, w1 = a + timedelta(days=(7 - a.weekday()) % 7), b - timedelta(days=b.weekday())
+        pieces = [(a, b)]
+        if w0 < w1:
+            plan.cube.append(("week", ts(w0), ts(w1)))
+            pieces = [(a, w0), (w1, b)]
+        plan.days += [(ts(x), ts(y)) for x, y in pieces if x < y]
+    return plan
+
+
+def stats_sql(metrics: Sequence[Metric], daily: Sequence[Tuple[int, str]], cube: Sequence[Tuple[int, str]] = ()) -> str:
+    """
+    SQL of :func:`period_stats`; ``daily`` holds (period, daily-rows query)
+    pairs and ``cube`` (period, cube-rows query) pairs.
+
+    Rows: period, metric, days, total, daily_avg, max_day, max, min_day, min.
+    """
+    union = "\n      UNION ALL\n      ".join(
+        f"SELECT {i} AS period, day, type, unit, sum, count, min, max FROM ({sql})" for i, sql in daily
+    ) or (
+        "SELECT NULL::INTEGER AS period, NULL::TIMESTAMPTZ AS day, NULL::VARCHAR AS type, NULL::VARCHAR AS unit, "
+        "NULL::DOUBLE AS sum, NULL::BIGINT AS count, NULL::DOUBLE AS min, NULL::DOUBLE AS max WHERE false"
+    )
+    pieces = "".join(
+        f"\n      UNION ALL\n      SELECT {i}, metric, days, total, max_day, max, min_day, min FROM ({sql})"
+        for i, sql in cube
+    )
+    return f"""
+    WITH {daily_values_sql(metrics, union)},
+    parts AS (
+      SELECT period, metric, 1 AS days, v AS total, day AS max_day, v AS max, day AS min_day, v AS min
+      FROM filled{pieces}
+    )
+    SELECT period, metric, SUM(days), SUM(total), SUM(total) / SUM(days),
+           {max_day_sql('max_day', 'max')}, MAX(max), {min_day_sql('min_day', 'min')}, MIN(min)
+    FROM parts
+    GROUP BY period, metric
+    """
+
+
+def period_stats(path: str, metrics: Sequence[Metric], ranges: Sequence[Range]) -> List[Dict[str, MetricStats]]:
+    """
+    Stats of ``metrics`` for each ``[start, end)`` range, from one query.
+
+    Returns:
+        List[Dict[str, MetricStats]]: per range, metric name -> stats (zeros
+        and None days when the range has no data for the metric).
+    """
+    metrics = list({m.name: m for m in metrics}.values())
+    out = [{m.name: MetricStats() for m in metrics} for _ in ranges]
+    engine = get_engine(path)
+    engine.refresh()
+    catalog = engine.catalog
+
+    queries = []  # (index into ranges, clamped range)
+    for i, (start_ts, end_ts) in enumerate(ranges):
+        if catalog is not None:
+            clamped = catalog.clamp(start_ts, end_ts)
+            if clamped is None:
+                continue
+            start_ts, end_ts = clamped
+        queries.append((i, (start_ts, end_ts)))
+    if catalog is not None and queries:
+        # fill_days metrics count every day with data, so they stay even when absent.
+        lo, hi = min((r[0] for _, r in queries), key=_utc), max((r[1] for _, r in queries), key=_utc)
+        metrics = [m for m in metrics if m.fill_days or catalog.has_types(m.types, lo, hi)]
+    if not queries or not metrics:
+        return out
+
+    # fill_days metrics need every day with a record, so only filter by type without them.
+    types = None if any(m.fill_days for m in metrics) else sorted({t for m in metrics for t in m.types})
+    use_cube = engine.has_rollup and engine.cube_metrics == registry_signature()
+    daily, cube, params, cube_params = [], [], [], []
+    for period, (_, (start_ts, end_ts)) in enumerate(queries):
+        plan = plan_range(start_ts, end_ts, use_cube)
+        if plan.days:
+            sql, p = daily_source(engine, start_ts, end_ts, types, plan.days if plan.cube else None)
+            daily.append((period, sql))
+            params += p
+        if plan.cube:
+            pieces = " OR ".join("(grain = ? AND start >= ? AND start < ?)" for _ in plan.cube)
+            names = ", ".join("?" for _ in metrics)
+            cube.append((period, f"SELECT * FROM health_cube WHERE ({pieces}) AND metric IN ({names})"))
+            cube_params += [p for piece in plan.cube for p in piece] + [m.name for m in metrics]
+    params += metric_params(metrics) + cube_params
+
+    con = engine.cursor()
+    try:
+        rows = con.execute(stats_sql(metrics, daily, cube), params).fetchall()
+    finally:
+        con.close()
+
+    for period, metric, days, total, avg, max_day, mx, min_day, mn in rows:
+        out[queries[period][0]][metric] = MetricStats(
+            days=int(days),
+            total=float(total or 0.0),
+            daily_avg=float(avg or 0.0),
+            max_day=max_day,
+            max=float(mx or 0.0),
+            min_day=min_day,
+            min=float(mn or 0.0),
+        )
+    return out
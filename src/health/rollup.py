@@ -0,0 +1,250 @@
+"""
+Hourly and daily per-``@type`` rollups of a health dataset.
+
+The rollups live next to the raw partitions, mirroring their layout::
+
+    <data_path>/_rollup/hourly/year=2024/month=1/rollup.parquet
+    <data_path>/_rollup/daily/year=2024/month=1/rollup.parquet
+    <data_path>/_rollup/daily/_manifest.json
+
+Each row is one (hour or day, type, unit) with sum/count/min/max of the
+unit-normalized value; a partition's daily file is aggregated from its hourly
+one, so raw records are read once. The manifest (shared by both grains)
+stores the fingerprint of the raw files behind every partition, so a refresh
+only recomputes partitions whose files changed.
+
+Week and month aggregates per metric are built on top of the daily rollup,
+see ``src.health.cube``.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import duckdb
+
+from src.health.dataset import FileStats, fingerprint, parquet_list, partition_filter, partitions_filter, scan_files, sql_str
+from src.health.layout import TYPED, read_layout
+
+log = logging.getLogger("chat.health")
+
+ROLLUP_DIR = "_rollup"
+ROLLUP_VERSION = 2
+ROLLUP_FILE = "rollup.parquet"
+
+# unit -> (normalized unit, factor)
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {
+    "m": ("km", 0.001),
+    "mi": ("km", 1.609344),
+    "kJ": ("kcal", 0.239005736),
+    "Cal": ("kcal", 1.0),
+}
+
+
+def _unit_exprs() -> Tuple[str, str]:
+    """SQL expressions for the normalized unit and the value conversion factor."""
+    unit_cases = " ".join(f"WHEN {sql_str(u)} THEN {sql_str(n)}" for u, (n, _) in UNIT_CONVERSIONS.items())
+    factor_cases = " ".join(f"WHEN {sql_str(u)} THEN {f!r}" for u, (_, f) in UNIT_CONVERSIONS.items())
+    return (
+        f'CASE "@unit" {unit_cases} ELSE "@unit" END',
+        f'CASE "@unit" {factor_cases} ELSE 1.0 END',
+    )
+
+
+def daily_select(source: str, where: str = "", typed: bool = False, grain: str = "day") -> str:
+    """
+    Per-day/per-type aggregate over raw records in ``source``.
+
+    Output columns: day, type, unit, sum, count, min, max (``hour`` instead of
+    ``day`` with ``grain="hour"``). Used both to build the stored rollups and
+    to answer ranges they cannot (partial hours). ``typed`` datasets already
+    store ``@value`` as DOUBLE.
+    """
+    unit_expr, factor_expr = _unit_exprs()
+    value_expr = '"@value"' if typed else 'TRY_CAST("@value" AS DOUBLE)'
+    return f"""
+        SELECT {grain}, type, unit, SUM(v) AS sum, COUNT(*) AS count, MIN(v) AS min, MAX(v) AS max
+        FROM (
+          SELECT
+            date_trunc('{grain}', "@startDate") AS {grain},
+            "@type" AS type,
+            {unit_expr} AS unit,
+            {value_expr} * {factor_expr} AS v
+          FROM {source}
+          {where}
+        )
+        GROUP BY {grain}, type, unit
+    """
+
+
+def hourly_to_daily(source: str) -> str:
+    """Daily rows (see :func:`daily_select`) from the hourly rows in ``source``."""
+    return f"""
+        SELECT date_trunc('day', hour) AS day, type, unit, SUM(sum) AS sum, SUM(count) AS count,
+               MIN(min) AS min, MAX(max) AS max
+        FROM {source}
+        GROUP BY ALL
+    """
+
+
+def partitions(stats: FileStats) -> Dict[str, FileStats]:
+    """Group raw files by their partition directory (e.g. 'year=2024/month=1')."""
+    grouped: Dict[str, FileStats] = defaultdict(dict)
+    for rel, st in stats.items():
+        grouped[os.path.dirname(rel)][rel] = st
+    return dict(grouped)
+
+
+def rollup_root(root: Path, grain: str = "daily") -> Path:
+    return Path(root) / ROLLUP_DIR / grain
+
+
+def _load_manifest(out: Path) -> Dict[str, str]:
+    try:
+        data = json.loads((out / "_manifest.json").read_text())
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != ROLLUP_VERSION:
+        return {}
+    return data.get("partitions", {})
+
+
+def _save_manifest(out: Path, parts: Dict[str, str]) -> None:
+    tmp = out / "_manifest.json.tmp"
+    tmp.write_text(json.dumps({"version": ROLLUP_VERSION, "partitions": parts}, indent=2, sort_keys=True))
+    os.replace(tmp, out / "_manifest.json")
+
+
+def refresh_rollup(root: str | Path, stats: FileStats | None = None) -> List[str]:
+    """
+    Bring the hourly and daily rollups of ``root`` up to date.
+
+    Only partitions whose raw files changed since the last refresh are
+    recomputed; partitions that disappeared are dropped.
+
+    Returns:
+        List[str]: the partitions that were rewritten or removed.
+    """
+    root = Path(root)
+    if stats is None:
+        stats = scan_files(root)
+    out, hourly = rollup_root(root), rollup_root(root, "hourly")
+    out.mkdir(parents=True, exist_ok=True)
+
+    manifest = _load_manifest(out)
+    current = {part: fingerprint(files) for part, files in partitions(stats).items()}
+    changed = sorted(p for p, fp in current.items() if manifest.get(p) != fp)
+    removed = sorted(p for p in manifest if p not in current)
+    if not changed and not removed:
+        return []
+
+    typed = read_layout(root) == TYPED
+    con = duckdb.connect(database=":memory:")
+    con.execute("SET TimeZone = 'UTC'")
+    try:
+        grouped = partitions(stats)
+        for part in changed:
+            source = f"read_parquet({parquet_list(root / rel for rel in sorted(grouped[part]))})"
+            hour_target, day_target = hourly / part / ROLLUP_FILE, out / part / ROLLUP_FILE
+            hour_tmp, day_tmp = hour_target.with_suffix(".parquet.tmp"), day_target.with_suffix(".parquet.tmp")
+            for target in (hour_target, day_target):
+                target.parent.mkdir(parents=True, exist_ok=True)
+            con.execute(f"COPY ({daily_select(source, typed=typed, grain='hour')} ORDER BY type, hour) TO {sql_str(str(hour_tmp))} (FORMAT parquet)")
+            hour_rows = f"read_parquet({sql_str(str(hour_tmp))})"
+            con.execute(f"COPY ({hourly_to_daily(hour_rows)} ORDER BY type, day) TO {sql_str(str(day_tmp))} (FORMAT parquet)")
+            os.replace(hour_tmp, hour_target)
+            os.replace(day_tmp, day_target)
+        for part in removed:
+            for target in (hourly / part / ROLLUP_FILE, out / part / ROLLUP_FILE):
+                target.unlink(missing_ok=True)
+    finally:
+        con.close()
+
+    _save_manifest(out, current)
+    log.info("health rollup refreshed: %s (%d changed, %d removed)", root, len(changed), len(removed))
+    return changed + removed
+
+
+def rollup_files(root: str | Path, grain: str = "daily") -> List[str]:
+    out = rollup_root(Path(root), grain)
+    return [str(out / rel) for rel in sorted(scan_files(out))] if out.exists() else []
+
+
+def is_day_aligned(ts: datetime) -> bool:
+    """True when ``ts`` falls on a UTC midnight (naive values are UTC)."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return (ts.hour, ts.minute, ts.second, ts.microsecond) == (0, 0, 0, 0)
+
+
+def is_hour_aligned(ts: datetime) -> bool:
+    """True when ``ts`` falls on a whole UTC hour."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return (ts.minute, ts.second, ts.microsecond) == (0, 0, 0)
+
+
+def range_filter(engine, col: str, type_col: str, ranges: Sequence[Tuple[datetime, datetime]],
+                 types: Sequence[str] | None = None) -> Tuple[str, List]:
+    """WHERE clause + params keeping ``col`` within any of ``ranges`` (and ``types``), with partition pruning."""
+    sql = " OR ".join(f"({col} >= ? AND {col} < ?)" for _ in ranges)
+    params = [ts for r in ranges for ts in r]
+    if engine.hive_partitioned:
+        part_sql, part_params = partition_filter(*ranges[0]) if len(ranges) == 1 else partitions_filter(ranges)
+        sql, params = f"({sql}) AND {part_sql}", params + part_params
+    if types:
+        sql = f"({sql}) AND {type_col} IN ({', '.join('?' for _ in types)})"
+        params += list(types)
+    return sql, params
+
+
+def hourly_source(
+    engine, start_ts: datetime, end_ts: datetime, types: Sequence[str] | None = None
+) -> Tuple[str, Sequence]:
+    """
+    SQL + params for the per-hour/per-type rows of ``[start_ts, end_ts)``
+    (columns as :func:`daily_select` with ``grain="hour"``): from the hourly
+    rollup for whole-hour ranges, otherwise from raw records.
+    """
+    if engine.has_hourly and is_hour_aligned(start_ts) and is_hour_aligned(end_ts):
+        sql, params = range_filter(engine, "hour", "type", [(start_ts, end_ts)], types)
+        return f"SELECT hour, type, unit, sum, count, min, max FROM health_hourly WHERE {sql}", params
+    sql, params = range_filter(engine, '"@startDate"', '"@type"', [(start_ts, end_ts)], types)
+    return daily_select("health", f"WHERE {sql}", typed=engine.layout == TYPED, grain="hour"), params
+
+
+def daily_source(
+    engine, start_ts: datetime, end_ts: datetime, types: Sequence[str] | None = None,
+    days: Sequence[Tuple[datetime, datetime]] | None = None,
+) -> Tuple[str, Sequence]:
+    """
+    SQL + params for the per-day/per-type rows of ``[start_ts, end_ts)``.
+
+    Whole-day ranges are read from the ``health_daily`` rollup view and
+    whole-hour ranges from ``health_hourly``; anything else is aggregated
+    from the raw ``health`` view so the answer stays exact.
+    On year=/month= datasets all paths only open the partitions in range.
+    Pass ``types`` when only those rows matter, so sorted typed files can skip
+    row groups of other types, and ``days`` (whole-day ranges) to read only
+    those days of the range from the rollup, in one scan.
+    """
+    def where(col: str, type_col: str, ranges) -> Tuple[str, List]:
+        return range_filter(engine, col, type_col, ranges, types)
+
+    if days is not None and not engine.has_rollup:
+        raise ValueError("days= needs the daily rollup")
+    whole_days = days is not None or (is_day_aligned(start_ts) and is_day_aligned(end_ts))
+    if engine.has_rollup and whole_days:
+        sql, params = where("day", "type", days or [(start_ts, end_ts)])
+        return f"SELECT * FROM health_daily WHERE {sql}", params
+    if engine.has_hourly and is_hour_aligned(start_ts) and is_hour_aligned(end_ts):
+        sql, params = where("hour", "type", [(start_ts, end_ts)])
+        return hourly_to_daily(f"(SELECT * FROM health_hourly WHERE {sql})"), params
+    sql, params = where('"@startDate"', '"@type"', [(start_ts, end_ts)])
+    return daily_select("health", f"WHERE {sql}", typed=engine.layout == TYPED), params
@@ -0,0 +1,167 @@
+"""
+Metric time series for charts, downsampled server-side.
+
+:func:`metric_series` reads one registry metric over a range at hourly or
+daily resolution (from the rollups, so the cost follows the number of
+buckets, not of records) and reduces it to at most ``points`` points:
+
+``lttb``    — Largest-Triangle-Three-Buckets: keeps the points that shape
+              the line; the first and last points are always kept.
+``minmax``  — per bucket the lowest and highest point (in time order), so
+              spikes survive; up to ``points`` points in total.
+
+The buckets are fetched as an Arrow table (``src.health.arrow``) and reduced
+on NumPy views of its columns; :func:`metric_series` returns columnar ``t``
+(epoch milliseconds, bucket start, UTC) and ``v`` lists of equal length, and
+:func:`series_ipc` the same points as an Arrow IPC stream built from the
+table, without going through Python objects.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from src.health.arrow import fetch_table, numpy_column
+from src.health.dataset import _utc
+from src.health.engine import get_engine
+from src.health.metrics import Metric
+from src.health.rollup import daily_source, hourly_source
+
+METHODS = ("lttb", "minmax")
+MAX_POINTS = 5000
+# Ranges up to this many hours are plotted per hour, longer ones per day.
+MAX_HOURLY_BUCKETS = 24 * 14
+
+_BUCKET_VALUE = "CASE ? WHEN 'sum' THEN s WHEN 'avg' THEN s / c WHEN 'max' THEN mx ELSE mn END"
+
+
+def grain_for(start_ts: datetime, end_ts: datetime) -> str:
+    return "hour" if _utc(end_ts) - _utc(start_ts) <= timedelta(hours=MAX_HOURLY_BUCKETS) else "day"
+
+
+def _series_sql(source: str, metric: Metric, bucket: str) -> str:
+    unit = "" if metric.unit is None else "AND unit = ?"
+    return f"""
+        SELECT epoch_ms({bucket}) AS t, {_BUCKET_VALUE} AS v
+        FROM (
+          SELECT {bucket}, SUM(sum) AS s, SUM(count) AS c, MAX(max) AS mx, MIN(min) AS mn
+          FROM ({source})
+          WHERE type IN ({', '.join('?' for _ in metric.types)}) {unit}
+          GROUP BY {bucket}
+          HAVING SUM(sum) IS NOT NULL
+        )
+        ORDER BY t
+    """
+
+
+def raw_series(path: str, metric: Metric, start_ts: datetime, end_ts: datetime, grain: str) -> pa.Table:
+    """
+    Per-bucket values of ``metric`` (``daily`` aggregation per bucket) as an
+    Arrow table with ``t`` (int64 epoch ms) and ``v`` (float64); empty buckets
+    are left out.
+    """
+    engine = get_engine(path)
+    engine.refresh()
+    if grain == "hour":
+        source, params = hourly_source(engine, start_ts, end_ts, metric.types)
+    else:
+        source, params = daily_source(engine, start_ts, end_ts, metric.types)
+    params = [metric.daily, *params, *metric.types] + ([] if metric.unit is None else [metric.unit])
+    con = engine.cursor()
+    try:
+        return fetch_table(con, _series_sql(source, metric, grain), params)
+    finally:
+        con.close()
+
+
+def lttb(t: np.ndarray, v: np.ndarray, points: int) -> np.ndarray:
+    """Indices kept by Largest-Triangle-Three-Buckets."""
+    n = len(t)
+    if points >= n:
+        return np.arange(n)
+    if points == 2:
+        return np.array([0, n - 1])
+    x, y = t.astype(np.float64), v
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    keep = np.empty(points, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_lo, nxt_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nxt_lo:nxt_hi].mean(), y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(t: np.ndarray, v: np.ndarray, points: int) -> np.ndarray:
+    """Indices of the lowest and highest point of ``points // 2`` equal-count buckets, in time order."""
+    n = len(t)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    keep = []
+    for chunk in np.array_split(np.arange(n), buckets):
+        lo, hi = chunk[int(np.argmin(v[chunk]))], chunk[int(np.argmax(v[chunk]))]
+        keep += sorted({lo, hi})
+    return np.asarray(keep, dtype=np.int64)
+
+
+def downsample(
+    path: str, metric: Metric, start_ts: datetime, end_ts: datetime, points: int = 500, method: str = "lttb"
+) -> Tuple[Dict[str, Any], pa.Table]:
+    """
+    ``metric`` over ``[start_ts, end_ts)`` reduced to at most ``points`` points.
+
+    Returns:
+        Tuple[Dict[str, Any], pa.Table]: {"metric", "unit", "grain", "method",
+        "source_points"} and the kept points, ``t`` (timestamp ms, UTC) and ``v``.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    if not 2 <= points <= MAX_POINTS:
+        raise ValueError(f"points must be between 2 and {MAX_POINTS}")
+    if _utc(end_ts) <= _utc(start_ts):
+        raise ValueError("end must be after start")
+    grain = grain_for(start_ts, end_ts)
+    table = raw_series(path, metric, start_ts, end_ts, grain)
+    keep = (lttb if method == "lttb" else minmax)(numpy_column(table, "t"), numpy_column(table, "v"), points)
+    kept = table.take(pa.array(keep, pa.int64())) if len(keep) < table.num_rows else table
+    info = {"metric": metric.name, "unit": metric.unit, "grain": grain, "method": method, "source_points": table.num_rows}
+    return info, pa.table({
+        "t": kept.column("t").cast(pa.timestamp("ms", tz="UTC")),
+        "v": pc.round(kept.column("v"), 4),
+    })
+
+
+def metric_series(
+    path: str, metric: Metric, start_ts: datetime, end_ts: datetime, points: int = 500, method: str = "lttb"
+) -> Dict[str, Any]:
+    """
+    :func:`downsample` as a dict.
+
+    Returns:
+        Dict[str, Any]: {"metric", "unit", "grain", "method", "source_points",
+        "t": [epoch ms], "v": [float]}
+    """
+    info, table = downsample(path, metric, start_ts, end_ts, points, method)
+    return {**info, "t": table.column("t").cast(pa.int64()).to_pylist(), "v": table.column("v").to_pylist()}
+
+
+def series_ipc(
+    path: str, metric: Metric, start_ts: datetime, end_ts: datetime, points: int = 500, method: str = "lttb"
+) -> bytes:
+    """:func:`downsample` as an Arrow IPC stream; the info dict goes in the schema metadata."""
+    info, table = downsample(path, metric, start_ts, end_ts, points, method)
+    table = table.replace_schema_metadata({k: str(v) for k, v in info.items() if v is not None})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,165 @@
+"""
+Corpus-wide BM25 index of a Chroma collection, persisted next to it.
+
+The index is an inverted index in CSR form: for every term, the documents it
+occurs in and how often (``ptr``/``docs``/``tfs``), plus each document's
+length. A query only touches the postings of its own terms, so scoring costs
+microseconds however large the collection is. Documents (ids, texts,
+metadata) are stored with it, so lexical hits come back without a round trip
+to Chroma.
+
+Tokens are lowercased words with accents folded ("gémeos" matches
+"gemeos"). The index lives in ``<persist_dir>/_bm25/<collection>.npz`` and
+records the collection version (``src.retrieval.version``) it was built from;
+:func:`load_or_build` rebuilds it when the collection has moved on.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from src.retrieval.version import collection_version
+
+log = logging.getLogger("chat.retrieval")
+
+BM25_DIR = "_bm25"
+BM25_VERSION = 2
+K1 = 1.5
+B = 0.75
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _TOKEN.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+def index_path(persist_directory: str | Path, collection_name: str) -> Path:
+    return Path(persist_directory) / BM25_DIR / f"{collection_name}.npz"
+
+
+@dataclass
+class BM25Index:
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    vocab: Dict[str, int]
+    ptr: np.ndarray      # int64, len(vocab) + 1: postings of term t are ptr[t]:ptr[t + 1]
+    docs: np.ndarray     # int32 document index per posting
+    tfs: np.ndarray      # float32 term frequency per posting
+    lengths: np.ndarray  # float32 tokens per document
+    collection_version: str = ""
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Sequence[Optional[Dict[str, Any]]] | None = None,
+        collection_version: str = "",
+    ) -> "BM25Index":
+        vocab: Dict[str, int] = {}
+        postings: List[Tuple[int, int, int]] = []  # (term, doc, tf)
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for d, text in enumerate(texts):
+            tokens = tokenize(text or "")
+            lengths[d] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings.append((vocab.setdefault(term, len(vocab)), d, tf))
+        postings.sort()
+        terms = np.fromiter((p[0] for p in postings), dtype=np.int64, count=len(postings))
+        return cls(
+            ids=list(ids),
+            texts=list(texts),
+            metadatas=[m or {} for m in (metadatas or [None] * len(texts))],
+            vocab=vocab,
+            ptr=np.searchsorted(terms, np.arange(len(vocab) + 1)).astype(np.int64),
+            docs=np.fromiter((p[1] for p in postings), dtype=np.int32, count=len(postings)),
+            tfs=np.fromiter((p[2] for p in postings), dtype=np.float32, count=len(postings)),
+            lengths=lengths,
+            collection_version=collection_version,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Top ``k`` (document index, score) pairs for ``query``, best first; documents without a query term are left out."""
+        n = len(self.ids)
+        if not n or k < 1:
+            return []
+        scores = np.zeros(n, dtype=np.float64)
+        avgdl = float(self.lengths.mean()) or 1.0
+        for term in set(tokenize(query)):
+            t = self.vocab.get(term)
+            if t is None:
+                continue
+            docs, tfs = self.docs[self.ptr[t]:self.ptr[t + 1]], self.tfs[self.ptr[t]:self.ptr[t + 1]]
+            idf = np.log(1.0 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            # A document appears once per term's postings, so plain fancy-index += is exact.
+            scores[docs] += idf * tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * self.lengths[docs] / avgdl))
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.lexsort((hits, -scores[hits]))]
+        return [(int(d), float(scores[d])) for d in hits]
+
+    def document(self, i: int) -> Document:
+        return Document(id=self.ids[i], page_content=self.texts[i], metadata=self.metadatas[i])
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"version": BM25_VERSION, "collection_version": self.collection_version, "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas, "vocab": self.vocab}
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), ptr=self.ptr, docs=self.docs, tfs=self.tfs, lengths=self.lengths)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> Optional["BM25Index"]:
+        """The index saved at ``path``, or None when it is missing, unreadable or of another version."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != BM25_VERSION:
+                    return None
+                return cls(meta["ids"], meta["texts"], meta["metadatas"], meta["vocab"],
+                           data["ptr"], data["docs"], data["tfs"], data["lengths"], meta["collection_version"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def collection_documents(collection) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """Every (id, text, metadata) of a Chroma collection (``registry.get_collection``)."""
+    got = collection.get(include=["documents", "metadatas"])
+    return got["ids"], [t or "" for t in got["documents"]], [m or {} for m in got["metadatas"]]
+
+
+def build_index(collection, persist_directory: str | Path, collection_name: str) -> BM25Index:
+    """Build the BM25 index of the whole collection at its current version and persist it."""
+    version = collection_version(collection, persist_directory, collection_name)
+    index = BM25Index.build(*collection_documents(collection), collection_version=version)
+    index.save(index_path(persist_directory, collection_name))
+    log.info("bm25 index built: %s#%s (%d documents, %d terms)", persist_directory, collection_name, len(index), len(index.vocab))
+    return index
+
+
+def load_or_build(collection, persist_directory: str | Path, collection_name: str) -> BM25Index:
+    """The persisted index of the collection, rebuilt when missing or built from another version of it."""
+    index = BM25Index.load(index_path(persist_directory, collection_name))
+    if index is not None and index.collection_version == collection_version(collection, persist_directory, collection_name):
+        return index
+    return build_index(collection, persist_directory, collection_name)
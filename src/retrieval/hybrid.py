@@ -0,0 +1,101 @@
+"""
+Hybrid retrieval: dense (Chroma) and lexical (BM25) rankings fused with
+reciprocal rank fusion.
+
+Both legs rank ``max(RETRIEVAL_CANDIDATES, 4 * k)`` candidates over the whole
+collection. The dense candidates are picked by MMR (``lambda_mult=0.75``,
+like the thesis retriever before it) on a small thread pool while the BM25
+index is scored in the calling thread, so a question costs one embedding +
+vector search. :func:`rrf` scores each document ``sum(1 / (RRF_K + rank))``
+over the rankings it appears in, so documents both legs agree on come
+first and a strong hit from either leg still makes the cut. Repeated
+questions against an unchanged collection are answered from
+``src.retrieval.result_cache`` without either search.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.retrieval.registry import (
+    DEFAULT_COLLECTION,
+    DEFAULT_PERSIST_DIR,
+    EMBED_MODEL_NAME,
+    get_bm25_index,
+    get_collection,
+    get_vector_store,
+)
+from src.retrieval.result_cache import cached_search
+
+RRF_K = 60
+CANDIDATES = int(os.getenv("RETRIEVAL_CANDIDATES", "20"))
+WORKERS = int(os.getenv("RETRIEVAL_WORKERS", "4"))
+# Dense candidates are picked by MMR, as the thesis retriever always did.
+MMR_LAMBDA = 0.75
+MMR_FETCH = 4
+
+_POOL: Optional[ThreadPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def pool() -> ThreadPoolExecutor:
+    """The process-wide pool the dense searches run on."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="retrieval")
+        return _POOL
+
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion of id rankings (best first); ties keep first-seen order."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+
+def hybrid_search(
+    query: str,
+    k: int = 5,
+    persist_directory: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = DEFAULT_COLLECTION,
+) -> List[Document]:
+    """
+    The ``k`` best documents of the collection for ``query`` by fused dense +
+    BM25 rank, from the result cache (``src.retrieval.result_cache``) while
+    the collection is unchanged.
+    """
+    if not query.strip() or k < 1:
+        return []
+    store = get_vector_store(persist_directory, collection_name)
+    candidates = max(CANDIDATES, 4 * k)
+    params = {"k": k, "candidates": candidates, "rrf_k": RRF_K, "mmr": [MMR_LAMBDA, MMR_FETCH], "model": EMBED_MODEL_NAME}
+    return cached_search(
+        get_collection(persist_directory, collection_name), persist_directory, collection_name, query, params,
+        lambda version: _search(store, query, k, candidates, persist_directory, collection_name, version),
+    )
+
+
+def _search(
+    store, query: str, k: int, candidates: int, persist_directory: str | Path, collection_name: str, version: str
+) -> List[Document]:
+    # The index of the version the result is cached under, reloaded if this process still holds an older one.
+    index = get_bm25_index(persist_directory, collection_name, version=version)
+    dense_future = pool().submit(
+        store.max_marginal_relevance_search, query, k=candidates, fetch_k=MMR_FETCH * candidates, lambda_mult=MMR_LAMBDA
+    )
+    lexical = [index.document(i) for i, _ in index.search(query, candidates)]
+    dense = dense_future.result()
+
+    by_id = {d.id: d for d in lexical}
+    by_id.update({d.id: d for d in dense})
+    fused = rrf([[d.id for d in dense], [d.id for d in lexical]])
+    return [by_id[doc_id] for doc_id, _ in fused[:k]]
@@ -0,0 +1,279 @@
+"""
+Offline, incremental ingestion of documents (PDF, Markdown, text) into a
+persona's Chroma collection.
+
+Files are split into overlapping chunks (Markdown along its headings first).
+A chunk's id is the hash of its source and content, so re-ingesting only
+embeds chunks that are new or changed: unchanged ones are already in the
+collection under the same id (only their metadata is updated when their
+position or page moved), and chunks a source no longer produces are
+deleted. Embeddings are computed in large batches with the registry's model
+and upserted batch by batch into the collection (``registry.get_collection``). At the end the collection's version
+(``src.retrieval.version``) is bumped and its BM25 index rebuilt; processes
+serving questions notice the new version on their next search, reload the
+index and stop serving cached results of the old one.
+
+Ingest while nothing else writes to the collection.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_text_splitters import Language, RecursiveCharacterTextSplitter
+
+from src.retrieval.bm25 import build_index, tokenize
+from src.retrieval.registry import (
+    DEFAULT_PERSIST_DIR,
+    EMBED_MODEL_NAME,
+    get_collection,
+    get_embeddings,
+)
+from src.retrieval.version import bump_version
+
+log = logging.getLogger("chat.retrieval")
+
+CHUNK_SIZE = int(os.getenv("RETRIEVAL_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "150"))
+# Chunks per embed_documents call / upsert; the model batches inside it.
+EMBED_BATCH = int(os.getenv("RETRIEVAL_EMBED_BATCH", "512"))
+PROGRESS_EVERY_S = 5.0
+
+PDF_SUFFIXES = (".pdf",)
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+TEXT_SUFFIXES = (".txt",)
+SUFFIXES = PDF_SUFFIXES + MARKDOWN_SUFFIXES + TEXT_SUFFIXES
+
+
+def persona_collection(persona: str) -> str:
+    """Collection name of a persona's knowledge base ('Gonçalo Silva' -> 'goncalo_silva_kb')."""
+    slug = "_".join(tokenize(persona))
+    if not slug:
+        raise ValueError(f"persona name without letters or digits: {persona!r}")
+    return f"{slug}_kb"
+
+
+@dataclass
+class Chunk:
+    """One piece of a source file, as stored in the collection."""
+
+    id: str
+    text: str
+    metadata: Dict[str, Any]
+
+
+@dataclass
+class IngestStats:
+    """Counters reported while and after ingesting."""
+
+    files: int = 0
+    files_failed: int = 0
+    chunks: int = 0
+    chunks_unchanged: int = 0
+    chunks_relabelled: int = 0
+    chunks_embedded: int = 0
+    chunks_deleted: int = 0
+    chars_embedded: int = 0
+    embed_seconds: float = 0.0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def docs_per_s(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        """Embedding throughput (chunks embedded per second spent embedding)."""
+        return self.chunks_embedded / self.embed_seconds if self.embed_seconds else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files:,} files ({self.files_failed} failed), {self.chunks:,} chunks: "
+            f"{self.chunks_embedded:,} embedded, {self.chunks_unchanged:,} unchanged "
+            f"({self.chunks_relabelled:,} with new metadata), {self.chunks_deleted:,} deleted | "
+            f"{self.docs_per_s:,.1f} docs/s, {self.chunks_per_s:,.1f} chunks/s "
+            f"({self.chars_embedded / 1e3 / self.embed_seconds if self.embed_seconds else 0.0:,.1f} kchars/s) embedding, "
+            f"{self.seconds:.1f}s"
+        )
+
+
+def print_progress(stats: IngestStats) -> None:
+    print(f"  ... {stats.summary()}", flush=True)
+
+
+def iter_files(paths: Iterable[str | Path]) -> Iterator[Path]:
+    """The supported files among ``paths``, directories searched recursively, each once and sorted."""
+    seen = set()
+    for path in map(Path, paths):
+        found = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+        for p in found:
+            if p.suffix.lower() in SUFFIXES and p.resolve() not in seen:
+                seen.add(p.resolve())
+                yield p
+
+
+def read_pages(path: Path) -> List[Tuple[Optional[int], str]]:
+    """(page number, text) of a file; Markdown and text files are one page without a number."""
+    if path.suffix.lower() in PDF_SUFFIXES:
+        try:
+            from pypdf import PdfReader
+        except ImportError as exc:
+            raise RuntimeError("PDF ingestion needs pypdf (pip install pypdf)") from exc
+        return [(n, page.extract_text() or "") for n, page in enumerate(PdfReader(path).pages, start=1)]
+    return [(None, path.read_text(encoding="utf-8", errors="replace"))]
+
+
+def _splitter(path: Path, chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    if path.suffix.lower() in MARKDOWN_SUFFIXES:
+        return RecursiveCharacterTextSplitter.from_language(
+            Language.MARKDOWN, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def chunk_id(source: str, text: str) -> str:
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_file(path: Path, source: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[Chunk]:
+    """The chunks of a file; ``source`` is the name stored in their metadata (and part of their ids)."""
+    splitter = _splitter(path, chunk_size, chunk_overlap)
+    chunks: Dict[str, Chunk] = {}
+    for page, text in read_pages(path):
+        for piece in splitter.split_text(re.sub(r"[ \t]+\n", "\n", text)):
+            if not piece.strip():
+                continue
+            cid = chunk_id(source, piece)
+            if cid in chunks:  # same text twice in a file: one chunk is enough
+                continue
+            metadata: Dict[str, Any] = {"source": source, "chunk": len(chunks)}
+            if page is not None:
+                metadata["page"] = page
+            chunks[cid] = Chunk(cid, piece, metadata)
+    return list(chunks.values())
+
+
+def _source_name(path: Path, roots: Sequence[Path]) -> str:
+    """``path`` relative to the input it was found under, so ids survive moving the whole tree."""
+    for root in roots:
+        if root.is_dir() and path.resolve().is_relative_to(root.resolve()):
+            return f"{root.resolve().name}/{path.resolve().relative_to(root.resolve()).as_posix()}"
+    return path.name
+
+
+def _existing_metadata(collection, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """Metadata of those of ``ids`` already in the collection."""
+    if not ids:
+        return {}
+    got = collection.get(ids=list(ids), include=["metadatas"])
+    return {i: m or {} for i, m in zip(got["ids"], got["metadatas"])}
+
+
+def _metadata_update(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Chroma merges updated metadata into the old one; None removes the keys ``new`` no longer has."""
+    return {**{k: None for k in old if k not in new}, **new}
+
+
+def ingest_documents(
+    paths: Iterable[str | Path],
+    collection_name: str,
+    persist_directory: str | Path = DEFAULT_PERSIST_DIR,
+    model_name: str = EMBED_MODEL_NAME,
+    chunk_size: int = CHUNK_SIZE,
+    chunk_overlap: int = CHUNK_OVERLAP,
+    batch_size: int = EMBED_BATCH,
+    prune: bool = False,
+    progress: Optional[Callable[[IngestStats], None]] = None,
+) -> IngestStats:
+    """
+    Chunk, embed and upsert the files under ``paths`` into ``collection_name``.
+
+    Only chunks not already in the collection are embedded (the metadata of
+    the others is brought up to date); chunks of an
+    ingested file that it no longer produces are deleted, and with ``prune``
+    so is every chunk of a source not among ``paths``. A file that cannot be
+    read is logged and skipped (its chunks are kept). Rebuilds the
+    collection's BM25 index when anything changed.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    roots = [Path(p) for p in paths]
+    stats = IngestStats()
+    collection = get_collection(persist_directory, collection_name)
+    embeddings = get_embeddings(model_name)
+    pending: List[Chunk] = []
+    seen_ids: set = set()
+    last_progress = time.monotonic()
+
+    def flush() -> None:
+        if not pending:
+            return
+        texts = [c.text for c in pending]
+        t0 = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        stats.embed_seconds += time.perf_counter() - t0
+        # Straight into the collection: langchain's add_texts would embed the texts again.
+        collection.upsert(
+            ids=[c.id for c in pending], embeddings=vectors, documents=texts, metadatas=[c.metadata for c in pending]
+        )
+        stats.chunks_embedded += len(pending)
+        stats.chars_embedded += sum(map(len, texts))
+        pending.clear()
+
+    for path in iter_files(roots):
+        source = _source_name(path, roots)
+        try:
+            chunks = chunk_file(path, source, chunk_size, chunk_overlap)
+        except Exception as exc:
+            stats.files_failed += 1
+            log.warning("ingest: skipping %s: %s", path, exc)
+            continue
+        stats.files += 1
+        stats.chunks += len(chunks)
+        ids = [c.id for c in chunks]
+        seen_ids.update(ids)
+        existing = _existing_metadata(collection, ids)
+        stats.chunks_unchanged += len(existing)
+        moved = [c for c in chunks if c.id in existing and existing[c.id] != c.metadata]
+        if moved:
+            # Same text, new position or page: a metadata-only update, nothing to embed.
+            collection.update(ids=[c.id for c in moved], metadatas=[_metadata_update(existing[c.id], c.metadata) for c in moved])
+            stats.chunks_relabelled += len(moved)
+        stale = set(collection.get(where={"source": source}, include=[])["ids"]) - set(ids)
+        if stale:
+            collection.delete(ids=sorted(stale))
+            stats.chunks_deleted += len(stale)
+        for chunk in chunks:
+            if chunk.id not in existing:
+                pending.append(chunk)
+                if len(pending) >= batch_size:
+                    flush()
+        if progress is not None and time.monotonic() - last_progress >= PROGRESS_EVERY_S:
+            progress(stats)
+            last_progress = time.monotonic()
+    flush()
+
+    if prune:
+        gone = set(collection.get(include=[])["ids"]) - seen_ids
+        if gone:
+            collection.delete(ids=sorted(gone))
+            stats.chunks_deleted += len(gone)
+
+    if stats.chunks_embedded or stats.chunks_relabelled or stats.chunks_deleted:
+        bump_version(persist_directory, collection_name)
+        build_index(collection, persist_directory, collection_name)
+    stats.finished = time.monotonic()
+    log.info("ingested into %s#%s: %s", persist_directory, collection_name, stats.summary())
+    return stats
@@ -0,0 +1,86 @@
+"""
+Cache of query embeddings.
+
+Interviewers ask the same few thesis questions over and over, and each one
+costs a forward pass of the embedding model on CPU. :class:`CachedEmbeddings`
+wraps a model's embeddings and answers ``embed_query`` from an LRU keyed on
+(model name, normalized query); ``embed_documents`` (ingestion) passes
+through. Queries are normalized to NFC with whitespace collapsed, and the
+normalized text is what gets embedded, so a hit returns the model's own
+vector for that text. Case is kept: cased models embed "Tese" and "tese"
+differently.
+
+``RETRIEVAL_QUERY_CACHE_SIZE`` bounds the in-memory entries (0 disables the
+cache); vectors are kept as float32, about 3 KB each for a 768-dimension
+model. ``RETRIEVAL_QUERY_CACHE_PATH`` additionally persists them to a SQLite
+file, so a restarted API starts warm.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.utils.lru_cache import LRUCache
+
+QUERY_CACHE_SIZE = int(os.getenv("RETRIEVAL_QUERY_CACHE_SIZE", "4096"))
+QUERY_CACHE_PATH = os.getenv("RETRIEVAL_QUERY_CACHE_PATH") or None
+
+_CACHE: Optional[LRUCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def query_cache() -> Optional[LRUCache]:
+    """The process-wide cache, or None when disabled."""
+    global _CACHE
+    if QUERY_CACHE_SIZE <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LRUCache(QUERY_CACHE_SIZE, path=QUERY_CACHE_PATH, name="query_embeddings")
+        return _CACHE
+
+
+def reset_query_cache() -> None:
+    """Drop the process-wide cache (tests, switching models)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is not None:
+            _CACHE.close()
+        _CACHE = None
+
+
+def query_cache_stats() -> Dict[str, Any]:
+    cache = query_cache()
+    return cache.stats() if cache is not None else {"name": "query_embeddings", "disabled": True}
+
+
+def normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class CachedEmbeddings(Embeddings):
+    """``embeddings`` of ``model_name`` with ``embed_query`` served from :func:`query_cache`."""
+
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        text = normalize_query(text)
+        cache = query_cache()
+        if cache is None:
+            return self.embeddings.embed_query(text)
+        key = json.dumps([self.model_name, text], ensure_ascii=False)
+        vector = cache.get_or_compute(key, lambda: np.asarray(self.embeddings.embed_query(text), dtype=np.float32))
+        return vector.tolist()
@@ -0,0 +1,228 @@
+"""
+Process-wide embedding models and vector stores for retrieval.
+
+Loading a sentence-transformers model takes seconds and hundreds of MB, so
+each model is loaded once per process (:func:`get_embeddings`), every
+persist directory gets one Chroma client (:func:`get_chroma_client`, whose
+collections :func:`get_collection` returns for writes and counts) and every
+Chroma store (one per persist directory, collection and model) is opened
+once and reused (:func:`get_vector_store`), like the collection's BM25 index
+(:func:`get_bm25_index`, reloaded when the collection's version changes).
+All are safe to call from
+several threads: a model requested while it is loading waits for that load
+instead of starting another.
+
+``RETRIEVAL_EMBED_MODEL`` names the default model and ``RETRIEVAL_PRELOAD=1``
+makes :func:`preload` (called at API startup) load it before the first
+question. :func:`registry_stats` reports what is loaded, how long each load
+took and the memory it added.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from src.retrieval.query_cache import CachedEmbeddings, query_cache_stats, reset_query_cache
+from src.retrieval.result_cache import reset_result_cache, result_cache_stats
+from src.retrieval.version import collection_version
+
+log = logging.getLogger("chat.retrieval")
+
+EMBED_MODEL_NAME = os.getenv("RETRIEVAL_EMBED_MODEL", "sentence-transformers/all-mpnet-base-v2")
+# Texts per forward pass when embedding (sentence-transformers defaults to 32).
+ENCODE_BATCH = int(os.getenv("RETRIEVAL_ENCODE_BATCH", "64"))
+PRELOAD = os.getenv("RETRIEVAL_PRELOAD", "").lower() in ("1", "true", "yes")
+DEFAULT_PERSIST_DIR = "./chroma_data"
+DEFAULT_COLLECTION = "goncalo_thesis"
+
+StoreKey = Tuple[str, str, str]  # (resolved persist directory, collection, model)
+
+
+@dataclass
+class LoadStats:
+    """One load: how long it took and what it added to the process."""
+
+    name: str
+    seconds: float
+    rss_delta_mb: Optional[float]
+    params_mb: Optional[float] = None
+    uses: int = 0
+
+
+_EMBEDDINGS: Dict[str, Embeddings] = {}
+_CLIENTS: Dict[str, Any] = {}
+_STORES: Dict[StoreKey, Any] = {}
+_INDEXES: Dict[Tuple[str, str], Any] = {}
+_STATS: Dict[str, LoadStats] = {}
+_LOCK = threading.Lock()
+_LOADING: Dict[Any, threading.Lock] = {}
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), or None where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _params_mb(embeddings: Embeddings) -> Optional[float]:
+    """Size of the model weights, when the embeddings wrap a torch model."""
+    model = getattr(embeddings, "_client", None)
+    try:
+        return sum(p.numel() * p.element_size() for p in model.parameters()) / 2**20
+    except (AttributeError, TypeError):
+        return None
+
+
+def _load_embeddings(model_name: str) -> Embeddings:
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=model_name, encode_kwargs={"normalize_embeddings": True, "batch_size": ENCODE_BATCH})
+
+
+def _open_client(persist_directory: str):
+    import chromadb
+
+    return chromadb.PersistentClient(path=persist_directory)
+
+
+def _open_store(client, collection_name: str, embeddings: Embeddings):
+    from langchain_chroma import Chroma
+
+    return Chroma(collection_name=collection_name, embedding_function=embeddings, client=client)
+
+
+def _once(registry: Dict, key, label: str, load):
+    """``registry[key]``, calling ``load()`` at most once per key across threads."""
+    with _LOCK:
+        if key in registry:
+            _STATS[label].uses += 1
+            return registry[key]
+        loading = _LOADING.setdefault(key, threading.Lock())
+    with loading:
+        with _LOCK:
+            if key in registry:
+                _STATS[label].uses += 1
+                return registry[key]
+        rss = _rss_bytes()
+        started = time.perf_counter()
+        value = load()
+        seconds = time.perf_counter() - started
+        after = _rss_bytes()
+        rss_delta = None if rss is None or after is None else round((after - rss) / 2**20, 1)
+        params = _params_mb(value) if isinstance(value, Embeddings) else None
+        stats = LoadStats(label, round(seconds, 3), rss_delta, None if params is None else round(params, 1), uses=1)
+        with _LOCK:
+            registry[key] = value
+            _STATS[label] = stats
+            _LOADING.pop(key, None)
+        log.info("retrieval loaded %s in %.2fs (rss +%s MB)", label, seconds, stats.rss_delta_mb)
+        return value
+
+
+def get_embeddings(model_name: str = EMBED_MODEL_NAME) -> Embeddings:
+    """The process-wide embeddings of ``model_name``, loaded on first use."""
+    return _once(_EMBEDDINGS, model_name, f"model:{model_name}", lambda: _load_embeddings(model_name))
+
+
+def get_chroma_client(persist_directory: str | Path = DEFAULT_PERSIST_DIR):
+    """The process-wide Chroma client of a persist directory, shared by its stores."""
+    path = str(Path(persist_directory).resolve())
+    return _once(_CLIENTS, path, f"client:{path}", lambda: _open_client(path))
+
+
+def get_collection(persist_directory: str | Path = DEFAULT_PERSIST_DIR, collection_name: str = DEFAULT_COLLECTION):
+    """
+    The Chroma collection behind the stores of ``collection_name``, without an
+    embedding function: for writes that bring their own vectors (ingestion)
+    and for reads that need none (counts, metadata).
+    """
+    return get_chroma_client(persist_directory).get_or_create_collection(collection_name, embedding_function=None)
+
+
+def get_vector_store(
+    persist_directory: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = DEFAULT_COLLECTION,
+    model_name: str = EMBED_MODEL_NAME,
+):
+    """
+    The process-wide Chroma store of a persist directory and collection,
+    embedding with ``model_name`` (queries through the query embedding cache).
+    """
+    path = str(Path(persist_directory).resolve())
+    key = (path, collection_name, model_name)
+    return _once(
+        _STORES, key, f"store:{path}#{collection_name}@{model_name}",
+        lambda: _open_store(get_chroma_client(path), collection_name, CachedEmbeddings(get_embeddings(model_name), model_name)),
+    )
+
+
+def get_bm25_index(
+    persist_directory: str | Path = DEFAULT_PERSIST_DIR,
+    collection_name: str = DEFAULT_COLLECTION,
+    model_name: str = EMBED_MODEL_NAME,
+    version: Optional[str] = None,
+):
+    """
+    The collection's BM25 index (``src.retrieval.bm25``), loaded from disk (or
+    built) once per collection version: each lookup compares the cached index
+    with the collection's current ``version`` (read when not given) and
+    reloads it after the collection changed, in this process or another.
+    """
+    from src.retrieval.bm25 import load_or_build
+
+    path = str(Path(persist_directory).resolve())
+    collection = get_collection(path, collection_name)
+    if version is None:
+        version = collection_version(collection, path, collection_name)
+    key = (path, collection_name)
+    with _LOCK:
+        index = _INDEXES.get(key)
+        if index is not None and index.collection_version != version:
+            del _INDEXES[key]
+    return _once(_INDEXES, key, f"bm25:{path}#{collection_name}", lambda: load_or_build(collection, path, collection_name))
+
+
+def preload(model_name: str = EMBED_MODEL_NAME, force: bool = False) -> bool:
+    """Load ``model_name`` now when ``RETRIEVAL_PRELOAD`` (or ``force``) is set; True when it was loaded."""
+    if not (PRELOAD or force):
+        return False
+    get_embeddings(model_name)
+    return True
+
+
+def registry_stats() -> Dict[str, Any]:
+    """Loaded models, stores and indexes with their load time, memory and use count, and the query and result caches' hit rates."""
+    rss = _rss_bytes()
+    with _LOCK:
+        return {
+            "models": [asdict(s) for k, s in _STATS.items() if k.startswith("model:")],
+            "stores": [asdict(s) for k, s in _STATS.items() if k.startswith("store:")],
+            "bm25": [asdict(s) for k, s in _STATS.items() if k.startswith("bm25:")],
+            "query_cache": query_cache_stats(),
+            "result_cache": result_cache_stats(),
+            "rss_mb": None if rss is None else round(rss / 2**20, 1),
+        }
+
+
+def reset_registry() -> None:
+    """Forget every model, client, store and index (tests, reloading a changed collection)."""
+    with _LOCK:
+        _EMBEDDINGS.clear()
+        _CLIENTS.clear()
+        _STORES.clear()
+        _INDEXES.clear()
+        _STATS.clear()
+        _LOADING.clear()
+    reset_query_cache()
+    reset_result_cache()
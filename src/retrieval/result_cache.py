@@ -0,0 +1,99 @@
+"""
+Result cache of thesis retrieval.
+
+A search against an unchanged collection always returns the same documents,
+so :func:`cached_search` keeps them keyed on (persist directory, collection,
+collection version, normalized query, search parameters): a repeated question
+costs neither a query embedding nor a vector search.
+
+The collection version is a token in ``<persist_dir>/_versions/<collection>``
+that ingestion replaces (:func:`bump_version`) whenever it changes the
+collection, plus the collection's document count (so documents added by other
+means also count as a change). Changing a collection only changes the keys of
+that collection; its old entries age out of the LRU, like the health result
+cache's.
+
+``RETRIEVAL_RESULT_CACHE_SIZE`` bounds the in-memory entries (0 disables the
+cache); ``RETRIEVAL_RESULT_CACHE_PATH`` additionally persists them to a SQLite
+file.
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from src.retrieval.query_cache import normalize_query
+from src.retrieval.version import collection_version
+from src.utils.lru_cache import MISSING, LRUCache
+
+RESULT_CACHE_SIZE = int(os.getenv("RETRIEVAL_RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_PATH = os.getenv("RETRIEVAL_RESULT_CACHE_PATH") or None
+
+_CACHE: Optional[LRUCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def result_cache() -> Optional[LRUCache]:
+    """The process-wide cache, or None when disabled."""
+    global _CACHE
+    if RESULT_CACHE_SIZE <= 0:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LRUCache(RESULT_CACHE_SIZE, path=RESULT_CACHE_PATH, name="retrieval")
+        return _CACHE
+
+
+def reset_result_cache() -> None:
+    """Drop the process-wide cache (tests, maintenance scripts)."""
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is not None:
+            _CACHE.close()
+        _CACHE = None
+
+
+def result_cache_stats() -> Dict[str, Any]:
+    cache = result_cache()
+    return cache.stats() if cache is not None else {"name": "retrieval", "disabled": True}
+
+
+def cached_search(
+    collection,
+    persist_directory: str | Path,
+    collection_name: str,
+    query: str,
+    params: Dict[str, Any],
+    search: Callable[[str], List[Document]],
+) -> List[Document]:
+    """
+    Result of ``search(version)`` for ``query`` with ``params`` on the Chroma
+    ``collection`` (``registry.get_collection``), from the cache when the collection hasn't changed since it
+    was stored.
+
+    ``search`` gets the collection version the entry is keyed on and must
+    search that version (the BM25 index is looked up with it). A result is
+    only stored when the collection still has that version afterwards, so an
+    ingestion finishing mid-search can't leave a mixed result under either
+    key. Callers get their own copy, so mutating a result never alters the
+    cache.
+    """
+    path = str(Path(persist_directory).resolve())
+    version = collection_version(collection, path, collection_name)
+    cache = result_cache()
+    if cache is None:
+        return search(version)
+    key = json.dumps([path, collection_name, version, normalize_query(query), params], sort_keys=True, ensure_ascii=False)
+    value = cache.get(key)
+    if value is MISSING:
+        value = search(version)
+        if collection_version(collection, path, collection_name) == version:
+            cache.put(key, value)
+    return copy.deepcopy(value)
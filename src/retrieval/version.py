@@ -0,0 +1,47 @@
+"""
+Version of a Chroma collection, for everything derived from it.
+
+The version is a token in ``<persist_dir>/_versions/<collection>`` that
+ingestion replaces (:func:`bump_version`) whenever it changes the collection,
+plus the collection's document count, so documents added by other means
+count as a change too. Both are read from disk on every call, so a process
+sees changes made by another one (the ingest CLI) on its next lookup: the
+BM25 index records the version it was built from and is reloaded when it
+moves, and cached search results are keyed on it.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from pathlib import Path
+
+VERSIONS_DIR = "_versions"
+
+
+def version_path(persist_directory: str | Path, collection_name: str) -> Path:
+    return Path(persist_directory) / VERSIONS_DIR / collection_name
+
+
+def bump_version(persist_directory: str | Path, collection_name: str) -> str:
+    """Give the collection a new version token; everything built from the old one is stale."""
+    path = version_path(persist_directory, collection_name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = f"{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(token, encoding="utf-8")
+    os.replace(tmp, path)
+    return token
+
+
+def collection_version(collection, persist_directory: str | Path, collection_name: str) -> str:
+    """
+    The version token of Chroma ``collection`` (``registry.get_collection``;
+    empty before its first ingestion) and its document count.
+    """
+    try:
+        token = version_path(persist_directory, collection_name).read_text(encoding="utf-8").strip()
+    except OSError:
+        token = ""
+    return f"{token}:{collection.count()}"
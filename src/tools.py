@@ -1,4 +1,4 @@
-import os, json, requests
+import asyncio, os, json, requests, functools, inspect
 from collections import Counter
 from typing import Optional, Dict, Any, List
 from langchain_core.tools import tool
@@ -10,18 +10,28 @@ import duckdb
 from datetime import datetime
 from pathlib import Path
 from typing import Union, Dict, Any
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_community.retrievers import BM25Retriever
-
-def _connect(path:str) -> duckdb.DuckDBPyConnection:
-    """Create an in-memory DuckDB connection and expose a 'health' view over all parquet files."""
-    con = duckdb.connect(database=":memory:")
-    con.execute(f"""
-        CREATE OR REPLACE VIEW health AS
-        SELECT * FROM read_parquet('{Path(path)}/**/*.parquet', filename=true);
-    """)
-    return con
+from src.health import analytics
+from src.health.cache import cached
+from src.health.catalog import metric_coverage, refresh_catalog
+from src.health.engine import get_engine
+from src.health.executor import HealthQueryTimeout, run_async, run_sync, tool_timeout
+from src.health.metrics import METRICS, Metric, get_metric
+from src.health.query import MetricStats, period_stats
+from src.retrieval.hybrid import hybrid_search
+from src.retrieval.registry import DEFAULT_COLLECTION, DEFAULT_PERSIST_DIR
+
+def _cached(fn):
+    """Serve a health tool from the result cache, keyed on its path, dataset version and arguments."""
+    sig = inspect.signature(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()  # an omitted default and the same value passed explicitly share an entry
+        call = dict(bound.arguments)
+        path = call.pop("path")
+        return cached(path, fn.__name__, call, lambda: fn(*args, **kwargs))
+    return wrapper
 
 def _parse_dt(x: Union[str, datetime]) -> datetime:
     """Parse ISO date string or passthrough datetime to a datetime object."""
@@ -36,8 +46,15 @@ def get_date() -> str:
     """
     return datetime.utcnow().date().isoformat()
 
+# Health tools are thin wrappers over the metric registry (src/health/metrics.py)
+# and its single query engine (src/health/query.py).
+def _stats(path: str, names: List[str], start_date, end_date) -> Dict[str, MetricStats]:
+    ranges = [(_parse_dt(start_date), _parse_dt(end_date))]
+    return period_stats(path, [get_metric(n) for n in names], ranges)[0]
+
 # ---- 1) Total calories in period (and split) ----
 @tool
+@_cached
 def calories_burned(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, float]:
     """
     Tool that returns total, active, and basal calories burned within a period.
@@ -54,32 +71,17 @@ def calories_burned(path:str, start_date: Union[str, datetime], end_date: Union[
             "basal_calories_kcal": float
         }
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    SELECT
-      SUM(CASE WHEN "@type" IN (
-            'HKQuantityTypeIdentifierActiveEnergyBurned',
-            'HKQuantityTypeIdentifierBasalEnergyBurned'
-          ) THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS total_calories,
-      SUM(CASE WHEN "@type"='HKQuantityTypeIdentifierActiveEnergyBurned'
-               THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS active_calories,
-      SUM(CASE WHEN "@type"='HKQuantityTypeIdentifierBasalEnergyBurned'
-               THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS basal_calories
-    FROM health
-    WHERE "@startDate" >= ? AND "@startDate" < ?
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
+    st = _stats(path, ["calories", "active_calories", "basal_calories"], start_date, end_date)
     return {
-        "total_calories_kcal": float(row[0] or 0.0),
-        "active_calories_kcal": float(row[1] or 0.0),
-        "basal_calories_kcal": float(row[2] or 0.0),
+        "total_calories_kcal": st["calories"].total,
+        "active_calories_kcal": st["active_calories"].total,
+        "basal_calories_kcal": st["basal_calories"].total,
     }
 
 
 # ---- 1b) Average calories per day in period ----
 @tool
+@_cached
 def average_calories_per_day(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> float:
     """
     Tool that returns the average calories per day (active + basal) within a period.
@@ -92,29 +94,12 @@ def average_calories_per_day(path:str, start_date: Union[str, datetime], end_dat
     Returns:
         float: average kcal per day
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    WITH daily AS (
-      SELECT
-        date_trunc('day', "@startDate") AS day,
-        SUM(CASE WHEN "@type" IN (
-            'HKQuantityTypeIdentifierActiveEnergyBurned',
-            'HKQuantityTypeIdentifierBasalEnergyBurned'
-        ) THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS calories
-      FROM health
-      WHERE "@startDate" >= ? AND "@startDate" < ?
-      GROUP BY 1
-    )
-    SELECT AVG(calories) FROM daily
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
-    return float(row[0] or 0.0)
+    return _stats(path, ["calories"], start_date, end_date)["calories"].daily_avg
 
 
 # ---- 2) Max calories day in period ----
 @tool
+@_cached
 def max_daily_calories(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
     """
     Tool that returns the day with the maximum total calories (active + basal) and its value.
@@ -127,34 +112,13 @@ def max_daily_calories(path:str, start_date: Union[str, datetime], end_date: Uni
     Returns:
         Dict[str, Any]: {"day": datetime | None, "calories_kcal": float}
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    WITH daily AS (
-      SELECT
-        date_trunc('day', "@startDate") AS day,
-        SUM(CASE WHEN "@type" IN (
-              'HKQuantityTypeIdentifierActiveEnergyBurned',
-              'HKQuantityTypeIdentifierBasalEnergyBurned'
-            ) THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS calories
-      FROM health
-      WHERE "@startDate" >= ? AND "@startDate" < ?
-      GROUP BY 1
-    )
-    SELECT day, calories
-    FROM daily
-    ORDER BY calories DESC
-    LIMIT 1
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
-    if not row:
-        return {"day": None, "calories_kcal": 0.0}
-    return {"day": row[0], "calories_kcal": float(row[1] or 0.0)}
+    st = _stats(path, ["calories"], start_date, end_date)["calories"]
+    return {"day": st.max_day, "calories_kcal": st.max}
 
 
 # ---- 3) Longest run day in period ----
 @tool
+@_cached
 def longest_run(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
     """
     Tool that returns the day with the longest total walking/running distance (km).
@@ -171,42 +135,13 @@ def longest_run(path:str, start_date: Union[str, datetime], end_date: Union[str,
     Returns:
         Dict[str, Any]: {"day": datetime | None, "distance_km": float}
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    WITH runs AS (
-      SELECT
-        date_trunc('day', "@startDate") AS day,
-        CASE
-          WHEN "@type"='HKQuantityTypeIdentifierDistanceWalkingRunning' AND "@unit"='m'
-            THEN CAST("@value" AS DOUBLE)/1000.0
-          WHEN "@type"='HKQuantityTypeIdentifierDistanceWalkingRunning' AND "@unit"='km'
-            THEN CAST("@value" AS DOUBLE)
-          ELSE NULL
-        END AS km
-      FROM health
-      WHERE "@startDate" >= ? AND "@startDate" < ?
-    ),
-    daily AS (
-      SELECT day, SUM(km) AS day_km
-      FROM runs
-      WHERE km IS NOT NULL
-      GROUP BY 1
-    )
-    SELECT day, day_km
-    FROM daily
-    ORDER BY day_km DESC
-    LIMIT 1
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
-    if not row:
-        return {"day": None, "distance_km": 0.0}
-    return {"day": row[0], "distance_km": float(row[1] or 0.0)}
+    st = _stats(path, ["distance"], start_date, end_date)["distance"]
+    return {"day": st.max_day, "distance_km": st.max}
 
 
 # ---- 4) Average steps per day ----
 @tool
+@_cached
 def average_steps_per_day(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> float:
     """
     Tool that returns the average number of steps per day in a period.
@@ -219,28 +154,12 @@ def average_steps_per_day(path:str, start_date: Union[str, datetime], end_date:
     Returns:
         float: average daily steps
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    WITH daily AS (
-      SELECT
-        date_trunc('day', "@startDate") AS day,
-        SUM(CASE WHEN "@type"='HKQuantityTypeIdentifierStepCount'
-                 THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS steps
-      FROM health
-      WHERE "@startDate" >= ? AND "@startDate" < ?
-      GROUP BY 1
-    )
-    SELECT AVG(steps) AS avg_steps
-    FROM daily
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
-    return float(row[0] or 0.0)
+    return _stats(path, ["steps"], start_date, end_date)["steps"].daily_avg
 
 
 # ---- 4b) Day with max steps ----
 @tool
+@_cached
 def max_steps_day(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
     """
     Tool that returns the day with the maximum total steps and the step count.
@@ -253,28 +172,343 @@ def max_steps_day(path:str, start_date: Union[str, datetime], end_date: Union[st
     Returns:
         Dict[str, Any]: {"day": datetime | None, "steps": int}
     """
-    start_ts = _parse_dt(start_date); end_ts = _parse_dt(end_date)
-    con = _connect(path)
-    q = """
-    WITH daily AS (
-      SELECT
-        date_trunc('day', "@startDate") AS day,
-        SUM(CASE WHEN "@type"='HKQuantityTypeIdentifierStepCount'
-                 THEN CAST("@value" AS DOUBLE) ELSE 0 END) AS steps
-      FROM health
-      WHERE "@startDate" >= ? AND "@startDate" < ?
-      GROUP BY 1
-    )
-    SELECT day, steps
-    FROM daily
-    ORDER BY steps DESC
-    LIMIT 1
-    """
-    row = con.execute(q, [start_ts, end_ts]).fetchone()
-    con.close()
-    if not row:
-        return {"day": None, "steps": 0}
-    return {"day": row[0], "steps": int(row[1] or 0)}
+    st = _stats(path, ["steps"], start_date, end_date)["steps"]
+    return {"day": st.max_day, "steps": int(st.max)}
+
+
+# ---- 5) Activity summary: every metric above in one pass ----
+SUMMARY_METRICS = ["calories", "active_calories", "basal_calories", "steps", "distance"]
+MAX_PERIODS = 24
+
+def _day(x) -> Optional[str]:
+    return x.date().isoformat() if x is not None else None
+
+def _summary(st: Dict[str, MetricStats]) -> Dict[str, Any]:
+    """Shape the SUMMARY_METRICS stats of one period; the values match the single-metric tools."""
+    cal, steps, run = st["calories"], st["steps"], st["distance"]
+    return {
+        "days_with_data": cal.days,
+        "calories": {
+            "total_kcal": cal.total,
+            "active_kcal": st["active_calories"].total,
+            "basal_kcal": st["basal_calories"].total,
+            "avg_per_day_kcal": cal.daily_avg,
+            "max_day": _day(cal.max_day),
+            "max_day_kcal": cal.max,
+        },
+        "steps": {
+            "avg_per_day": steps.daily_avg,
+            "max_day": _day(steps.max_day),
+            "max_day_steps": int(steps.max),
+        },
+        "longest_run": {"day": _day(run.max_day), "distance_km": run.max},
+    }
+
+def _summaries(path: str, ranges: List[tuple]) -> List[Dict[str, Any]]:
+    """Activity summaries of several [start, end) ranges from one grouped query."""
+    stats = period_stats(path, [get_metric(n) for n in SUMMARY_METRICS], ranges)
+    return [
+        {"start": s.isoformat(), "end": e.isoformat(), **_summary(st)}
+        for (s, e), st in zip(ranges, stats)
+    ]
+
+@tool
+@_cached
+def health_summary(path:str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
+    """
+    Tool that returns an activity summary of a period in one call: calories
+    (total, active, basal, daily average, best day), steps (daily average,
+    best day) and the longest walking/running day. Prefer it over calling the
+    single-metric tools one by one.
+
+    Args:
+        path: path to health parquet data
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+
+    Returns:
+        Dict[str, Any]: {
+            "start": str, "end": str, "days_with_data": int,
+            "calories": {"total_kcal", "active_kcal", "basal_kcal", "avg_per_day_kcal", "max_day", "max_day_kcal"},
+            "steps": {"avg_per_day", "max_day", "max_day_steps"},
+            "longest_run": {"day", "distance_km"}
+        }  (days as YYYY-MM-DD, None when the period has no such data)
+    """
+    return _summaries(path, [(_parse_dt(start_date), _parse_dt(end_date))])[0]
+
+@tool
+def compare_periods(path:str, periods: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Tool that returns the health_summary of several periods in one call, for
+    comparisons such as "my steps in January vs February vs March".
+
+    Args:
+        path: path to health parquet data
+        periods: list of {"label": optional name, "start_date": inclusive ISO date,
+                 "end_date": exclusive ISO date} (at most 24)
+
+    Returns:
+        Dict[str, Dict[str, Any]]: label (or "start/end") -> the health_summary of that period
+    """
+    if not periods:
+        raise ValueError("periods must not be empty")
+    if len(periods) > MAX_PERIODS:
+        raise ValueError(f"at most {MAX_PERIODS} periods per call")
+    # Labels are filled in before the cache, so they are part of its key as spelled.
+    labelled = [{**p, "label": p.get("label") or f"{p['start_date']}/{p['end_date']}"} for p in periods]
+    return _compare_periods(path, labelled)
+
+@_cached
+def _compare_periods(path: str, periods: List[Dict[str, str]]) -> Dict[str, Dict[str, Any]]:
+    labels = [p["label"] for p in periods]
+    if len(set(labels)) != len(labels):
+        raise ValueError("period labels must be unique")
+    ranges = [(_parse_dt(p["start_date"]), _parse_dt(p["end_date"])) for p in periods]
+    return dict(zip(labels, _summaries(path, ranges)))
+
+# ---- 6) One <metric>_stats tool per registered metric ----
+def _metric_tool(metric: Metric):
+    """Generate the LangChain tool of a registry metric."""
+    has_total = metric.daily == "sum"
+
+    def fn(path: str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
+        st = _stats(path, [metric.name], start_date, end_date)[metric.name]
+        num = int if metric.integer else (lambda v: round(v, 2))
+        out = {"metric": metric.name, "unit": metric.unit, "days": st.days}
+        if has_total:
+            out["total"] = num(st.total)
+        out.update({
+            "avg_per_day": round(st.daily_avg, 2),
+            "max_day": _day(st.max_day), "max": num(st.max),
+            "min_day": _day(st.min_day), "min": num(st.min),
+        })
+        return out
+
+    days = ("every day with any health record counts (0 when missing)" if metric.fill_days
+            else "only days with such records count")
+    fn.__name__ = fn.__qualname__ = f"{metric.name}_stats"
+    fn.__doc__ = f"""
+    Tool that returns {metric.label} statistics for a period ({"total, " if has_total else ""}average per day,
+    and the days with the highest and lowest value). A day's value is the {metric.daily} of its records
+    in {metric.unit or "the recorded unit"}; {days}.
+
+    Args:
+        path: path to health parquet data
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+
+    Returns:
+        Dict[str, Any]: {{"metric", "unit", "days", {'"total", ' if has_total else ""}"avg_per_day", "max_day", "max", "min_day", "min"}}
+        (days as YYYY-MM-DD, None when the period has no data)
+    """
+    return tool(_cached(fn))
+
+METRIC_TOOLS = [_metric_tool(m) for m in METRICS.values() if m.tool]
+
+# ---- 7) What the dataset holds (from its catalog, no scan) ----
+@tool
+@_cached
+def available_health_metrics(path: str) -> Dict[str, Any]:
+    """
+    Tool that returns which health metrics have data and for which dates. Call it
+    first when unsure whether a metric or period exists for this person.
+
+    Args:
+        path: path to health parquet data
+
+    Returns:
+        Dict[str, Any]: {
+            "start": first day with data (YYYY-MM-DD) | None,
+            "end": last day with data | None,
+            "records": int,
+            "metrics": [{"metric", "unit", "rows", "start", "end"}]
+        }
+    """
+    engine = get_engine(path)
+    engine.refresh()
+    catalog = engine.catalog or refresh_catalog(engine.path)
+    return {
+        "start": catalog.start,
+        "end": catalog.end,
+        "records": catalog.rows,
+        "metrics": metric_coverage(catalog, METRICS.values()),
+    }
+
+# ---- 8) Streaks, rolling averages, distributions and trends of one metric ----
+# Each reads the metric's daily values once (src/health/analytics.py) and computes in NumPy.
+DEFAULT_PERCENTILES = [10, 25, 50, 75, 90]
+MAX_WINDOW_DAYS = 366
+
+def _daily(path: str, metric: str, start_date, end_date):
+    return analytics.daily_values(path, get_metric(metric), _parse_dt(start_date), _parse_dt(end_date))
+
+@tool
+@_cached
+def metric_streak(path: str, metric: str, threshold: float, start_date: Union[str, datetime],
+                  end_date: Union[str, datetime], below: bool = False) -> Dict[str, Any]:
+    """
+    Tool that returns the longest streak of consecutive days where a metric's daily
+    value was at least `threshold` (at most, with below=True), e.g. "longest streak
+    over 10000 steps". A day without data breaks the streak.
+
+    Args:
+        path: path to health parquet data
+        metric: metric name (e.g. "steps", "exercise_minutes", "resting_heart_rate";
+                see available_health_metrics)
+        threshold: daily value to meet, in the metric's unit
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+        below: count days at or below the threshold instead
+
+    Returns:
+        Dict[str, Any]: {"metric", "threshold", "days", "days_meeting",
+                         "longest": {"days", "start", "end"},
+                         "current": {"days", "start", "end"}}  (streak ending on the last day with data)
+    """
+    days, values = _daily(path, metric, start_date, end_date)
+    return {"metric": metric, "threshold": threshold, **analytics.longest_streak(days, values, threshold, below)}
+
+@tool
+@_cached
+def metric_rolling_average(path: str, metric: str, start_date: Union[str, datetime],
+                           end_date: Union[str, datetime], window_days: int = 7) -> Dict[str, Any]:
+    """
+    Tool that returns a metric's best, worst and latest rolling average over
+    `window_days` consecutive days, e.g. "my best week for exercise minutes".
+
+    Args:
+        path: path to health parquet data
+        metric: metric name (see available_health_metrics)
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+        window_days: window length in days (default 7)
+
+    Returns:
+        Dict[str, Any]: {"metric", "window_days", "windows",
+                         "best"/"worst"/"latest": {"start", "end", "avg", "days"} | None}
+    """
+    if not 1 <= window_days <= MAX_WINDOW_DAYS:
+        raise ValueError(f"window_days must be between 1 and {MAX_WINDOW_DAYS}")
+    days, values = _daily(path, metric, start_date, end_date)
+    return {"metric": metric, "window_days": window_days, **analytics.rolling_means(days, values, window_days)}
+
+@tool
+@_cached
+def metric_distribution(path: str, metric: str, start_date: Union[str, datetime],
+                        end_date: Union[str, datetime], percentiles: Optional[List[float]] = None) -> Dict[str, Any]:
+    """
+    Tool that returns the distribution of a metric's daily values in a period:
+    mean, standard deviation and percentiles (e.g. "what is a typical day").
+
+    Args:
+        path: path to health parquet data
+        metric: metric name (see available_health_metrics)
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+        percentiles: percentiles between 0 and 100 (default 10, 25, 50, 75, 90)
+
+    Returns:
+        Dict[str, Any]: {"metric", "unit", "days", "mean", "std", "percentiles": {"p50": float, ...}}
+    """
+    qs = DEFAULT_PERCENTILES if not percentiles else percentiles
+    if any(not 0 <= q <= 100 for q in qs):
+        raise ValueError("percentiles must be between 0 and 100")
+    days, values = _daily(path, metric, start_date, end_date)
+    return {"metric": metric, "unit": get_metric(metric).unit, **analytics.percentiles(values, qs)}
+
+@tool
+@_cached
+def metric_trend(path: str, metric: str, start_date: Union[str, datetime], end_date: Union[str, datetime]) -> Dict[str, Any]:
+    """
+    Tool that returns whether a metric is trending up, down or flat over a period,
+    from a linear fit of its daily values.
+
+    Args:
+        path: path to health parquet data
+        metric: metric name (see available_health_metrics)
+        start_date: inclusive lower bound (ISO string or datetime)
+        end_date:   exclusive upper bound (ISO string or datetime)
+
+    Returns:
+        Dict[str, Any]: {"metric", "unit", "days", "direction": "up" | "down" | "flat" | None,
+                         "slope_per_day", "slope_per_week", "start_value", "end_value",
+                         "change_pct", "r2"}  (fitted values; None with fewer than 2 days)
+    """
+    days, values = _daily(path, metric, start_date, end_date)
+    return {"metric": metric, "unit": get_metric(metric).unit, **analytics.linear_trend(days, values)}
+
+ANALYTICS_TOOLS = [metric_streak, metric_rolling_average, metric_distribution, metric_trend]
+
+HEALTH_TOOLS = [
+    calories_burned, average_calories_per_day, max_daily_calories, longest_run,
+    average_steps_per_day, max_steps_day, health_summary, compare_periods, available_health_metrics,
+    *METRIC_TOOLS, *ANALYTICS_TOOLS,
+]
+
+# ---- 9) Deadlines: every health tool runs on the health query pool ----
+def _warm(path: Optional[str]) -> None:
+    """
+    Build the dataset's views, rollups, cube and catalog (first use, or after
+    the dataset changed) before the tool's clock starts: that build can't be
+    interrupted, and a narrower date range wouldn't make it shorter.
+    """
+    if path is not None:
+        get_engine(path).refresh()
+
+def _timed_out(name: str, timeout: float, path: Optional[str] = None) -> Dict[str, Any]:
+    if path is not None and get_engine(path).building:
+        # The dataset changed again after _warm and is being rebuilt inside the budget.
+        return {
+            "error": "warming_up",
+            "tool": name,
+            "timeout_s": timeout,
+            "message": "The health data is still being prepared after an update. Try again in a moment.",
+        }
+    return {
+        "error": "timeout",
+        "tool": name,
+        "timeout_s": timeout,
+        "message": f"The query took longer than {timeout:g}s and was cancelled. Try a narrower date range.",
+    }
+
+def _with_deadline(t):
+    """
+    Run a health tool on the health query pool (src/health/executor.py) within
+    its time budget, from invoke and ainvoke. A query past the budget is
+    interrupted and the agent gets a _timed_out result instead of an answer.
+    The dataset is brought up to date first (_warm), outside the budget.
+    """
+    fn = t.func
+    sig = inspect.signature(fn)
+
+    def dataset(args, kwargs) -> Optional[str]:
+        return sig.bind_partial(*args, **kwargs).arguments.get("path")
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        timeout = tool_timeout(t.name)
+        path = dataset(args, kwargs)
+        _warm(path)
+        try:
+            return run_sync(fn, *args, timeout=timeout, **kwargs)
+        except HealthQueryTimeout:
+            return _timed_out(t.name, timeout, path)
+
+    @functools.wraps(fn)
+    async def arun(*args, **kwargs):
+        timeout = tool_timeout(t.name)
+        path = dataset(args, kwargs)
+        await asyncio.to_thread(_warm, path)
+        try:
+            return await run_async(fn, *args, timeout=timeout, **kwargs)
+        except HealthQueryTimeout:
+            return _timed_out(t.name, timeout, path)
+
+    t.func, t.coroutine = run, arun
+    return t
+
+for _t in HEALTH_TOOLS:
+    _with_deadline(_t)
 
 @tool
 def get_user_repo_summary(username: str, token: Optional[str] = None) -> Dict[str, Any]:
@@ -378,52 +612,12 @@ def query_knowledge_base_thesis(
         List[str]: list of document contents (page_content from each result)
     """
     if path is None:
-        path ="./chroma_data"
+        path = DEFAULT_PERSIST_DIR
     if collection_name is None:
-        collection_name ="goncalo_thesis"
-    
-    EMBED_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
-    
-    def build_dense_retriever(k_val):
-        emb = HuggingFaceEmbeddings(
-            model_name=EMBED_MODEL_NAME,
-            encode_kwargs={"normalize_embeddings": True},
-        )
-        vs = Chroma(
-            collection_name=collection_name,
-            embedding_function=emb,
-            persist_directory=path,
-        )
-        return vs.as_retriever(
-            search_type="mmr",
-            search_kwargs={
-                "k": k_val,
-                "fetch_k": max(20, 4 * k_val),
-                "lambda_mult": 0.75
-            }
-        )
-    
-    def build_bm25_retriever(k_val, q):
-        dense = build_dense_retriever(k_val)
-        docs = dense.invoke(q)
-        bm25 = BM25Retriever.from_documents(docs)
-        bm25.k = k_val
-        return bm25
-    
-    def hybrid_query(q, k_val):
-        bm25 = build_bm25_retriever(k_val, q)
-        bm25_results = bm25.invoke(q)
-        
-        if bm25_results:
-            dense = build_dense_retriever(k_val)
-            dense_results = dense.invoke(q)
-            combined_results = bm25_results + dense_results
-            return combined_results[:k_val]
-        
-        return []
-    
-    # Perform the hybrid query
-    results = hybrid_query(query, 5)
+        collection_name = DEFAULT_COLLECTION
+
+    # Dense + corpus-wide BM25 in parallel, fused by rank (src/retrieval/hybrid.py).
+    results = hybrid_search(query, 5, path, collection_name)
     
     # Return just the page_content strings
     return [doc.page_content for doc in results]
\ No newline at end of file
@@ -0,0 +1,144 @@
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with hit/miss counters.
+
+    Keys are strings. With ``path`` set, entries are also written to a SQLite
+    file (values pickled), so a restarted process starts warm; the file keeps
+    at most ``disk_maxsize`` entries, least recently used dropped first.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        path: Optional[Union[str, Path]] = None,
+        disk_maxsize: Optional[int] = None,
+        name: str = "cache",
+    ):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self.disk_maxsize = disk_maxsize or 10 * maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._disk_writes = 0
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, used REAL)")
+
+    def get(self, key: str, default: Any = MISSING) -> Any:
+        """Return the cached value (counting a hit) or ``default`` (counting a miss)."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            value = self._disk_get(key)
+            if value is not MISSING:
+                self._store(key, value)
+                self.hits += 1
+                self.disk_hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._store(key, value)
+            self._disk_put(key, value)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """Cached value for ``key``, computing and storing it on a miss (outside the lock)."""
+        value = self.get(key)
+        if value is MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.disk_hits = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "persistent": self._db is not None,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # ---- internals (lock held) ----
+    def _store(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Any:
+        if self._db is None:
+            return MISSING
+        row = self._db.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return MISSING
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # Written by an incompatible version: treat as a miss.
+            self._db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return MISSING
+        self._db.execute("UPDATE cache SET used = ? WHERE key = ?", (time.time(), key))
+        return value
+
+    def _disk_put(self, key: str, value: Any) -> None:
+        if self._db is None:
+            return
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return
+        self._db.execute("INSERT OR REPLACE INTO cache (key, value, used) VALUES (?, ?, ?)", (key, blob, time.time()))
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._db.execute(
+                "DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY used DESC LIMIT ?)",
+                (self.disk_maxsize,),
+            )
@@ -0,0 +1,17 @@
+import pytest
+
+from src.health.cache import reset_cache
+from src.health.engine import reset_engines
+from .factories import make_health_records, write_health_dataset
+
+
+@pytest.fixture()
+def health_path(tmp_path):
+    """Dataset de saúde sintético e engines limpos entre testes."""
+    reset_engines()
+    reset_cache()
+    root = tmp_path / "health_parquet"
+    write_health_dataset(root, make_health_records())
+    yield str(root)
+    reset_engines()
+    reset_cache()
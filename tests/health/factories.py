@@ -0,0 +1,70 @@
+from pathlib import Path
+import pandas as pd
+
+STEPS = "HKQuantityTypeIdentifierStepCount"
+ACTIVE = "HKQuantityTypeIdentifierActiveEnergyBurned"
+BASAL = "HKQuantityTypeIdentifierBasalEnergyBurned"
+DISTANCE = "HKQuantityTypeIdentifierDistanceWalkingRunning"
+
+
+def make_record(type_, start, value, unit, source="iPhone de Teste"):
+    return {
+        "@type": type_,
+        "@sourceName": source,
+        "@sourceVersion": "17.0",
+        "@unit": unit,
+        "@creationDate": start,
+        "@startDate": start,
+        "@endDate": start,
+        "@value": str(value),
+    }
+
+
+def make_health_records():
+    """Pequeno histórico: 3 dias em janeiro, 1 em fevereiro e 1 em março de 2024."""
+    return [
+        make_record(STEPS, "2024-01-10 08:00:00 +0000", 4000, "count"),
+        make_record(STEPS, "2024-01-10 18:00:00 +0000", 2000, "count"),
+        make_record(STEPS, "2024-01-11 09:00:00 +0000", 9000, "count"),
+        make_record(STEPS, "2024-01-12 09:00:00 +0000", 3000, "count"),
+        make_record(ACTIVE, "2024-01-10 08:00:00 +0000", 300, "kcal"),
+        make_record(BASAL, "2024-01-10 08:00:00 +0000", 1500, "kcal"),
+        make_record(ACTIVE, "2024-01-11 09:00:00 +0000", 500, "kcal"),
+        make_record(BASAL, "2024-01-11 09:00:00 +0000", 1600, "kcal"),
+        make_record(DISTANCE, "2024-01-11 09:00:00 +0000", 5.5, "km"),
+        make_record(DISTANCE, "2024-01-12 09:00:00 +0000", 7000, "m"),
+        make_record(STEPS, "2024-02-03 10:00:00 +0000", 12000, "count"),
+        make_record(ACTIVE, "2024-02-03 10:00:00 +0000", 800, "kcal"),
+        make_record(DISTANCE, "2024-02-03 10:00:00 +0000", 10.0, "km"),
+        make_record(STEPS, "2024-03-01 07:00:00 +0000", 1000, "count"),
+    ]
+
+
+def write_health_dataset(root: Path, records):
+    """Escreve os registos no mesmo layout que data/partion_data.py (year=/month=)."""
+    df = pd.DataFrame(records)
+    df["@startDate"] = pd.to_datetime(df["@startDate"], utc=True)
+    df["year"] = df["@startDate"].dt.year.astype("int32")
+    df["month"] = df["@startDate"].dt.month.astype("int16")
+    df.to_parquet(root, engine="pyarrow", compression="snappy", partition_cols=["year", "month"], index=False)
+    return root
+
+
+def write_health_csv(path: Path, records):
+    """Escreve os registos como o export.csv achatado do Apple Health."""
+    pd.DataFrame(records).to_csv(path, index=False)
+    return path
+
+
+def write_health_xml(path: Path, records, extra=""):
+    """Escreve os registos como o export.xml do Apple Health (``extra`` entra antes do fecho)."""
+    from xml.sax.saxutils import quoteattr
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', "<!DOCTYPE HealthData [", "<!ELEMENT HealthData (ExportDate,Record*)>", "]>",
+             '<HealthData locale="pt_PT">', ' <ExportDate value="2024-03-02 10:00:00 +0000"/>']
+    for r in records:
+        attrs = " ".join(f"{k[1:]}={quoteattr(v)}" for k, v in r.items() if k.startswith("@") and v is not None)
+        lines.append(f" <Record {attrs}/>")
+    lines += [extra, "</HealthData>"]
+    Path(path).write_text("\n".join(lines), encoding="utf-8")
+    return path
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from src import tools
+from src.health import analytics
+
+
+def _call(tool, path, **kwargs):
+    return tool.invoke({"path": path, "start_date": "2024-01-01", "end_date": "2024-04-01", **kwargs})
+
+
+def test_streak_tool(health_path):
+    """Testa a maior sequência de dias com pelo menos N passos (um dia sem dados quebra a sequência)."""
+    out = _call(tools.metric_streak, health_path, metric="steps", threshold=3000)
+    assert out == {
+        "metric": "steps", "threshold": 3000, "days_meeting": 4, "days": 5,
+        "longest": {"days": 3, "start": "2024-01-10", "end": "2024-01-12"},
+        "current": {"days": 0, "start": None, "end": None},
+    }
+    below = _call(tools.metric_streak, health_path, metric="steps", threshold=3000, below=True)
+    assert below["longest"] == {"days": 1, "start": "2024-01-12", "end": "2024-01-12"}
+    assert below["current"] == {"days": 1, "start": "2024-03-01", "end": "2024-03-01"}
+
+
+def test_distribution_and_trend_tools(health_path):
+    """Testa percentis e tendência linear dos passos diários."""
+    dist = _call(tools.metric_distribution, health_path, metric="steps", percentiles=[0, 50, 100])
+    assert dist == {"metric": "steps", "unit": None, "days": 5, "mean": 6200.0, "std": pytest.approx(3969.89, abs=0.01),
+                    "percentiles": {"p0": 1000.0, "p50": 6000.0, "p100": 12000.0}}
+    assert dist["mean"] == tools.average_steps_per_day.invoke({"path": health_path, "start_date": "2024-01-01", "end_date": "2024-04-01"})
+
+    trend = _call(tools.metric_trend, health_path, metric="distance")
+    assert (trend["days"], trend["direction"], trend["unit"]) == (3, "up", "km")
+    assert trend["slope_per_week"] == pytest.approx(7 * np.polyfit([0, 1, 23], [5.5, 7.0, 10.0], 1)[0], abs=0.01)
+
+
+def test_rolling_average_tool(health_path):
+    """Testa as médias móveis de 2 dias (janelas com menos de metade dos dias são ignoradas)."""
+    out = _call(tools.metric_rolling_average, health_path, metric="steps", window_days=2)
+    assert out["best"] == {"start": "2024-02-02", "end": "2024-02-03", "avg": 12000.0, "days": 1}
+    assert out["worst"] == {"start": "2024-02-29", "end": "2024-03-01", "avg": 1000.0, "days": 1}
+    assert out["latest"] == out["worst"]
+    with pytest.raises(Exception):
+        _call(tools.metric_rolling_average, health_path, metric="steps", window_days=0)
+
+
+def test_empty_range_and_unknown_metric(health_path):
+    """Testa períodos sem dados e métricas desconhecidas."""
+    out = tools.metric_trend.invoke({"path": health_path, "metric": "steps", "start_date": "2020-01-01", "end_date": "2020-02-01"})
+    assert (out["days"], out["direction"]) == (0, None)
+    assert tools.metric_streak.invoke({
+        "path": health_path, "metric": "heart_rate", "threshold": 60, "start_date": "2024-01-01", "end_date": "2024-04-01",
+    })["longest"]["days"] == 0
+    with pytest.raises(Exception):
+        _call(tools.metric_trend, health_path, metric="nope")
+
+
+def test_vectorized_matches_loops():
+    """Testa as versões vetorizadas contra ciclos simples em séries aleatórias com falhas."""
+    rng = np.random.default_rng(7)
+    days = np.sort(rng.choice(400, size=250, replace=False)).astype(np.int64)
+    values = rng.integers(0, 20, size=len(days)).astype(np.float64)
+
+    best, run, prev = 0, 0, None
+    for d, v in zip(days, values):
+        run = run + 1 if v >= 10 and prev is not None and d == prev + 1 and run else (1 if v >= 10 else 0)
+        best, prev = max(best, run), d
+    assert analytics.longest_streak(days, values, 10)["longest"]["days"] == best
+
+    by_day = dict(zip(days.tolist(), values.tolist()))
+    means = []
+    for last in range(days[0] + 6, days[-1] + 1):
+        vals = [by_day[d] for d in range(last - 6, last + 1) if d in by_day]
+        if len(vals) >= 3.5:
+            means.append(sum(vals) / len(vals))
+    out = analytics.rolling_means(days, values, 7)
+    assert out["windows"] == len(means)
+    assert out["best"]["avg"] == pytest.approx(round(max(means), 2))
+    assert out["worst"]["avg"] == pytest.approx(round(min(means), 2))
+
+
+def test_rolling_window_shorter_span_starts_at_first_day():
+    """Testa que, com menos dias do que a janela, a janela reportada começa no primeiro dia com dados."""
+    days = np.array([19723, 19724, 19725, 19726], dtype=np.int64)  # 2024-01-01 .. 2024-01-04
+    out = analytics.rolling_means(days, np.array([1.0, 2.0, 3.0, 4.0]), 7)
+    assert out["windows"] == 1
+    assert out["latest"] == {"start": "2024-01-01", "end": "2024-01-04", "avg": 2.5, "days": 4}
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services.health_service import HealthService
+from src import tools
+from src.health import cache as health_cache
+from src.health import engine as health_engine
+from src.utils.lru_cache import MISSING, LRUCache
+from .factories import STEPS, make_record, write_health_dataset
+
+
+def _call(tool, path, start, end):
+    return tool.invoke({"path": path, "start_date": start, "end_date": end})
+
+
+def test_lru_evicts_least_recently_used():
+    """Testa a política LRU e os contadores."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 3, 1, 0.75)
+
+
+def test_lru_disk_persistence(tmp_path):
+    """Testa que a cache em disco sobrevive a um novo processo."""
+    first = LRUCache(maxsize=1, path=tmp_path / "cache.sqlite")
+    first.put("a", {"day": datetime(2024, 1, 10), "steps": 6000})
+    first.put("b", 2)
+    first.close()
+
+    second = LRUCache(maxsize=1, path=tmp_path / "cache.sqlite")
+    assert second.get("a") == {"day": datetime(2024, 1, 10), "steps": 6000}
+    assert second.stats()["disk_hits"] == 1
+
+
+def test_repeat_questions_hit_the_cache(health_path, monkeypatch):
+    """Testa que a mesma pergunta (com datas em formatos diferentes) não volta a consultar o DuckDB."""
+    first = _call(tools.max_steps_day, health_path, "2024-01-01", "2024-02-01")
+    monkeypatch.setattr(health_engine.HealthEngine, "cursor", lambda self: pytest.fail("query ran again"))
+
+    assert _call(tools.max_steps_day, health_path, "2024-01-01T00:00:00", datetime(2024, 2, 1)) == first
+    first["steps"] = -1
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2024-02-01")["steps"] == 9000
+    stats = health_cache.cache_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_reingestion_invalidates_cached_results(health_path, tmp_path, monkeypatch):
+    """Testa que ficheiros novos no dataset mudam a chave (nunca há respostas obsoletas)."""
+    monkeypatch.setattr(health_engine, "CHECK_INTERVAL_S", 0.0)
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 12000
+
+    write_health_dataset(tmp_path / "health_parquet", [make_record(STEPS, "2024-06-01 10:00:00 +0000", 20000, "count")])
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 20000
+
+
+def test_writes_are_seen_within_the_engine_check_interval(health_path, tmp_path, monkeypatch):
+    """Testa que a chave vê ficheiros novos mesmo dentro do intervalo de verificação do motor."""
+    monkeypatch.setattr(health_engine, "CHECK_INTERVAL_S", 3600.0)
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 12000
+
+    write_health_dataset(tmp_path / "health_parquet", [make_record(STEPS, "2024-06-01 10:00:00 +0000", 20000, "count")])
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 20000
+    assert health_cache.cache_stats()["hits"] == 0
+
+
+def test_cache_can_be_disabled(health_path, monkeypatch):
+    """Testa HEALTH_CACHE_SIZE=0."""
+    monkeypatch.setattr(health_cache, "CACHE_SIZE", 0)
+    assert health_cache.health_cache() is None
+    assert _call(tools.average_steps_per_day, health_path, "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+
+
+def test_compare_periods_keeps_labels_as_spelled(health_path):
+    """Testa que rótulos (dados ou por omissão) escritos de formas diferentes não partilham a entrada da cache."""
+    def compare(periods):
+        return list(tools.compare_periods.invoke({"path": health_path, "periods": periods}))
+
+    period = {"start_date": "2024-01-01", "end_date": "2024-02-01"}
+    assert compare([{**period, "label": "2024-01-01"}]) == ["2024-01-01"]
+    assert compare([{**period, "label": "2024-01-01T00:00"}]) == ["2024-01-01T00:00"]
+    assert compare([period]) == ["2024-01-01/2024-02-01"]
+    assert compare([{"start_date": "2024-01-01T00:00:00", "end_date": "2024-02-01"}]) == ["2024-01-01T00:00:00/2024-02-01"]
+    stats = health_cache.cache_stats()
+    assert (stats["hits"], stats["misses"]) == (0, 4)
+
+
+def test_omitted_defaults_share_the_entry(health_path):
+    """Testa que omitir um argumento com valor por omissão ou passá-lo explicitamente dá a mesma entrada."""
+    args = {"path": health_path, "metric": "steps", "threshold": 3000, "start_date": "2024-01-01", "end_date": "2024-04-01"}
+    first = tools.metric_streak.invoke(args)
+    assert tools.metric_streak.invoke({**args, "below": False}) == first
+    stats = health_cache.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_series_dates_spelled_differently_share_the_entry(health_path):
+    """Testa que a série do gráfico com as mesmas datas em fusos/formatos diferentes usa a mesma entrada."""
+    first = HealthService.series(health_path, "steps", datetime(2024, 1, 1), datetime(2024, 4, 1), 50, "lttb")
+    plus_one = timezone(timedelta(hours=1))
+    again = HealthService.series(
+        health_path, "steps", datetime(2024, 1, 1, 1, tzinfo=plus_one), datetime(2024, 4, 1, tzinfo=timezone.utc), 50, "lttb"
+    )
+    assert again == first
+    stats = health_cache.cache_stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
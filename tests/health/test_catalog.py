@@ -0,0 +1,76 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from src import tools
+from src.health import engine as health_engine
+from src.health.catalog import CATALOG, Catalog, read_catalog, refresh_catalog
+from .factories import ACTIVE, DISTANCE, STEPS, make_health_records, make_record, write_health_csv, write_health_dataset
+
+
+def _call(tool, path, start, end):
+    return tool.invoke({"path": path, "start_date": start, "end_date": end})
+
+
+def test_catalog_describes_the_dataset(health_path):
+    """Testa cobertura, tipos, unidades e partições do catálogo."""
+    catalog = refresh_catalog(health_path)
+    assert (catalog.start, catalog.end, catalog.rows) == ("2024-01-10", "2024-03-01", len(make_health_records()))
+    assert catalog.types[DISTANCE] == {"units": ["km"], "rows": 3, "start": "2024-01-11", "end": "2024-02-03"}
+    assert list(catalog.partitions) == ["year=2024/month=1", "year=2024/month=2", "year=2024/month=3"]
+    assert catalog.partitions["year=2024/month=3"] == {"rows": 1, "start": "2024-03-01", "end": "2024-03-01", "types": [STEPS]}
+    assert read_catalog(health_path) == catalog
+
+
+def test_catalog_clamps_ranges():
+    """Testa o ajuste dos intervalos aos dias com dados (sem mudar a resposta)."""
+    catalog = Catalog(
+        fingerprint="x", rows=2, start="2024-01-10", end="2024-03-01",
+        partitions={"year=2024/month=1": {"rows": 1, "start": "2024-01-10", "end": "2024-01-12", "types": []},
+                    "year=2024/month=3": {"rows": 1, "start": "2024-03-01", "end": "2024-03-01", "types": []}},
+    )
+    assert catalog.clamp(datetime(2000, 1, 1), datetime(2100, 1, 1)) == (datetime(2024, 1, 10), datetime(2024, 3, 2))
+    aware = catalog.clamp(datetime(2024, 1, 11, 13, tzinfo=timezone.utc), datetime(2030, 1, 1, tzinfo=timezone.utc))
+    assert aware == (datetime(2024, 1, 11, 13, tzinfo=timezone.utc), datetime(2024, 3, 2, tzinfo=timezone.utc))
+    assert catalog.clamp(datetime(2023, 1, 1), datetime(2024, 1, 10)) is None
+    assert catalog.clamp(datetime(2024, 2, 1), datetime(2024, 3, 1)) is None  # gap between partitions
+
+
+def test_out_of_range_questions_skip_duckdb(health_path, monkeypatch):
+    """Testa que períodos sem dados e métricas ausentes respondem sem consultar o DuckDB."""
+    health_engine.get_engine(health_path).refresh()
+    monkeypatch.setattr(health_engine.HealthEngine, "cursor", lambda self: pytest.fail("query ran"))
+
+    assert _call(tools.max_steps_day, health_path, "2023-01-01", "2024-01-01") == {"day": None, "steps": 0}
+    assert _call(tools.health_summary, health_path, "2024-02-10", "2024-02-20")["days_with_data"] == 0
+    heart = next(t for t in tools.METRIC_TOOLS if t.name == "heart_rate_stats")
+    assert _call(heart, health_path, "2024-01-01", "2025-01-01")["days"] == 0
+
+
+def test_catalog_is_rebuilt_when_the_dataset_changes(health_path, tmp_path, monkeypatch):
+    """Testa que um catálogo desatualizado (outro fingerprint) é refeito."""
+    monkeypatch.setattr(health_engine, "CHECK_INTERVAL_S", 0.0)
+    assert _call(tools.max_steps_day, health_path, "2024-06-01", "2024-07-01")["steps"] == 0
+
+    write_health_dataset(tmp_path / "health_parquet", [make_record(STEPS, "2024-06-01 10:00:00 +0000", 20000, "count")])
+    assert _call(tools.max_steps_day, health_path, "2024-06-01", "2024-07-01")["steps"] == 20000
+    assert read_catalog(health_path).end == "2024-06-01"
+
+
+def test_ingestion_writes_the_catalog(tmp_path):
+    """Testa que a ingestão deixa o catálogo pronto junto ao Parquet."""
+    from data.partion_data import main as partition_main
+
+    csv_path = write_health_csv(tmp_path / "export.csv", make_health_records())
+    partition_main(["--csv", str(csv_path), "--out", str(tmp_path / "out"), "--quiet"])
+    assert (tmp_path / "out" / CATALOG).exists()
+    assert read_catalog(tmp_path / "out").types[ACTIVE]["rows"] == 3
+
+
+def test_available_health_metrics(health_path):
+    """Testa a tool que diz ao agente que métricas existem."""
+    out = tools.available_health_metrics.invoke({"path": health_path})
+    assert (out["start"], out["end"], out["records"]) == ("2024-01-10", "2024-03-01", len(make_health_records()))
+    by_metric = {m["metric"]: m for m in out["metrics"]}
+    assert set(by_metric) == {"calories", "active_calories", "basal_calories", "steps", "distance"}
+    assert by_metric["steps"] == {"metric": "steps", "unit": "count", "rows": 6, "start": "2024-01-10", "end": "2024-03-01"}
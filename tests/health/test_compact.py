@@ -0,0 +1,190 @@
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pytest
+
+from data.compact_data import main as compact_main
+from src import tools
+from src.health import engine as health_engine
+from src.health.cache import reset_cache
+from src.health import compact
+from src.health.compact import compact_dataset, recover_compactions
+from src.health.dataset import parquet_list, scan_files
+from src.health.ingest import ingest_batches
+from src.health.layout import DATE_FORMAT, TYPED
+from .factories import make_health_records, write_health_dataset
+
+
+def _answers(path):
+    args = {"path": path, "start_date": "2024-01-01", "end_date": "2024-04-01"}
+    return [tools.health_summary.invoke(args), tools.metric_streak.invoke({**args, "metric": "steps", "threshold": 3000})]
+
+
+def _rows(path):
+    con = duckdb.connect()
+    try:
+        files = parquet_list(Path(path) / rel for rel in scan_files(path))
+        return sorted(con.execute(f'SELECT "@type", "@startDate", "@value" FROM read_parquet({files})').fetchall(), key=str)
+    finally:
+        con.close()
+
+
+@pytest.fixture()
+def fragmented_path(tmp_path):
+    """Dataset escrito em várias passagens do pandas: vários ficheiros pequenos por mês."""
+    health_engine.reset_engines()
+    reset_cache()
+    root = tmp_path / "fragmented"
+    records = make_health_records()
+    for i in range(0, len(records), 3):
+        write_health_dataset(root, records[i:i + 3])
+    yield str(root)
+    health_engine.reset_engines()
+    reset_cache()
+
+
+def test_compaction_keeps_records_and_answers(fragmented_path):
+    """Testa que a compactação reduz os ficheiros sem mudar registos nem respostas."""
+    before, rows = _answers(fragmented_path), _rows(fragmented_path)
+    fp = health_engine.get_engine(fragmented_path).fingerprint
+    files = scan_files(fragmented_path)
+
+    stats = compact_dataset(fragmented_path)
+    assert (stats.partitions, stats.files_before, stats.files_after) == (3, len(files), 3)
+    assert len(scan_files(fragmented_path)) == 3 < len(files)
+    # março só tinha um ficheiro (1 registo) e fica como estava
+    assert (stats.partitions_compacted, stats.rows) == (2, len(rows) - 1)
+    assert _rows(fragmented_path) == rows
+
+    reset_cache()
+    engine = health_engine.get_engine(fragmented_path)
+    engine.refresh(force=True)
+    assert engine.fingerprint != fp
+    assert _answers(fragmented_path) == before
+
+    again = compact_dataset(fragmented_path)
+    assert (again.partitions_compacted, again.files_after) == (0, 3)
+
+
+def test_compacted_files_are_sorted_and_sized(fragmented_path):
+    """Testa a ordenação por (@type, @startDate) e o limite de linhas por ficheiro."""
+    compact_dataset(fragmented_path, target_rows=4, force=True)
+    files = sorted(scan_files(fragmented_path))
+    january = [f for f in files if "month=1" in f]
+    assert len(january) == 3  # 10 registos em janeiro, 4 por ficheiro
+    for rel in files:
+        table = pq.read_table(f"{fragmented_path}/{rel}")
+        assert table.num_rows <= 4
+        keys = list(zip(table.column("@type").to_pylist(), table.column("@startDate").to_pylist()))
+        assert keys == sorted(keys)
+        assert pq.ParquetFile(f"{fragmented_path}/{rel}").metadata.row_group(0).column(0).statistics is not None
+
+
+def test_typed_dataset_compaction(tmp_path):
+    """Testa que um dataset typed com várias ingestões fica num ficheiro por mês, com as mesmas respostas."""
+    health_engine.reset_engines()
+    reset_cache()
+    root = tmp_path / "typed"
+    records = make_health_records()
+    for i in range(0, len(records), 5):
+        ingest_batches([pa.Table.from_pylist(records[i:i + 5])], root, layout=TYPED)
+    before = _answers(str(root))
+    assert len(scan_files(root)) > 3
+
+    compact_dataset(root)
+    reset_cache()
+    assert len(scan_files(root)) == 3
+    table = pq.read_table(root / sorted(scan_files(root))[0])
+    assert pa.types.is_dictionary(table.schema.field("@type").type)
+    assert pa.types.is_float64(table.schema.field("@value").type)
+    assert _answers(str(root)) == before
+    health_engine.reset_engines()
+
+
+def test_compact_command_reports_files_and_latency(fragmented_path, capsys):
+    """Testa o comando de manutenção: contagem de ficheiros e latência antes/depois."""
+    stats = compact_main(["--path", fragmented_path, "--runs", "1"])
+    out = capsys.readouterr().out
+    assert stats.files_after == 3
+    assert "files" in out and "all step records (ms)" in out and "newest month (raw) (ms)" in out
+
+
+def _crash_on(monkeypatch, suffix):
+    """Simula um crash no primeiro os.replace de um ficheiro terminado em ``suffix``."""
+    replace = compact.os.replace
+
+    def crashing(src, dst):
+        if str(src).endswith(suffix):
+            raise KeyboardInterrupt("crash")
+        replace(src, dst)
+
+    monkeypatch.setattr(compact.os, "replace", crashing)
+
+
+def test_crash_mid_swap_never_double_counts_and_is_finished(fragmented_path, monkeypatch):
+    """Testa que um crash entre retirar os ficheiros antigos e publicar os novos não duplica registos e é concluído depois."""
+    rows = _rows(fragmented_path)
+    _crash_on(monkeypatch, ".parquet.tmp")
+    with pytest.raises(KeyboardInterrupt):
+        compact_dataset(fragmented_path)
+    monkeypatch.undo()
+
+    interrupted = _rows(fragmented_path)
+    assert len(interrupted) < len(rows) and len(set(interrupted)) == len(interrupted)
+    assert recover_compactions(fragmented_path) == 1
+    assert _rows(fragmented_path) == rows
+    assert not any((Path(fragmented_path) / "_compact").iterdir())
+    assert compact_dataset(fragmented_path).files_after == 3
+    assert _rows(fragmented_path) == rows
+
+
+def test_crash_before_the_journal_keeps_the_old_files(fragmented_path, monkeypatch):
+    """Testa que um crash antes do diário deixa os ficheiros antigos e os .tmp são apagados na recuperação."""
+    rows, files = _rows(fragmented_path), scan_files(fragmented_path)
+    _crash_on(monkeypatch, ".json.tmp")
+    with pytest.raises(KeyboardInterrupt):
+        compact_dataset(fragmented_path)
+    monkeypatch.undo()
+
+    assert scan_files(fragmented_path).keys() == files.keys()
+    assert list(Path(fragmented_path).glob("year=*/month=*/*.tmp"))
+    assert recover_compactions(fragmented_path) == 0
+    assert not list(Path(fragmented_path).glob("year=*/month=*/*.tmp"))
+    assert _rows(fragmented_path) == rows
+
+
+def test_swap_without_its_new_files_is_rolled_back(fragmented_path, monkeypatch):
+    """Testa que um diário cujos ficheiros novos desapareceram repõe os ficheiros antigos."""
+    files = scan_files(fragmented_path)
+    _crash_on(monkeypatch, ".parquet.tmp")
+    with pytest.raises(KeyboardInterrupt):
+        compact_dataset(fragmented_path)
+    monkeypatch.undo()
+    for tmp in Path(fragmented_path).glob("year=*/month=*/*.tmp"):
+        tmp.unlink()
+
+    assert recover_compactions(fragmented_path) == 1
+    assert scan_files(fragmented_path).keys() == files.keys()
+
+
+def test_partition_with_mixed_date_types(tmp_path):
+    """Testa a compactação de um mês com datas timestamp[ns] sem fuso (pandas) e timestamp[us, UTC] (ingestão)."""
+    root = tmp_path / "mixed"
+    records = make_health_records()
+    january = [r for r in records if r["@startDate"].startswith("2024-01")]
+    ingest_batches([pa.Table.from_pylist(january[:3])], root)
+    legacy = pa.Table.from_pylist(january[3:])
+    for name in ("@startDate", "@endDate"):
+        naive = pc.cast(pc.strptime(legacy.column(name), format=DATE_FORMAT, unit="ns"), pa.timestamp("ns"))
+        legacy = legacy.set_column(legacy.column_names.index(name), name, naive)
+    pq.write_table(legacy, root / "year=2024" / "month=1" / "part-legacy.parquet")
+
+    stats = compact_dataset(root, refresh=False)
+    assert (stats.partitions_compacted, stats.rows) == (1, len(january))
+    (rel,) = [f for f in scan_files(root) if "month=1" in f]
+    table = pq.read_table(root / rel)
+    assert table.schema.field("@startDate").type == pa.timestamp("us", tz="UTC")
+    assert sorted(table.column("@endDate").to_pylist()) == sorted(r["@endDate"] for r in january)
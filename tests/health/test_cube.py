@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src import tools
+from src.health import cache as health_cache
+from src.health import engine as health_engine
+from src.health.cube import refresh_cube, registry_signature
+from src.health.query import plan_range
+from src.health.rollup import rollup_files
+from .factories import ACTIVE, BASAL, DISTANCE, STEPS, make_record, write_health_dataset
+
+TOOLS = [tools.calories_burned, tools.max_daily_calories, tools.longest_run, tools.max_steps_day, tools.health_summary]
+
+
+def _records():
+    """Dois anos com um registo por tipo a cada 3 dias (às 6h e às 18h)."""
+    records, day = [], datetime(2023, 1, 1, tzinfo=timezone.utc)
+    for i in range(240):
+        for hour in (6, 18):
+            ts = (day + timedelta(days=3 * i, hours=hour)).strftime("%Y-%m-%d %H:%M:%S +0000")
+            records += [
+                make_record(STEPS, ts, 1000 + (i * 37) % 900, "count"),
+                make_record(ACTIVE, ts, 200 + (i * 13) % 150, "kcal"),
+                make_record(DISTANCE, ts, 1500 + (i * 29) % 4000, "m"),
+            ]
+        if i % 2:
+            records.append(make_record(BASAL, ts, 1500, "kcal"))
+    return records
+
+
+@pytest.fixture()
+def long_path(tmp_path, monkeypatch):
+    """Dataset de dois anos, sem cache de resultados (cada chamada consulta o DuckDB)."""
+    monkeypatch.setattr(health_cache, "CACHE_SIZE", 0)
+    health_engine.reset_engines()
+    root = tmp_path / "long"
+    write_health_dataset(root, _records())
+    yield str(root)
+    health_engine.reset_engines()
+
+
+def _rounded(x):
+    if isinstance(x, dict):
+        return {k: _rounded(v) for k, v in x.items()}
+    return round(x, 6) if isinstance(x, float) else x
+
+
+def _answers(path, start, end):
+    return [_rounded(t.invoke({"path": path, "start_date": start, "end_date": end})) for t in TOOLS]
+
+
+def test_plan_picks_coarsest_grain():
+    """Testa que o planeador usa meses, depois semanas ISO e só os dias das pontas."""
+    plan = plan_range(datetime(2023, 3, 15), datetime(2024, 7, 9))
+    assert plan.cube == [
+        ("month", datetime(2023, 4, 1), datetime(2024, 7, 1)),
+        ("week", datetime(2023, 3, 20), datetime(2023, 3, 27)),
+        ("week", datetime(2024, 7, 1), datetime(2024, 7, 8)),
+    ]
+    assert plan.days == [
+        (datetime(2023, 3, 15), datetime(2023, 3, 20)),
+        (datetime(2023, 3, 27), datetime(2023, 4, 1)),
+        (datetime(2024, 7, 8), datetime(2024, 7, 9)),
+    ]
+    assert plan_range(datetime(2024, 1, 1, 6), datetime(2024, 3, 1)).days == [(datetime(2024, 1, 1, 6), datetime(2024, 3, 1))]
+    assert plan_range(datetime(2024, 2, 7), datetime(2024, 2, 10)).cube == []
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2023-01-01", "2025-01-01"),
+    ("2023-03-15", "2024-07-09"),
+    ("2023-02-06", "2023-02-27"),
+    ("2023-05-10T06:00:00", "2023-06-02T18:00:00"),
+    ("2023-05-10T06:30:00", "2023-06-02T18:00:00"),
+])
+def test_cube_and_hourly_match_daily_rows(long_path, monkeypatch, start, end):
+    """Testa que o cubo (semana/mês) e o rollup horário dão as mesmas respostas que os dias/registos."""
+    planned = _answers(long_path, start, end)
+    engine = health_engine.get_engine(long_path)
+    assert engine.cube_metrics is not None and engine.has_hourly
+
+    monkeypatch.setattr(engine, "cube_metrics", None)
+    monkeypatch.setattr(engine, "has_hourly", False)
+    assert _answers(long_path, start, end) == planned
+
+
+def test_cube_reads_few_rows(long_path):
+    """Testa que um intervalo de dois anos lê dezenas de linhas do cubo e poucos dias."""
+    plan = plan_range(datetime(2023, 1, 3), datetime(2024, 12, 30))
+    assert [g for g, _, _ in plan.cube] == ["month", "week", "week"]
+    assert sum((b - a).days for a, b in plan.days) < 14
+
+    engine = health_engine.get_engine(long_path)
+    engine.refresh()
+    assert len(rollup_files(long_path, "hourly")) == len(rollup_files(long_path)) > 0
+    con = engine.cursor()
+    try:
+        rows = con.execute("SELECT COUNT(*) FROM health_cube WHERE grain = 'month' AND metric = 'steps'").fetchone()[0]
+    finally:
+        con.close()
+    assert rows == 24
+
+
+def test_stale_cube_is_ignored_and_rebuilt(long_path, monkeypatch):
+    """Testa que mudar o registo de métricas invalida o cubo (e as respostas continuam certas)."""
+    from src.health import metrics as health_metrics
+
+    before = _answers(long_path, "2023-01-01", "2024-01-01")
+    assert not refresh_cube(long_path)
+    monkeypatch.setitem(health_metrics.METRICS, "basal_only", health_metrics.Metric("basal_only", "basal", (BASAL,)))
+    assert health_engine.get_engine(long_path).cube_metrics != registry_signature()
+    assert _answers(long_path, "2023-01-01", "2024-01-01") == before
+
+    assert refresh_cube(long_path)
+    health_engine.get_engine(long_path).refresh(force=True)
+    assert health_engine.get_engine(long_path).cube_metrics == registry_signature()
+    assert _answers(long_path, "2023-01-01", "2024-01-01") == before
@@ -0,0 +1,75 @@
+import duckdb
+import pytest
+
+from src import tools
+from src.health import database
+from src.health import engine as health_engine
+from src.health.cache import reset_cache
+from .factories import STEPS, make_record, write_health_dataset
+
+
+def _call(tool, path, start, end):
+    return tool.invoke({"path": path, "start_date": start, "end_date": end})
+
+
+@pytest.fixture()
+def persistent(monkeypatch):
+    monkeypatch.setattr(health_engine, "MODE", health_engine.PERSISTENT)
+    monkeypatch.setattr(health_engine, "CHECK_INTERVAL_S", 0.0)
+
+
+QUESTIONS = [
+    (tools.calories_burned, "2024-01-01", "2024-02-01"),
+    (tools.average_steps_per_day, "2024-01-01", "2024-02-01"),
+    (tools.max_daily_calories, "2024-01-01", "2024-03-01"),
+    (tools.longest_run, "2024-01-11T06:00:00", "2024-02-01"),
+    (tools.health_summary, "2024-01-10T12:00:00", "2024-03-01"),
+]
+
+
+def test_persistent_mode_gives_same_answers(health_path, monkeypatch):
+    """Testa que o ficheiro .duckdb persistente responde como as views em memória."""
+    expected = [_call(tool, health_path, s, e) for tool, s, e in QUESTIONS]
+    health_engine.reset_engines()
+    reset_cache()
+    monkeypatch.setattr(health_engine, "MODE", health_engine.PERSISTENT)
+
+    assert [_call(tool, health_path, s, e) for tool, s, e in QUESTIONS] == expected
+    engine = health_engine.get_engine(health_path)
+    assert engine.database is not None and engine.database.exists()
+
+
+def test_database_is_read_only_and_reused_across_restarts(health_path, persistent, monkeypatch):
+    """Testa que o ficheiro é aberto só para leitura e reaproveitado após reiniciar."""
+    engine = health_engine.get_engine(health_path)
+    con = engine.cursor()
+    with pytest.raises(duckdb.Error):
+        con.execute("CREATE TABLE x (i INTEGER)")
+    con.close()
+    db = engine.database
+
+    health_engine.reset_engines()
+    monkeypatch.setattr(database, "build_database", lambda *a, **k: pytest.fail("rebuilt a fresh database"))
+    assert health_engine.get_engine(health_path).cursor() is not None
+    assert health_engine.get_engine(health_path).database == db
+
+
+def test_database_follows_dataset_changes(health_path, persistent, tmp_path):
+    """Testa que ficheiros novos geram uma nova base e apagam a antiga."""
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 12000
+    old = health_engine.get_engine(health_path).database
+
+    write_health_dataset(tmp_path / "health_parquet", [make_record(STEPS, "2024-06-01 10:00:00 +0000", 20000, "count")])
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")["steps"] == 20000
+    new = health_engine.get_engine(health_path).database
+    assert new != old and new.exists() and not old.exists()
+
+
+def test_falls_back_to_memory_when_database_cannot_be_built(health_path, persistent, monkeypatch):
+    """Testa o recurso às views em memória quando não se consegue escrever a base."""
+    def fail(*args, **kwargs):
+        raise OSError("read-only file system")
+
+    monkeypatch.setattr(database, "build_database", fail)
+    assert _call(tools.average_steps_per_day, health_path, "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert health_engine.get_engine(health_path).database is None
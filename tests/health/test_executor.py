@@ -0,0 +1,129 @@
+import asyncio
+import threading
+import time
+
+import duckdb
+import pytest
+
+from src import tools
+from src.health import executor
+from src.health.engine import get_engine
+
+SLOW_SQL = "SELECT SUM(a.range * b.range) FROM range(200000) a, range(200000) b"
+
+
+def test_async_tools_match_sync(health_path):
+    """Testa que a variante assíncrona dá o mesmo resultado que a síncrona."""
+    args = {"path": health_path, "start_date": "2024-01-01", "end_date": "2024-02-01"}
+
+    async def run():
+        return await asyncio.gather(tools.max_steps_day.ainvoke(args), tools.health_summary.ainvoke(args))
+
+    steps, summary = asyncio.run(run())
+    assert steps == tools.max_steps_day.invoke(args)
+    assert summary == tools.health_summary.invoke(args)
+
+
+def test_timeout_interrupts_running_query(health_path):
+    """Testa que o timeout interrompe a consulta DuckDB em curso (con.interrupt)."""
+    outcome, done = [], threading.Event()
+
+    def slow():
+        con = get_engine(health_path).cursor()
+        try:
+            con.execute(SLOW_SQL).fetchall()
+            outcome.append("finished")
+        except duckdb.InterruptException:
+            outcome.append("interrupted")
+        finally:
+            con.close()
+            done.set()
+
+    started = time.monotonic()
+    with pytest.raises(executor.HealthQueryTimeout):
+        asyncio.run(executor.run_async(slow, timeout=0.3))
+    assert done.wait(10)
+    assert outcome == ["interrupted"]
+    assert time.monotonic() - started < 10
+
+
+def test_cancelled_scope_refuses_new_cursors(health_path):
+    """Testa que uma chamada cancelada não abre novas consultas."""
+    scope = executor.QueryScope()
+    scope.cancel()
+    with pytest.raises(executor.HealthQueryTimeout):
+        scope.track(duckdb.connect())
+
+
+def test_tool_deadline_returns_timeout_result(health_path, monkeypatch):
+    """Testa que uma ferramenta que excede o seu prazo devolve um resultado estruturado (e não fica em cache)."""
+    args = {"path": health_path, "start_date": "2024-01-01", "end_date": "2025-01-01"}
+    expected = tools.longest_run.invoke(args)
+    interrupted = threading.Event()
+
+    def slow_stats(path, metrics, ranges):
+        con = get_engine(path).cursor()
+        try:
+            con.execute(SLOW_SQL).fetchall()
+        except duckdb.InterruptException:
+            interrupted.set()
+            raise
+        finally:
+            con.close()
+
+    monkeypatch.setattr(tools, "period_stats", slow_stats)
+    monkeypatch.setenv("HEALTH_TOOL_TIMEOUT_LONGEST_RUN", "0.3")
+    args["end_date"] = "2025-06-01"
+    out = tools.longest_run.invoke(args)
+    assert (out["error"], out["tool"], out["timeout_s"]) == ("timeout", "longest_run", 0.3)
+    assert "narrower" in out["message"]
+    assert interrupted.wait(10)
+
+    monkeypatch.undo()
+    assert tools.longest_run.invoke(args) == expected
+
+
+def test_engine_threads_and_memory_limit(health_path, monkeypatch):
+    """Testa que HEALTH_DUCKDB_THREADS e HEALTH_DUCKDB_MEMORY_LIMIT limitam o engine."""
+    from src.health import engine as health_engine
+
+    monkeypatch.setattr(health_engine, "THREADS", 2)
+    monkeypatch.setattr(health_engine, "MEMORY_LIMIT", "256MB")
+    con = health_engine.HealthEngine(health_path).cursor()
+    try:
+        threads, memory = con.execute("SELECT current_setting('threads'), current_setting('memory_limit')").fetchone()
+    finally:
+        con.close()
+    assert threads == 2
+    assert memory.replace(" ", "") in ("256.0MiB", "244.1MiB", "256MB")
+
+
+@pytest.fixture()
+def slow_build(monkeypatch):
+    """Construção das vistas/rollups lenta (como a primeira num dataset grande)."""
+    from src.health import engine as health_engine
+
+    build = health_engine.HealthEngine._build_views
+
+    def slow(self, stats):
+        time.sleep(0.6)
+        return build(self, stats)
+
+    monkeypatch.setattr(health_engine.HealthEngine, "_build_views", slow)
+    monkeypatch.setenv("HEALTH_TOOL_TIMEOUT_MAX_STEPS_DAY", "0.3")
+
+
+def test_cold_build_is_outside_the_deadline(health_path, slow_build):
+    """Testa que a construção inicial do dataset não conta para o prazo da ferramenta."""
+    args = {"path": health_path, "start_date": "2024-01-01", "end_date": "2024-02-01"}
+    out = tools.max_steps_day.invoke(args)
+    assert "error" not in out and out["steps"] == 9000
+    assert "error" not in asyncio.run(tools.max_steps_day.ainvoke({**args, "end_date": "2024-03-01"}))
+
+
+def test_build_inside_the_deadline_reports_warming_up(health_path, slow_build, monkeypatch):
+    """Testa que uma construção que apanha o prazo devolve 'warming_up' e não o conselho de reduzir o intervalo."""
+    monkeypatch.setattr(tools, "_warm", lambda path: None)
+    out = tools.max_steps_day.invoke({"path": health_path, "start_date": "2024-01-01", "end_date": "2024-02-01"})
+    assert (out["error"], out["tool"]) == ("warming_up", "max_steps_day")
+    assert "narrower" not in out["message"]
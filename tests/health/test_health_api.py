@@ -0,0 +1,94 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from app.services.persona_service import PersonaService
+from src.health.arrow import fetch_table, numpy_column
+from src.health.engine import get_engine
+from src.health.metrics import get_metric
+from src.health.series import lttb, metric_series, minmax, series_ipc
+from tests.personas.factories import make_persona_create
+
+
+@pytest.fixture()
+def persona_with_data(db_session, health_path):
+    return PersonaService.create_persona(db_session, make_persona_create(data_path=health_path), creator_id=1)
+
+
+def _series(client, persona_id, **params):
+    return client.get(f"/health/{persona_id}/series", params={"start": "2024-01-01", "end": "2024-04-01", **params})
+
+
+def test_series_json(authenticated_client, persona_with_data):
+    """Testa a série diária de passos em JSON colunar."""
+    r = _series(authenticated_client, persona_with_data.id, metric="steps")
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert (body["metric"], body["grain"], body["method"], body["source_points"]) == ("steps", "day", "lttb", 5)
+    days = [datetime.fromtimestamp(t / 1000, timezone.utc).date().isoformat() for t in body["t"]]
+    assert days == ["2024-01-10", "2024-01-11", "2024-01-12", "2024-02-03", "2024-03-01"]
+    assert body["v"] == [6000.0, 9000.0, 3000.0, 12000.0, 1000.0]
+
+
+def test_series_downsampled_and_arrow(authenticated_client, persona_with_data):
+    """Testa a redução a N pontos e o formato Arrow."""
+    r = _series(authenticated_client, persona_with_data.id, metric="steps", points=3, format="arrow")
+    assert r.status_code == 200, r.text
+    assert r.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(r.content).read_all()
+    assert table.column_names == ["t", "v"]
+    assert table.num_rows == 3
+    assert table.schema.metadata[b"source_points"] == b"5"
+    assert table.column("v").to_pylist() == [6000.0, 12000.0, 1000.0]
+
+
+def test_series_hourly_for_short_ranges(authenticated_client, persona_with_data):
+    """Testa que intervalos curtos usam a granularidade horária."""
+    r = authenticated_client.get(
+        f"/health/{persona_with_data.id}/series",
+        params={"metric": "steps", "start": "2024-01-10T00:00:00", "end": "2024-01-11T00:00:00"},
+    )
+    assert r.status_code == 200, r.text
+    assert (r.json()["grain"], r.json()["v"]) == ("hour", [4000.0, 2000.0])
+
+
+def test_series_errors(authenticated_client, client, persona_with_data, db_session):
+    """Testa autenticação, persona inexistente, persona sem dados e métrica desconhecida."""
+    assert _series(client, persona_with_data.id, metric="steps").status_code in (401, 403)
+    assert _series(authenticated_client, 999999, metric="steps").status_code == 404
+    empty = PersonaService.create_persona(db_session, make_persona_create(), creator_id=1)
+    assert _series(authenticated_client, empty.id, metric="steps").status_code == 404
+    assert _series(authenticated_client, persona_with_data.id, metric="nope").status_code == 400
+    assert _series(authenticated_client, persona_with_data.id, metric="steps", points=1).status_code == 422
+
+
+def test_downsampling_keeps_shape():
+    """Testa que LTTB mantém as pontas e o pico, e que min/max mantém os extremos."""
+    t = np.arange(1000, dtype=np.int64)
+    v = np.sin(t / 50.0)
+    v[500] = 10.0
+    keep = lttb(t, v, 50)
+    assert len(keep) == 50 and keep[0] == 0 and keep[-1] == 999 and 500 in keep
+    assert np.all(np.diff(keep) > 0)
+    keep = minmax(t, v, 50)
+    assert len(keep) <= 50 and 500 in keep and int(np.argmin(v)) in keep
+
+
+def test_arrow_results_are_zero_copy(health_path):
+    """Testa que as colunas numéricas do resultado Arrow são vistas NumPy sem cópia, e que o IPC coincide com o JSON."""
+    con = get_engine(health_path).cursor()
+    try:
+        table = fetch_table(con, "SELECT range AS t, range * 0.5 AS v FROM range(100000)")
+    finally:
+        con.close()
+    t = numpy_column(table, "t")
+    assert t.ctypes.data == table.column("t").chunk(0).buffers()[1].address
+    assert t[-1] == 99999 and numpy_column(table, "v")[-1] == 49999.5
+
+    args = (health_path, get_metric("steps"), datetime(2024, 1, 1), datetime(2024, 4, 1), 4, "minmax")
+    ipc = pa.ipc.open_stream(series_ipc(*args)).read_all()
+    series = metric_series(*args)
+    assert ipc.column("v").to_pylist() == series["v"]
+    assert [int(x.timestamp() * 1000) for x in ipc.column("t").to_pylist()] == series["t"]
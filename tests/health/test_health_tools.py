@@ -0,0 +1,189 @@
+import pytest
+
+from src import tools
+from src.health import engine as health_engine
+from .factories import STEPS, make_record, write_health_dataset
+
+
+def _call(tool, path, start, end):
+    return tool.invoke({"path": path, "start_date": start, "end_date": end})
+
+
+def test_calories_burned(health_path):
+    """Testa soma de calorias ativas e basais no período."""
+    out = _call(tools.calories_burned, health_path, "2024-01-01", "2024-02-01")
+    assert out == {
+        "total_calories_kcal": 3900.0,
+        "active_calories_kcal": 800.0,
+        "basal_calories_kcal": 3100.0,
+    }
+
+
+def test_daily_tools(health_path):
+    """Testa médias e máximos diários de passos, calorias e distância."""
+    assert _call(tools.average_steps_per_day, health_path, "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert _call(tools.max_steps_day, health_path, "2024-01-01", "2024-03-01")["steps"] == 12000
+    assert _call(tools.max_daily_calories, health_path, "2024-01-01", "2024-02-01")["calories_kcal"] == 2100.0
+    assert _call(tools.average_calories_per_day, health_path, "2024-01-01", "2024-02-01") == pytest.approx(1300.0)
+    run = _call(tools.longest_run, health_path, "2024-01-01", "2024-02-01")
+    assert run["distance_km"] == pytest.approx(7.0)
+    assert run["day"].day == 12
+
+
+def test_empty_period(health_path):
+    """Testa período sem dados."""
+    assert _call(tools.max_steps_day, health_path, "2023-01-01", "2023-02-01") == {"day": None, "steps": 0}
+    assert _call(tools.average_steps_per_day, health_path, "2023-01-01", "2023-02-01") == 0.0
+
+
+def test_engine_is_shared_per_dataset(health_path):
+    """Testa que o mesmo dataset reutiliza o mesmo engine DuckDB."""
+    _call(tools.average_steps_per_day, health_path, "2024-01-01", "2024-02-01")
+    _call(tools.max_steps_day, health_path, "2024-01-01", "2024-02-01")
+    assert len(health_engine.engines()) == 1
+    assert health_engine.get_engine(health_path) is health_engine.engines()[0]
+
+
+def test_engine_invalidated_when_files_change(health_path, tmp_path, monkeypatch):
+    """Testa que o engine deteta ficheiros novos no dataset."""
+    monkeypatch.setattr(health_engine, "CHECK_INTERVAL_S", 0.0)
+    before = _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")
+    assert before["steps"] == 12000
+
+    fp = health_engine.get_engine(health_path).fingerprint
+    write_health_dataset(tmp_path / "health_parquet", [make_record(STEPS, "2024-06-01 10:00:00 +0000", 20000, "count")])
+
+    after = _call(tools.max_steps_day, health_path, "2024-01-01", "2025-01-01")
+    assert after["steps"] == 20000
+    assert health_engine.get_engine(health_path).fingerprint != fp
+
+
+def test_rollup_refreshes_only_changed_partitions(health_path):
+    """Testa que o rollup diário só recalcula as partições alteradas."""
+    from src.health.rollup import refresh_rollup, rollup_root
+
+    _call(tools.average_steps_per_day, health_path, "2024-01-01", "2024-02-01")
+    assert (rollup_root(health_path) / "year=2024" / "month=1" / "rollup.parquet").exists()
+    assert refresh_rollup(health_path) == []
+
+    write_health_dataset(health_path, [make_record(STEPS, "2024-02-20 10:00:00 +0000", 500, "count")])
+    assert refresh_rollup(health_path) == ["year=2024/month=2"]
+
+
+def test_partial_day_range_reads_raw_records(health_path):
+    """Testa que intervalos que não começam à meia-noite continuam exatos."""
+    out = _call(tools.average_steps_per_day, health_path, "2024-01-10T12:00:00", "2024-01-11T00:00:00")
+    assert out == 2000.0
+
+
+def test_partition_filter_bounds():
+    """Testa a tradução de datas em limites de partição year/month."""
+    from datetime import datetime
+    from src.health.dataset import partition_filter
+
+    _, params = partition_filter(datetime(2023, 11, 15), datetime(2024, 3, 1))
+    assert params == [2023, 2024, 2023, 11, 2024, 2]
+
+
+def test_month_boundary_ranges_with_pruning(health_path):
+    """Testa que o fim exclusivo no início do mês não perde nem inclui dados a mais."""
+    engine = health_engine.get_engine(health_path)
+    engine.refresh()
+    assert engine.hive_partitioned
+    assert _call(tools.max_steps_day, health_path, "2024-02-01", "2024-03-01")["steps"] == 12000
+    assert _call(tools.max_steps_day, health_path, "2024-02-04", "2024-03-01T12:00:00")["steps"] == 1000
+
+
+@pytest.mark.parametrize("start,end", [
+    ("2024-01-01", "2024-02-01"),
+    ("2024-01-10T12:00:00", "2024-03-01"),
+    ("2023-01-01", "2023-02-01"),
+])
+def test_health_summary_matches_single_metric_tools(health_path, start, end):
+    """Testa que o resumo numa só consulta dá os mesmos valores que as tools individuais."""
+    out = _call(tools.health_summary, health_path, start, end)
+    calories = _call(tools.calories_burned, health_path, start, end)
+    max_cal = _call(tools.max_daily_calories, health_path, start, end)
+    max_steps = _call(tools.max_steps_day, health_path, start, end)
+    run = _call(tools.longest_run, health_path, start, end)
+    day = lambda d: d.date().isoformat() if d else None
+
+    assert out["calories"] == {
+        "total_kcal": calories["total_calories_kcal"],
+        "active_kcal": calories["active_calories_kcal"],
+        "basal_kcal": calories["basal_calories_kcal"],
+        "avg_per_day_kcal": pytest.approx(_call(tools.average_calories_per_day, health_path, start, end)),
+        "max_day": day(max_cal["day"]),
+        "max_day_kcal": max_cal["calories_kcal"],
+    }
+    assert out["steps"] == {
+        "avg_per_day": pytest.approx(_call(tools.average_steps_per_day, health_path, start, end)),
+        "max_day": day(max_steps["day"]),
+        "max_day_steps": max_steps["steps"],
+    }
+    assert out["longest_run"] == {"day": day(run["day"]), "distance_km": pytest.approx(run["distance_km"])}
+
+
+def test_compare_periods_in_one_query(health_path):
+    """Testa a comparação de vários períodos numa só chamada."""
+    periods = [
+        {"label": "jan", "start_date": "2024-01-01", "end_date": "2024-02-01"},
+        {"label": "feb", "start_date": "2024-02-01", "end_date": "2024-03-01"},
+        {"start_date": "2024-01-10T12:00:00", "end_date": "2024-01-11"},
+        {"label": "empty", "start_date": "2023-01-01", "end_date": "2023-02-01"},
+    ]
+    out = tools.compare_periods.invoke({"path": health_path, "periods": periods})
+
+    assert list(out) == ["jan", "feb", "2024-01-10T12:00:00/2024-01-11", "empty"]
+    for p in periods:
+        label = p.get("label") or f"{p['start_date']}/{p['end_date']}"
+        assert out[label] == _call(tools.health_summary, health_path, p["start_date"], p["end_date"])
+    assert out["jan"]["steps"]["avg_per_day"] == pytest.approx(6000.0)
+    assert out["feb"]["steps"]["max_day_steps"] == 12000
+    assert out["empty"]["days_with_data"] == 0
+
+
+def test_compare_periods_rejects_duplicate_labels(health_path):
+    """Testa a validação dos períodos."""
+    period = {"label": "x", "start_date": "2024-01-01", "end_date": "2024-02-01"}
+    with pytest.raises(ValueError):
+        tools.compare_periods.invoke({"path": health_path, "periods": [period, period]})
+
+
+def test_registry_generates_metric_tools(health_path):
+    """Testa as tools geradas a partir do registo de métricas (média diária vs soma)."""
+    from .factories import make_record as rec
+
+    hr = "HKQuantityTypeIdentifierHeartRate"
+    flights = "HKQuantityTypeIdentifierFlightsClimbed"
+    write_health_dataset(health_path, [
+        rec(hr, "2024-01-10 08:00:00 +0000", 60, "count/min"),
+        rec(hr, "2024-01-10 09:00:00 +0000", 100, "count/min"),
+        rec(hr, "2024-01-11 09:00:00 +0000", 70, "count/min"),
+        rec(flights, "2024-01-11 09:00:00 +0000", 3, "count"),
+        rec(flights, "2024-01-11 18:00:00 +0000", 4, "count"),
+    ])
+    by_name = {t.name: t for t in tools.METRIC_TOOLS}
+    assert {"heart_rate_stats", "flights_climbed_stats"} <= set(by_name)
+    assert set(by_name) <= {t.name for t in tools.HEALTH_TOOLS}
+
+    health_engine.get_engine(health_path).refresh(force=True)
+    heart = _call(by_name["heart_rate_stats"], health_path, "2024-01-01", "2024-02-01")
+    assert heart == {
+        "metric": "heart_rate", "unit": "count/min", "days": 2, "avg_per_day": 75.0,
+        "max_day": "2024-01-10", "max": 80.0, "min_day": "2024-01-11", "min": 70.0,
+    }
+    stairs = _call(by_name["flights_climbed_stats"], health_path, "2024-01-01", "2024-02-01")
+    assert (stairs["days"], stairs["total"], stairs["max_day"]) == (1, 7, "2024-01-11")
+
+
+def test_metric_registry_validation():
+    """Testa a validação das entradas do registo."""
+    from src.health.metrics import Metric, get_metric, register
+
+    with pytest.raises(ValueError):
+        Metric("x", "x", ("T",), daily="median")
+    with pytest.raises(ValueError):
+        register(Metric("steps", "steps", ("T",)))
+    with pytest.raises(ValueError):
+        get_metric("nope")
@@ -0,0 +1,164 @@
+import duckdb
+import pyarrow as pa
+import pytest
+
+from data.partion_data import main as partition_main
+from src import tools
+from src.health.ingest import IngestStats, PartitionWriter, ingest_batches, iter_csv_batches, iter_xml_batches
+from src.health.layout import TYPED, read_layout
+from .factories import STEPS, make_health_records, make_record, write_health_csv, write_health_xml
+
+
+def _call(tool, path, start, end):
+    return tool.invoke({"path": path, "start_date": start, "end_date": end})
+
+
+@pytest.fixture()
+def export_csv(tmp_path):
+    records = make_health_records() + [
+        make_record("HKCategoryTypeIdentifierSleepAnalysis", "2024-01-10 23:00:00 +0000", "HKCategoryValueSleepAnalysisAsleepCore", None),
+    ]
+    return write_health_csv(tmp_path / "export.csv", records)
+
+
+@pytest.mark.parametrize("layout", ["raw", "typed"])
+def test_partition_layouts_give_same_answers(export_csv, tmp_path, layout):
+    """Testa que os layouts raw e typed produzem as mesmas respostas."""
+    out = tmp_path / layout
+    partition_main(["--csv", str(export_csv), "--out", str(out), "--layout", layout])
+
+    assert _call(tools.average_steps_per_day, str(out), "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert _call(tools.calories_burned, str(out), "2024-01-01", "2024-02-01")["total_calories_kcal"] == 3900.0
+    assert _call(tools.longest_run, str(out), "2024-01-01T06:00:00", "2024-02-01")["distance_km"] == pytest.approx(7.0)
+
+
+def test_typed_layout_schema(export_csv, tmp_path):
+    """Testa tipos, ordenação e marcador do layout typed."""
+    out = tmp_path / "typed"
+    partition_main(["--csv", str(export_csv), "--out", str(out), "--layout", "typed"])
+    assert read_layout(out) == TYPED
+
+    (f,) = [str(p) for p in (out / "year=2024" / "month=1").glob("*.parquet")]
+    types = {r[0]: r[1] for r in duckdb.sql(f"DESCRIBE SELECT * FROM read_parquet('{f}')").fetchall()}
+    assert types["@value"] == "DOUBLE"
+    assert types["@startDate"].startswith("TIMESTAMP")
+    rows = duckdb.sql(f"""SELECT "@type", "@valueText" FROM read_parquet('{f}')""").fetchall()
+    assert [r[0] for r in rows] == sorted(r[0] for r in rows)
+    assert ("HKCategoryTypeIdentifierSleepAnalysis", "HKCategoryValueSleepAnalysisAsleepCore") in rows
+
+
+def test_typed_layout_refuses_raw_directory(export_csv, tmp_path):
+    """Testa que não se misturam layouts no mesmo diretório."""
+    out = tmp_path / "mixed"
+    partition_main(["--csv", str(export_csv), "--out", str(out)])
+    with pytest.raises(ValueError):
+        partition_main(["--csv", str(export_csv), "--out", str(out), "--layout", "typed"])
+
+
+@pytest.mark.parametrize("layout", ["raw", "typed"])
+def test_streaming_under_tiny_memory_budget(export_csv, tmp_path, layout):
+    """Testa que blocos pequenos e um teto de memória mínimo dão as mesmas respostas."""
+    out = tmp_path / layout
+    stats = IngestStats()
+    reports = []
+    batches = iter_csv_batches(export_csv, block_size=256, stats=stats)
+    stats = ingest_batches(batches, out, layout=layout, max_memory_mb=0, stats=stats, progress=reports.append, progress_every_s=0)
+
+    assert stats.flushes > len(stats.partitions)
+    assert stats.files_written == len(stats.partitions) == 3
+    assert stats.rows_written == stats.rows_in == 15
+    assert stats.bytes_read == stats.bytes_total
+    assert reports
+    assert _call(tools.average_steps_per_day, str(out), "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert _call(tools.calories_burned, str(out), "2024-01-01", "2024-02-01")["total_calories_kcal"] == 3900.0
+
+
+def test_partition_writer_drops_bad_dates(tmp_path):
+    """Testa que linhas sem @startDate válido são descartadas e contadas."""
+    records = [make_record(STEPS, "2024-01-10 08:00:00 +0000", "100", "count"), make_record(STEPS, "not a date", "5", "count")]
+    writer = PartitionWriter(tmp_path)
+    writer.write(pa.Table.from_pylist(records))
+    writer.close()
+
+    assert writer.stats.rows_dropped == 1
+    assert writer.stats.rows_written == 1
+    assert [p.name for p in tmp_path.rglob("*.parquet")] == [f"part-{writer.run_id}.parquet"]
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+WORKOUT_XML = """ <Workout workoutActivityType="HKWorkoutActivityTypeRunning" startDate="2024-01-11 09:00:00 +0000">
+  <WorkoutEvent type="HKWorkoutEventTypeSegment" date="2024-01-11 09:10:00 +0000"/>
+ </Workout>
+ <Record type="HKQuantityTypeIdentifierHeartRate" sourceName="Watch" unit="count/min" startDate="2024-01-11 09:05:00 +0000" endDate="2024-01-11 09:05:00 +0000" value="150">
+  <MetadataEntry key="HKMetadataKeyHeartRateMotionContext" value="2"/>
+  <MetadataEntry key="Other" value="x"/>
+ </Record>
+ <ActivitySummary dateComponents="2024-01-11" activeEnergyBurned="500"/>"""
+
+
+@pytest.mark.parametrize("layout", ["raw", "typed"])
+def test_xml_export_gives_same_answers_as_csv(tmp_path, layout):
+    """Testa a ingestão direta do export.xml (sem CSV intermédio)."""
+    xml = write_health_xml(tmp_path / "export.xml", make_health_records(), extra=WORKOUT_XML)
+    out = tmp_path / layout
+    stats = partition_main(["--xml", str(xml), "--out", str(out), "--layout", layout, "--quiet"])
+
+    assert stats.rows_written == len(make_health_records()) + 1
+    assert _call(tools.average_steps_per_day, str(out), "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert _call(tools.calories_burned, str(out), "2024-01-01", "2024-02-01")["total_calories_kcal"] == 3900.0
+    assert _call(tools.longest_run, str(out), "2024-01-01T06:00:00", "2024-02-01")["distance_km"] == pytest.approx(7.0)
+
+
+def test_xml_batches_keep_first_metadata_entry(tmp_path):
+    """Testa o mapeamento Record -> colunas e que outros elementos são ignorados."""
+    xml = write_health_xml(tmp_path / "export.xml", make_health_records()[:3], extra=WORKOUT_XML)
+    stats = IngestStats()
+    batches = list(iter_xml_batches(xml, batch_rows=2, stats=stats))
+
+    assert [b.num_rows for b in batches] == [2, 2]
+    rows = pa.Table.from_batches(batches).to_pylist()
+    assert rows[0]["@type"] == STEPS and rows[0]["@value"] == "4000" and rows[0]["MetadataEntry.@key"] is None
+    assert rows[3]["@type"] == "HKQuantityTypeIdentifierHeartRate"
+    assert (rows[3]["MetadataEntry.@key"], rows[3]["MetadataEntry.@value"]) == ("HKMetadataKeyHeartRateMotionContext", "2")
+    assert stats.bytes_read == stats.bytes_total
+
+
+@pytest.mark.parametrize("layout", ["raw", "typed"])
+def test_incremental_reexport_only_touches_new_months(tmp_path, layout):
+    """Testa que reexportar o histórico só acrescenta registos novos e só mexe nos meses alterados."""
+    from src.health.engine import reset_engines
+    from src.health.rollup import _load_manifest, rollup_root
+
+    out = tmp_path / layout
+    first = write_health_csv(tmp_path / "first.csv", make_health_records())
+    partition_main(["--csv", str(first), "--out", str(out), "--layout", layout, "--quiet"])
+    before = _load_manifest(rollup_root(out))
+
+    new = make_record(STEPS, "2024-02-20 10:00:00 +0000", 500, "count")
+    again = write_health_csv(tmp_path / "again.csv", make_health_records() + [new, new])
+    stats = partition_main(["--csv", str(again), "--out", str(out), "--layout", layout, "--quiet", "--incremental"])
+    after = _load_manifest(rollup_root(out))
+
+    assert (stats.rows_written, stats.rows_duplicate) == (1, len(make_health_records()) + 1)
+    assert list(stats.partitions) == [(2024, 2)]
+    assert {p for p in after if after[p] != before[p]} == {"year=2024/month=2"}
+    reset_engines()
+    assert _call(tools.average_steps_per_day, str(out), "2024-01-01", "2024-02-01") == pytest.approx(6000.0)
+    assert _call(tools.average_steps_per_day, str(out), "2024-02-01", "2024-03-01") == pytest.approx(6250.0)
+
+
+def test_incremental_matches_records_written_by_pandas(health_path, tmp_path):
+    """Testa a deduplicação contra datasets antigos (escritos pelo pandas)."""
+    csv_path = write_health_csv(tmp_path / "export.csv", make_health_records())
+    stats = partition_main(["--csv", str(csv_path), "--out", health_path, "--quiet", "--incremental"])
+    assert stats.rows_written == 0
+    assert stats.files_written == 0
+
+
+def test_incremental_into_path_with_quote(tmp_path):
+    """Testa a ingestão incremental num caminho com apóstrofo."""
+    out = tmp_path / "joana's health"
+    csv_path = write_health_csv(tmp_path / "export.csv", make_health_records())
+    partition_main(["--csv", str(csv_path), "--out", str(out), "--quiet"])
+    stats = partition_main(["--csv", str(csv_path), "--out", str(out), "--quiet", "--incremental"])
+    assert (stats.rows_written, stats.rows_duplicate) == (0, len(make_health_records()))
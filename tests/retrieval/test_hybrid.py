@@ -0,0 +1,104 @@
+import math
+from collections import Counter
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.retrieval import bm25, hybrid, registry
+from src.retrieval.bm25 import BM25Index, index_path, tokenize
+from src.retrieval.version import bump_version
+
+DOCS = {
+    "intro": "A tese estuda gémeos digitais para dados de saúde pessoais.",
+    "arch": "O capítulo três descreve a arquitetura do agente com LangGraph e ferramentas.",
+    "health": "Os dados de saúde são guardados em Parquet e consultados com DuckDB.",
+    "results": "Os resultados mostram respostas mais rápidas com cache de resultados.",
+    "future": "Trabalho futuro: mais fontes de dados e avaliação com utilizadores.",
+}
+
+
+@pytest.fixture()
+def store_path(tmp_path, monkeypatch):
+    """Coleção Chroma com embeddings falsos (aleatórios): só o BM25 sabe o que é relevante."""
+    registry.reset_registry()
+    monkeypatch.setattr(registry, "_load_embeddings", lambda name: DeterministicFakeEmbedding(size=32))
+    path = str(tmp_path / "chroma")
+    registry.get_vector_store(path, "thesis_test").add_texts(list(DOCS.values()), ids=list(DOCS))
+    yield path
+    registry.reset_registry()
+
+
+def _naive_bm25(texts, query):
+    docs = [Counter(tokenize(t)) for t in texts]
+    avgdl = sum(sum(d.values()) for d in docs) / len(docs)
+    scores = []
+    for d in docs:
+        s = 0.0
+        for term in set(tokenize(query)):
+            df = sum(term in x for x in docs)
+            if term in d:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                tf = d[term]
+                s += idf * tf * (bm25.K1 + 1) / (tf + bm25.K1 * (1 - bm25.B + bm25.B * sum(d.values()) / avgdl))
+        scores.append(s)
+    return scores
+
+
+def test_index_scores_match_formula():
+    """Testa que o índice invertido dá os mesmos scores BM25 que a fórmula direta."""
+    index = BM25Index.build(list(DOCS), list(DOCS.values()))
+    query = "dados de saude com DuckDB"
+    expected = _naive_bm25(list(DOCS.values()), query)
+    hits = index.search(query, 10)
+    assert [index.ids[i] for i, _ in hits][0] == "health"
+    for i, score in hits:
+        assert score == pytest.approx(expected[i])
+    assert len(hits) == sum(s > 0 for s in expected)
+    assert index.search("palavra-inexistente", 3) == []
+    assert tokenize("Gémeos DIGITAIS") == ["gemeos", "digitais"]
+
+
+def test_index_is_persisted_and_rebuilt_when_collection_changes(store_path):
+    """Testa que o índice fica em disco e é reconstruído quando a coleção muda."""
+    index = registry.get_bm25_index(store_path, "thesis_test")
+    path = index_path(store_path, "thesis_test")
+    assert path.exists() and len(index) == len(DOCS)
+    assert BM25Index.load(path).search("LangGraph", 1) == index.search("LangGraph", 1)
+
+    registry.get_vector_store(store_path, "thesis_test").add_texts(["Anexo sobre LangGraph e LangGraph."], ids=["annex"])
+    rebuilt = bm25.load_or_build(registry.get_collection(store_path, "thesis_test"), store_path, "thesis_test")
+    assert len(rebuilt) == len(DOCS) + 1
+    assert rebuilt.ids[rebuilt.search("LangGraph", 1)[0][0]] == "annex"
+
+
+def test_rrf_prefers_agreement():
+    """Testa a fusão por rank recíproco."""
+    fused = hybrid.rrf([["a", "b", "c"], ["b", "d"]])
+    assert [d for d, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+
+def test_hybrid_search_finds_lexical_matches(store_path):
+    """Testa que a pesquisa híbrida encontra o documento com as palavras da pergunta, sem duplicados."""
+    docs = hybrid.hybrid_search("arquitetura do agente LangGraph", 3, store_path, "thesis_test")
+    assert len(docs) == 3 and len({d.id for d in docs}) == 3
+    assert docs[0].id == "arch"
+    assert docs[0].page_content == DOCS["arch"]
+    assert hybrid.hybrid_search("   ", 3, store_path, "thesis_test") == []
+
+
+def test_index_reloads_when_collection_version_changes(store_path):
+    """Testa que o índice em memória é recarregado quando outro processo muda a coleção (mesmo número de documentos)."""
+    old = registry.get_bm25_index(store_path, "thesis_test")
+    assert registry.get_bm25_index(store_path, "thesis_test") is old
+
+    # Simula o CLI de ingestão: troca um documento, nova versão, índice reconstruído em disco.
+    store = registry.get_vector_store(store_path, "thesis_test")
+    store.update_document("future", Document(page_content="Capítulo extra sobre Kubernetes.", metadata={"source": "extra"}))
+    bump_version(store_path, "thesis_test")
+    bm25.build_index(registry.get_collection(store_path, "thesis_test"), store_path, "thesis_test")
+
+    fresh = registry.get_bm25_index(store_path, "thesis_test")
+    assert fresh is not old
+    assert fresh.ids[fresh.search("Kubernetes", 1)[0][0]] == "future"
@@ -0,0 +1,106 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.retrieval import hybrid, registry
+from src.retrieval.bm25 import index_path
+from src.retrieval.ingest import ingest_documents, persona_collection
+
+CHAPTERS = {
+    "cap1.md": "# Introdução\n\nA tese estuda gémeos digitais para dados de saúde pessoais.\n",
+    "cap2.md": "# Arquitetura\n\nO agente usa LangGraph e ferramentas sobre DuckDB.\n\n## Memória\n\nAs conversas ficam em Postgres.\n",
+    "notas.txt": "Notas soltas sobre a avaliação com utilizadores.",
+}
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Embeddings falsos que registam os textos embebidos."""
+
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture()
+def model(monkeypatch):
+    embeddings = CountingEmbedding(size=32)
+    embeddings.embedded = []
+    registry.reset_registry()
+    monkeypatch.setattr(registry, "_load_embeddings", lambda name: embeddings)
+    yield embeddings
+    registry.reset_registry()
+
+
+@pytest.fixture()
+def docs(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for name, text in CHAPTERS.items():
+        (root / name).write_text(text, encoding="utf-8")
+    (root / "imagem.png").write_bytes(b"\x89PNG")
+    return root
+
+
+def _ingest(docs, tmp_path, **kwargs):
+    return ingest_documents([docs], "kb_test", persist_directory=tmp_path / "chroma", chunk_size=60, chunk_overlap=0, **kwargs)
+
+
+def test_ingest_embeds_only_new_or_changed_chunks(model, docs, tmp_path):
+    """Testa que reingerir só embebe os chunks novos e apaga os que deixaram de existir."""
+    first = _ingest(docs, tmp_path, batch_size=2)
+    assert first.files == 3 and first.chunks_embedded == first.chunks == len(model.embedded) > 3
+    store = registry.get_vector_store(tmp_path / "chroma", "kb_test")
+    assert len(store.get(include=[])["ids"]) == first.chunks
+
+    model.embedded.clear()
+    again = _ingest(docs, tmp_path)
+    assert again.chunks_embedded == 0 and again.chunks_unchanged == first.chunks and model.embedded == []
+
+    (docs / "cap2.md").write_text(CHAPTERS["cap2.md"].replace("Postgres", "SQLite"), encoding="utf-8")
+    edited = _ingest(docs, tmp_path)
+    assert model.embedded == ["## Memória\n\nAs conversas ficam em SQLite."]
+    assert edited.chunks_deleted == 1 and edited.chunks_unchanged == first.chunks - 1
+    got = store.get(where={"source": "docs/cap2.md"}, include=["documents"])["documents"]
+    assert not any("Postgres" in t for t in got)
+
+
+def test_unchanged_chunks_get_their_new_position(model, docs, tmp_path):
+    """Testa que chunks com o mesmo id recebem a nova posição (chunk) sem serem embebidos de novo."""
+    _ingest(docs, tmp_path)
+    (docs / "cap2.md").write_text("# Prefácio\n\nUma secção nova no início.\n\n" + CHAPTERS["cap2.md"], encoding="utf-8")
+    model.embedded.clear()
+    moved = _ingest(docs, tmp_path)
+    assert len(model.embedded) == moved.chunks_embedded == 1
+    assert moved.chunks_relabelled > 0
+
+    got = registry.get_collection(tmp_path / "chroma", "kb_test").get(where={"source": "docs/cap2.md"}, include=["metadatas"])
+    assert sorted(m["chunk"] for m in got["metadatas"]) == list(range(len(got["ids"])))
+    index = registry.get_bm25_index(tmp_path / "chroma", "kb_test")
+    assert sorted(m["chunk"] for m in index.metadatas if m["source"] == "docs/cap2.md") == list(range(len(got["ids"])))
+
+
+def test_ingest_rebuilds_bm25_index_and_prunes(model, docs, tmp_path):
+    """Testa que a ingestão reconstrói o índice BM25 usado na pesquisa e que --prune remove fontes apagadas."""
+    persist = tmp_path / "chroma"
+    _ingest(docs, tmp_path)
+    assert index_path(persist, "kb_test").exists()
+    assert "LangGraph" in hybrid.hybrid_search("LangGraph DuckDB", 1, persist, "kb_test")[0].page_content
+
+    (docs / "notas.txt").unlink()
+    (docs / "cap3.md").write_text("# Resultados\n\nRespostas mais rápidas com cache de Parquet.", encoding="utf-8")
+    kept = _ingest(docs, tmp_path)
+    assert kept.chunks_deleted == 0
+    assert "Parquet" in hybrid.hybrid_search("cache Parquet", 1, persist, "kb_test")[0].page_content
+
+    pruned = _ingest(docs, tmp_path, prune=True)
+    assert pruned.chunks_deleted == 1 and pruned.chunks_embedded == 0
+    sources = {m["source"] for m in registry.get_vector_store(persist, "kb_test").get(include=["metadatas"])["metadatas"]}
+    assert sources == {"docs/cap1.md", "docs/cap2.md", "docs/cap3.md"}
+
+
+def test_persona_collection_names():
+    """Testa o nome da coleção de cada persona."""
+    assert persona_collection("Gonçalo Silva") == "goncalo_silva_kb"
+    with pytest.raises(ValueError):
+        persona_collection(" - ")
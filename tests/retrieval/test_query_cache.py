@@ -0,0 +1,66 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src.retrieval import hybrid, query_cache, registry
+from src.retrieval.query_cache import CachedEmbeddings
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Embeddings falsos que registam as perguntas embebidas."""
+
+    queries: list = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture()
+def model(monkeypatch):
+    embeddings = CountingEmbedding(size=32)
+    embeddings.queries = []
+    registry.reset_registry()
+    monkeypatch.setattr(registry, "_load_embeddings", lambda name: embeddings)
+    yield embeddings
+    registry.reset_registry()
+
+
+def test_repeated_questions_hit_the_cache(model):
+    """Testa que a mesma pergunta (com espaços diferentes) só é embebida uma vez por modelo."""
+    cached = CachedEmbeddings(model, "m")
+    first = cached.embed_query("Sobre o que foi a tua tese?")
+    assert cached.embed_query("  Sobre o que foi   a tua\ntese? ") == first
+    assert first == pytest.approx(model.embed_query("Sobre o que foi a tua tese?"), rel=1e-6)
+    CachedEmbeddings(model, "outro").embed_query("Sobre o que foi a tua tese?")
+    assert model.queries[:2] == ["Sobre o que foi a tua tese?"] * 2 and len(model.queries) == 3
+
+    stats = registry.registry_stats()["query_cache"]
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 2)
+    assert stats["hit_rate"] == 0.3333
+
+
+def test_cache_persists_across_restarts_and_can_be_disabled(model, tmp_path, monkeypatch):
+    """Testa a persistência em disco e que tamanho 0 desliga a cache."""
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_PATH", str(tmp_path / "queries.sqlite"))
+    CachedEmbeddings(model, "m").embed_query("tese")
+    query_cache.reset_query_cache()
+    CachedEmbeddings(model, "m").embed_query("tese")
+    assert model.queries == ["tese"]
+    assert query_cache.query_cache_stats()["disk_hits"] == 1
+
+    monkeypatch.setattr(query_cache, "QUERY_CACHE_SIZE", 0)
+    query_cache.reset_query_cache()
+    CachedEmbeddings(model, "m").embed_query("tese")
+    CachedEmbeddings(model, "m").embed_query("tese")
+    assert len(model.queries) == 3
+    assert query_cache.query_cache_stats() == {"name": "query_embeddings", "disabled": True}
+
+
+def test_thesis_search_reuses_query_embeddings(model, tmp_path):
+    """Testa que a pesquisa da tese não volta a embeber uma pergunta repetida."""
+    path = str(tmp_path / "chroma")
+    registry.get_vector_store(path, "thesis_test").add_texts(["A tese estuda gémeos digitais.", "Arquitetura com LangGraph."])
+    first = hybrid.hybrid_search("sobre o que foi a tese", 2, path, "thesis_test")
+    again = hybrid.hybrid_search("sobre o que foi a tese", 2, path, "thesis_test")
+    assert [d.id for d in first] == [d.id for d in again]
+    assert model.queries == ["sobre o que foi a tese"]
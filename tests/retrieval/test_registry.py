@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import tools
+from src.retrieval import registry
+
+DOCS = [
+    "A tese estuda gémeos digitais para dados de saúde.",
+    "O capítulo três descreve a arquitetura com LangGraph.",
+    "Os resultados mostram respostas mais rápidas com cache.",
+]
+
+
+@pytest.fixture()
+def fake_model(monkeypatch):
+    """Modelo de embeddings falso que conta os carregamentos (e demora um pouco a carregar)."""
+    loads = []
+
+    def load(model_name):
+        loads.append(model_name)
+        time.sleep(0.05)
+        return DeterministicFakeEmbedding(size=32)
+
+    registry.reset_registry()
+    monkeypatch.setattr(registry, "_load_embeddings", load)
+    yield loads
+    registry.reset_registry()
+
+
+@pytest.fixture()
+def thesis_store(tmp_path, fake_model):
+    path = str(tmp_path / "chroma")
+    registry.get_vector_store(path, "thesis_test").add_texts(DOCS)
+    return path
+
+
+def test_model_loads_once_across_threads(fake_model):
+    """Testa que pedidos concorrentes ao mesmo modelo o carregam uma só vez."""
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(registry.get_embeddings("m"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake_model == ["m"]
+    assert all(g is got[0] for g in got)
+
+    stats = registry.registry_stats()
+    assert [m["name"] for m in stats["models"]] == ["model:m"]
+    assert stats["models"][0]["uses"] == 8 and stats["models"][0]["seconds"] >= 0.05
+
+
+def test_store_reused_per_directory_and_collection(tmp_path, fake_model):
+    """Testa que cada (diretório, coleção) abre um único cliente Chroma."""
+    a = registry.get_vector_store(tmp_path / "chroma", "thesis_a")
+    assert registry.get_vector_store(str(tmp_path / "chroma"), "thesis_a") is a
+    assert registry.get_vector_store(tmp_path / "chroma", "thesis_b") is not a
+    assert len(fake_model) == 1
+    assert len(registry.registry_stats()["stores"]) == 2
+
+
+def test_thesis_tool_uses_registry(thesis_store, fake_model):
+    """Testa que várias perguntas à tese não recarregam o modelo."""
+    for q in ("arquitetura", "resultados", "tese"):
+        out = tools.query_knowledge_base_thesis.invoke({"path": thesis_store, "collection_name": "thesis_test", "query": q})
+        assert out and set(out) <= set(DOCS)
+    assert len(fake_model) == 1
+
+
+def test_preload_is_opt_in(fake_model, monkeypatch):
+    """Testa que o pré-carregamento só acontece com RETRIEVAL_PRELOAD."""
+    assert registry.preload("m") is False and fake_model == []
+    monkeypatch.setattr(registry, "PRELOAD", True)
+    assert registry.preload("m") is True and fake_model == ["m"]
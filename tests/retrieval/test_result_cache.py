@@ -0,0 +1,111 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from src import tools
+from src.retrieval import hybrid, registry, version
+from src.retrieval.ingest import ingest_documents
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Embeddings falsos que registam as perguntas embebidas."""
+
+    queries: list = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture()
+def model(monkeypatch):
+    embeddings = CountingEmbedding(size=32)
+    embeddings.queries = []
+    registry.reset_registry()
+    monkeypatch.setattr(registry, "_load_embeddings", lambda name: embeddings)
+    # Sem a cache de embeddings, cada pesquisa feita de facto embebe a pergunta.
+    monkeypatch.setattr("src.retrieval.query_cache.QUERY_CACHE_SIZE", 0)
+    yield embeddings
+    registry.reset_registry()
+
+
+@pytest.fixture()
+def kb(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "tese.md").write_text("# Tese\n\nA tese estuda gémeos digitais com LangGraph.", encoding="utf-8")
+    (docs / "outra.md").write_text("# Outra\n\nUm texto sobre DuckDB e Parquet.", encoding="utf-8")
+    return docs, str(tmp_path / "chroma")
+
+
+def test_repeated_search_skips_encoding_and_search(model, kb):
+    """Testa que uma pergunta repetida não volta a embeber nem a pesquisar, e devolve cópias."""
+    docs, path = kb
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    first = hybrid.hybrid_search("o que estuda a tese", 2, path, "kb_test")
+    first[0].page_content = "alterado"
+    again = hybrid.hybrid_search("  o que estuda a  tese ", 2, path, "kb_test")
+    assert model.queries == ["o que estuda a tese"]
+    assert again[0].page_content != "alterado"
+    hybrid.hybrid_search("o que estuda a tese", 1, path, "kb_test")
+    assert len(model.queries) == 2  # outro k, outra entrada
+    assert registry.registry_stats()["result_cache"]["hits"] == 1
+
+
+def test_ingestion_invalidates_only_its_collection(model, kb, tmp_path):
+    """Testa que ingerir invalida as entradas dessa coleção e não as das outras."""
+    docs, path = kb
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    ingest_documents([docs], "kb_other", persist_directory=path)
+    for name in ("kb_test", "kb_other"):
+        hybrid.hybrid_search("DuckDB", 2, path, name)
+    assert len(model.queries) == 2
+
+    unchanged = ingest_documents([docs], "kb_test", persist_directory=path)
+    assert unchanged.chunks_embedded == 0
+    hybrid.hybrid_search("DuckDB", 2, path, "kb_test")
+    assert len(model.queries) == 2
+
+    (docs / "outra.md").write_text("# Outra\n\nUm texto sobre DuckDB, Arrow e Parquet.", encoding="utf-8")
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    new = hybrid.hybrid_search("DuckDB", 2, path, "kb_test")
+    hybrid.hybrid_search("DuckDB", 2, path, "kb_other")
+    assert len(model.queries) == 3
+    assert any("Arrow" in d.page_content for d in new)
+
+
+def test_documents_added_outside_ingestion_change_the_version(model, kb):
+    """Testa que a versão também muda quando a coleção cresce sem passar pela ingestão."""
+    docs, path = kb
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    collection = registry.get_collection(path, "kb_test")
+    before = version.collection_version(collection, path, "kb_test")
+    registry.get_vector_store(path, "kb_test").add_texts(["Anexo."])
+    assert version.collection_version(collection, path, "kb_test") != before
+
+
+def test_thesis_tool_uses_result_cache(model, kb, monkeypatch):
+    """Testa que a tool da tese responde a perguntas repetidas a partir da cache."""
+    docs, path = kb
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    first = tools.query_knowledge_base_thesis.invoke({"path": path, "collection_name": "kb_test", "query": "gémeos digitais"})
+    again = tools.query_knowledge_base_thesis.invoke({"path": path, "collection_name": "kb_test", "query": "gémeos digitais"})
+    assert first == again and len(model.queries) == 1
+
+
+def test_reingesting_a_changed_document_after_a_cached_search(model, kb):
+    """Testa que, depois de ingerir um documento alterado, a pesquisa já em cache não devolve chunks apagados."""
+    docs, path = kb
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    before = hybrid.hybrid_search("gémeos digitais", 2, path, "kb_test")
+    assert any("LangGraph" in d.page_content for d in before)
+
+    # Mesmo número de chunks: só a versão da coleção denuncia a mudança.
+    (docs / "tese.md").write_text("# Tese\n\nA tese estuda gémeos digitais com Kubernetes.", encoding="utf-8")
+    ingest_documents([docs], "kb_test", persist_directory=path)
+    after = hybrid.hybrid_search("gémeos digitais", 2, path, "kb_test")
+    assert not any("LangGraph" in d.page_content for d in after)
+    assert any("Kubernetes" in d.page_content for d in after)
+    live = set(registry.get_vector_store(path, "kb_test").get(include=[])["ids"])
+    assert {d.id for d in after} <= live
+    assert hybrid.hybrid_search("gémeos digitais", 2, path, "kb_test") == after
+    assert registry.registry_stats()["result_cache"]["hits"] == 1